@@ -0,0 +1,5 @@
+"""Pure pandas/NumPy analytics layer for the Streamlit dashboard (`app.py`).
+
+Modules here never import Streamlit, so they can be reused by scripts and
+benchmarks. The Streamlit script owns caching and rendering.
+"""
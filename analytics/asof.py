@@ -0,0 +1,141 @@
+"""Prefix-sum index for standings "as of" a date and between two dates.
+
+For one entity column (artist, album or track), plays are summed per entity
+and day. The rows are laid out entity by entity in day order, with running
+totals of minutes and plays. An entity's total up to any date is then one
+binary search in its own run. The total between two dates is the difference
+of two such lookups. Standings of every entity on a date are a single
+vectorised search over all entities (O(E log n)) followed by a sort. Days are
+UTC calendar days, as in the race charts.
+
+An index is a plain dict: ``{'col', 'entities': Index (sorted),
+'ptr': entity run offsets, 'keys': entity * stride + day offset, 'minutes'
+and 'plays': running totals per row, 'first_day', 'stride', 'days': sorted
+listening days, 'day_minutes' and 'day_plays': running totals over all
+entities}``.
+"""
+
+import numpy as np
+import pandas as pd
+
+from analytics import timegrid
+
+METRICS = ('minutes', 'plays')
+
+
+def day_number(value):
+    """Days since 1970-01-01 of a date, datetime or date string."""
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+
+def build_asof_index(events, col):
+    days, _ = timegrid.bucket_codes(events['ts'], 'D')
+    codes, entities = pd.factorize(events[col], sort=True)
+    present = codes >= 0
+    first_day = int(days.min()) if len(days) else 0
+    stride = int(days.max()) - first_day + 2 if len(days) else 2
+
+    # Per (entity, day) sums; sorting the combined key orders rows by entity, then day
+    keys = codes[present].astype(np.int64) * stride + (days[present] - first_day)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    minutes = np.bincount(inverse, weights=events['minutes'].to_numpy(dtype=float)[present], minlength=len(unique_keys))
+    plays = np.bincount(inverse, minlength=len(unique_keys)).astype(np.int64)
+    row_entity = unique_keys // stride
+    ptr = np.searchsorted(row_entity, np.arange(len(entities) + 1))
+    # Running totals restart at every entity's first row
+    starts = np.repeat(ptr[:-1], np.diff(ptr))
+    cum_minutes, cum_plays = np.cumsum(minutes), np.cumsum(plays)
+    offset_minutes = np.concatenate([[0.0], cum_minutes])[starts]
+    offset_plays = np.concatenate([[0], cum_plays])[starts]
+
+    all_days, day_inverse = np.unique(days, return_inverse=True)
+    return {
+        'col': col,
+        'entities': pd.Index(entities),
+        'ptr': ptr,
+        'keys': unique_keys,
+        'minutes': cum_minutes - offset_minutes,
+        'plays': cum_plays - offset_plays,
+        'first_day': first_day,
+        'stride': stride,
+        'days': all_days,
+        'day_minutes': np.cumsum(np.bincount(day_inverse, weights=events['minutes'].to_numpy(dtype=float), minlength=len(all_days))),
+        'day_plays': np.cumsum(np.bincount(day_inverse, minlength=len(all_days))),
+    }
+
+
+def _running_at(index, codes, day):
+    """Running (minutes, plays) of entities `codes` at the end of `day`; zero before their first play."""
+    if not len(index['keys']):
+        return np.zeros(len(codes)), np.zeros(len(codes), dtype=np.int64)
+    offset = min(max(day - index['first_day'], -1), index['stride'] - 2)
+    rows = np.searchsorted(index['keys'], codes * index['stride'] + offset, side='right') - 1
+    valid = rows >= index['ptr'][codes]
+    rows = np.where(valid, rows, 0)
+    return np.where(valid, index['minutes'][rows], 0.0), np.where(valid, index['plays'][rows], 0)
+
+
+def _between(index, codes, end, start=None):
+    minutes, plays = _running_at(index, codes, day_number(end))
+    if start is not None:
+        before_minutes, before_plays = _running_at(index, codes, day_number(start) - 1)
+        minutes, plays = minutes - before_minutes, plays - before_plays
+    return minutes, plays
+
+
+def entity_totals(index, entities, end, start=None):
+    """Minutes and plays of `entities` (in that order) up to `end`, or between `start` and `end` (inclusive)."""
+    codes = index['entities'].get_indexer(entities)
+    minutes, plays = _between(index, np.maximum(codes, 0), end, start)
+    known = codes >= 0
+    return pd.DataFrame({index['col']: list(entities), 'minutes': np.where(known, minutes, 0.0), 'plays': np.where(known, plays, 0)})
+
+
+def listening_total(index, end, start=None):
+    """(minutes, plays) of all listening up to `end`, or between `start` and `end`."""
+    def running(day):
+        position = np.searchsorted(index['days'], day, side='right') - 1
+        if position < 0:
+            return 0.0, 0
+        return float(index['day_minutes'][position]), int(index['day_plays'][position])
+
+    minutes, plays = running(day_number(end))
+    if start is not None:
+        before_minutes, before_plays = running(day_number(start) - 1)
+        minutes, plays = minutes - before_minutes, plays - before_plays
+    return minutes, plays
+
+
+def _top_codes(values, plays, n):
+    # Entities with plays in range, highest first; ties keep name order (codes are sorted by name)
+    candidates = np.flatnonzero(plays > 0)
+    if n is not None and n < len(candidates):
+        # Only values reaching the n-th largest can be in the top n; ties with it are all kept, then sorted
+        kth = np.partition(values[candidates], len(candidates) - n)[len(candidates) - n]
+        candidates = candidates[values[candidates] >= kth]
+    order = candidates[np.argsort(-values[candidates], kind='stable')]
+    return order if n is None else order[:n]
+
+
+def standings(index, end, start=None, metric='minutes', n=None):
+    """Entities by `metric` up to `end` (or between `start` and `end`), with minutes and plays."""
+    codes = np.arange(len(index['entities']))
+    minutes, plays = _between(index, codes, end, start)
+    top = _top_codes(minutes if metric == 'minutes' else plays, plays, n)
+    return pd.DataFrame({
+        index['col']: index['entities'][top],
+        'minutes': minutes[top],
+        'plays': plays[top],
+    })
+
+
+def running_standings(index, days, metric, n):
+    """Top `n` by running `metric` at the end of each of `days` (day numbers), one frame per day."""
+    codes = np.arange(len(index['entities']))
+    frames = []
+    for day in days:
+        minutes, plays = _running_at(index, codes, day)
+        values = minutes if metric == 'minutes' else plays
+        top = _top_codes(values, plays, n)
+        frames.append(pd.DataFrame({index['col']: index['entities'][top], 'value': values[top]}))
+    return frames
@@ -0,0 +1,79 @@
+"""Interchangeable compute backends for the heavy aggregations.
+
+Every backend takes pandas frames and returns pandas frames (or the same
+plain dicts) so the dashboard does not care which one ran:
+
+- ``top_items(events, keys, n)``: minutes, plays and unique tracks per key
+- ``weekly_ranking(daily)``: see `ranking.weekly_ranking`
+- ``periodic_race`` / ``cumulative_race``: see `ranking`
+- ``daily_streak_stats(events)``: see `streaks.daily_streak_stats`
+
+Pick one with `SPOTIFY_STATS_BACKEND=pandas|polars` (default pandas). The
+Polars backend runs lazy queries on all cores and needs `pip install polars`.
+`python -m bench.backend_parity` checks that every backend agrees.
+"""
+
+import importlib
+import os
+
+from analytics import ranking, streaks
+
+BACKEND_ENV = "SPOTIFY_STATS_BACKEND"
+DEFAULT_BACKEND = "pandas"
+TRACK = 'master_metadata_track_name'
+
+
+class PandasBackend:
+    name = "pandas"
+
+    def top_items(self, events, keys, n):
+        """Top `n` groups of `keys` by minutes; ties keep key order."""
+        grouped = events.groupby(keys).agg(
+            total_minutes=('minutes', 'sum'),
+            play_count=('ts', 'count'),
+            unique_tracks=(TRACK, 'nunique')
+        )
+        return grouped.sort_values('total_minutes', ascending=False, kind='stable').head(n).reset_index()
+
+    def weekly_ranking(self, daily):
+        return ranking.weekly_ranking(daily)
+
+    def periodic_race(self, events, item_col, time_period, metric_type, top_n):
+        return ranking.periodic_race(events, item_col, time_period, metric_type, top_n)
+
+    def cumulative_race(self, events, item_col, time_period, metric_type, top_n):
+        return ranking.cumulative_race(events, item_col, time_period, metric_type, top_n)
+
+    def daily_streak_stats(self, events):
+        return streaks.daily_streak_stats(events)
+
+
+# Name → "module:class" so optional backends are only imported when picked
+BACKENDS = {
+    'pandas': 'analytics.backends:PandasBackend',
+    'polars': 'analytics.polars_backend:PolarsBackend',
+}
+
+
+def load_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown compute backend {name!r}. Choose one of: {', '.join(BACKENDS)}.")
+    module, cls = BACKENDS[name].split(':')
+    return getattr(importlib.import_module(module), cls)()
+
+
+def available_backends():
+    """Names of the backends whose dependencies are installed."""
+    names = []
+    for name in BACKENDS:
+        try:
+            load_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name=None):
+    """Backend named `name`, else the one configured in the environment."""
+    return load_backend((name or os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND).lower())
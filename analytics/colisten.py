@@ -0,0 +1,63 @@
+"""Which tracks or artists get played in the same listening session.
+
+Sessions come from `sessions.session_ids`, so the listening window is the
+session idle gap. Each session contributes its set of distinct items. The
+item × item co-occurrence matrix is the sum of Xᵀ·X over chunks of the
+binary session × item matrix X. Only one chunk of X exists at a time, so
+memory stays bounded by the chunk and the result. The result is kept as a
+CSR index; a "most co-listened with" query reads one row.
+
+An index is a plain dict: ``{'items': Index, 'matrix': csr_matrix,
+'sessions': sessions per item}``. The diagonal is dropped from `matrix` and
+lives in `sessions`.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from analytics import sessions as sessions_mod
+
+CHUNK_SESSIONS = 20_000
+
+
+def build_colisten_index(events, col, gap_minutes=sessions_mod.DEFAULT_GAP_MINUTES, chunk_sessions=CHUNK_SESSIONS):
+    codes, items = pd.factorize(events[col])
+    session = sessions_mod.session_ids(events, gap_minutes).to_numpy()[codes >= 0]
+    codes = codes[codes >= 0]
+    n_items = len(items)
+    # Distinct (session, item) pairs, sorted by session
+    pairs = np.unique(session * n_items + codes)
+    session, codes = pairs // n_items, pairs % n_items
+
+    matrix = sparse.csr_matrix((n_items, n_items), dtype=np.int64)
+    bounds = np.searchsorted(session, np.arange(0, (session[-1] + 1 if len(session) else 0) + chunk_sessions, chunk_sessions))
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if lo == hi:
+            continue
+        rows = session[lo:hi] - session[lo]
+        chunk = sparse.csr_matrix((np.ones(hi - lo, dtype=np.int64), (rows, codes[lo:hi])), shape=(rows[-1] + 1, n_items))
+        matrix = matrix + (chunk.T @ chunk).tocsr()
+
+    per_item = matrix.diagonal()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    return {'items': pd.Index(items), 'matrix': matrix.tocsr(), 'sessions': per_item}
+
+
+def most_colistened(index, item, k=10):
+    """Top `k` items sharing the most sessions with `item`.
+
+    `score` is the Ochiai coefficient (shared / sqrt(sessions_a * sessions_b)),
+    which keeps everyday favourites from topping every list.
+    """
+    columns = ['item', 'sessions_together', 'score']
+    position = index['items'].get_indexer([item])[0]
+    if position < 0:
+        return pd.DataFrame(columns=columns)
+    matrix = index['matrix']
+    row = slice(matrix.indptr[position], matrix.indptr[position + 1])
+    others, together = matrix.indices[row], matrix.data[row]
+    score = together / np.sqrt(index['sessions'][position] * index['sessions'][others])
+    order = np.lexsort((-score, -together))[:k]
+    return pd.DataFrame({'item': index['items'][others[order]], 'sessions_together': together[order], 'score': score[order]}, columns=columns)
@@ -0,0 +1,52 @@
+"""Shape-preserving downsampling of long time series for charting.
+
+Largest-Triangle-Three-Buckets (LTTB, Steinarsson 2013) keeps the first and
+last point and splits the others into equal buckets. From each bucket it
+keeps the point that forms the largest triangle with the point kept before
+it and the average of the next bucket. Peaks and dips survive where plain
+striding or averaging would flatten them. The bucket averages are
+vectorised. Only the choice in each bucket (one per output point) loops.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out):
+    """Positions of the `n_out` points LTTB keeps from (`x`, `y`), in order. `y` must be finite."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets over the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / sizes
+    # The last bucket's "next bucket" is the last point
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((ax - next_x[bucket]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[bucket] - ay))
+        previous = lo + int(np.argmax(area))
+        keep[bucket + 1] = previous
+    return keep
+
+
+def downsample(series, n_out):
+    """`series` (datetime or numeric index) reduced to at most `n_out` points with LTTB."""
+    series = series.dropna()
+    if len(series) <= n_out:
+        return series
+    index = series.index
+    x = index.asi8 if isinstance(index, pd.DatetimeIndex) else index.to_numpy(dtype=float)
+    return series.iloc[lttb_indices(x, series.to_numpy(dtype=float), n_out)]
+
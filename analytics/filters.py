@@ -0,0 +1,27 @@
+"""Sidebar filters, shared by event frames and the daily rollup."""
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ALBUM = 'master_metadata_album_album_name'
+
+
+def filter_by_date(frame, start_date, end_date):
+    return frame[(frame['date'] >= start_date) & (frame['date'] <= end_date)]
+
+
+def apply_filters(frame, start_date=None, end_date=None, artists=(), albums=(), tracks=()):
+    """Apply the dashboard's date and entity filters to any frame with `date` and name columns."""
+    if start_date is not None and end_date is not None:
+        frame = filter_by_date(frame, start_date, end_date)
+    if artists:
+        frame = frame[frame[ARTIST].isin(artists)]
+    if albums:
+        frame = frame[frame[ALBUM].isin(albums)]
+    if tracks:
+        frame = frame[frame[TRACK].isin(tracks)]
+    return frame
+
+
+def filter_signature(dataset_key, start_date=None, end_date=None, artists=(), albums=(), tracks=()):
+    """Hashable key for a dataset plus filter state, for caching results of filtered frames."""
+    return (dataset_key, start_date, end_date, tuple(sorted(artists)), tuple(sorted(albums)), tuple(sorted(tracks)))
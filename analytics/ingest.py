@@ -0,0 +1,165 @@
+"""ZIP ingestion, event normalization and saved-dataset persistence."""
+
+import json
+import os
+import re
+import zipfile
+
+import pandas as pd
+
+from analytics import rollups as rollups_mod
+
+HISTORY_DIR = "Spotify Extended Streaming History"
+DEDUP_COLUMNS = ['ts', 'spotify_track_uri', 'ms_played']
+DATA_DIR_ENV = "SPOTIFY_STATS_DATA_DIR"
+DEFAULT_DATA_DIR = os.path.join(os.path.expanduser("~"), ".spotify_stats")
+
+
+class ExportError(ValueError):
+    """Raised when an uploaded archive does not look like a Spotify export."""
+
+
+def find_history_files(names):
+    # The folder name can vary, so we look for the pattern
+    json_files = [f for f in names if f.startswith('MyData/endsong_') and f.endswith('.json')]
+    # Fallback for the old naming convention if the new one is not found
+    if not json_files:
+        json_files = [f for f in names if f.startswith(HISTORY_DIR) and f.endswith('.json')]
+    return json_files
+
+
+def iter_export_files(file):
+    """Yield ``(name, raw DataFrame)`` for each history JSON member of a Spotify ZIP, in archive order.
+
+    Each file's parsed records are released before the next one is read.
+    """
+    with zipfile.ZipFile(file, 'r') as archive:
+        json_files = find_history_files(archive.namelist())
+        if not json_files:
+            raise ExportError("No 'endsong_...json' or 'Spotify Extended Streaming History' files found in the ZIP archive. Please make sure you have the correct file from Spotify.")
+
+        for name in json_files:
+            with archive.open(name) as f:
+                yield name, pd.DataFrame(json.load(f))
+
+
+def read_export_zip(file):
+    """Read every history JSON member of a Spotify ZIP into one raw DataFrame."""
+    frames = [frame for _, frame in iter_export_files(file)]
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def prepare_events(raw):
+    """Apply the dashboard's basic preprocessing to raw export records."""
+    df = raw.copy()
+    if 'spotify_track_uri' not in df.columns:
+        df['spotify_track_uri'] = None
+    df['ts'] = pd.to_datetime(df['ts'], errors='coerce')
+    df = df.dropna(subset=['ts', 'master_metadata_track_name'])  # Ensure track name is not null
+    df['minutes'] = df['ms_played'] / 60000
+    df['year'] = df['ts'].dt.year
+    df['month'] = df['ts'].dt.month
+    df['weekday'] = df['ts'].dt.dayofweek  # Monday=0, Sunday=6
+    df['hour'] = df['ts'].dt.hour
+    df['date'] = df['ts'].dt.date
+    return df.reset_index(drop=True)
+
+
+def load_export(file):
+    return prepare_events(read_export_zip(file))
+
+
+# ─────────────────────────────────────────────
+#  DEDUP & MERGE
+# ─────────────────────────────────────────────
+
+def event_keys(events):
+    """Vectorized uint64 hash of (ts, track URI, ms_played) for every event."""
+    return pd.util.hash_pandas_object(events[DEDUP_COLUMNS], index=False).to_numpy()
+
+
+def dedupe_events(events):
+    return events[~pd.Series(event_keys(events)).duplicated().to_numpy()].reset_index(drop=True)
+
+
+def merge_events(existing, incoming):
+    """Append the events of `incoming` that are not already in `existing`.
+
+    Returns ``(merged, added)`` where ``added`` holds only the new events, so
+    derived rollups can be updated for the time range they cover.
+    """
+    incoming = dedupe_events(incoming)
+    if existing is None or existing.empty:
+        return incoming, incoming
+    is_new = ~pd.Series(event_keys(incoming)).isin(event_keys(existing)).to_numpy()
+    added = incoming[is_new].reset_index(drop=True)
+    if added.empty:
+        return existing, added
+    merged = pd.concat([existing, added], ignore_index=True).sort_values('ts', kind='stable').reset_index(drop=True)
+    return merged, added
+
+
+# ─────────────────────────────────────────────
+#  SAVED DATASETS
+# ─────────────────────────────────────────────
+
+def data_dir():
+    return os.environ.get(DATA_DIR_ENV, DEFAULT_DATA_DIR)
+
+
+def dataset_path(name):
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', name.strip()) or 'default'
+    return os.path.join(data_dir(), slug)
+
+
+def list_datasets():
+    root = data_dir()
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root) if os.path.exists(os.path.join(root, d, 'events.pkl')))
+
+
+def dataset_version(name):
+    """Modification time of a saved dataset, used as a cache key."""
+    path = os.path.join(dataset_path(name), 'events.pkl')
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def save_dataset(name, events, rollups):
+    path = dataset_path(name)
+    os.makedirs(path, exist_ok=True)
+    # Rollups first: a reader keyed on the events mtime never sees stale rollups
+    pd.to_pickle(rollups, os.path.join(path, 'rollups.pkl'))
+    pd.to_pickle(events, os.path.join(path, 'events.pkl'))
+
+
+def load_dataset(name):
+    path = dataset_path(name)
+    events = pd.read_pickle(os.path.join(path, 'events.pkl'))
+    rollups_file = os.path.join(path, 'rollups.pkl')
+    if os.path.exists(rollups_file):
+        rollups = rollups_mod.complete_rollups(pd.read_pickle(rollups_file), events)
+    else:
+        rollups = rollups_mod.build_rollups(events)
+    return events, rollups
+
+
+def append_to_dataset(name, file):
+    """Merge an uploaded export into a saved dataset and persist the result.
+
+    Only the days and weeks covered by genuinely new events are re-aggregated.
+    Returns ``(events, rollups, added_count, duplicate_count)``.
+    """
+    incoming = load_export(file)
+    if dataset_version(name) is None:
+        events, rollups = None, None
+    else:
+        events, rollups = load_dataset(name)
+    merged, added = merge_events(events, incoming)
+    if rollups is None:
+        rollups = rollups_mod.build_rollups(merged)
+    elif not added.empty:
+        rollups = rollups_mod.update_rollups(rollups, added, merged)
+    if not added.empty:
+        save_dataset(name, merged, rollups)
+    return merged, rollups, len(added), len(incoming) - len(added)
@@ -0,0 +1,90 @@
+"""Aggregations behind the Top, Distributions and Heatmaps tabs.
+
+Kept apart from the drawing so they can be computed in the background and
+estimated from a weighted sample (`analytics/sampling.py`). Every function
+takes optional per-play `weights`.
+"""
+
+import numpy as np
+import pandas as pd
+
+from analytics import taskgraph
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ALBUM = 'master_metadata_album_album_name'
+TOP_LISTS = {'tracks': [TRACK, ARTIST], 'artists': [ARTIST], 'albums': [ALBUM, ARTIST]}
+# Histogram panels: name -> (bins, with a density curve); None bins means one per distinct value
+DISTRIBUTION_PANELS = {
+    'hour': (24, True),
+    'weekday': (7, True),
+    'month': (12, True),
+    'year': (None, False),
+    'duration': (50, True),
+    'start_second': (60, True),
+}
+KDE_GRIDSIZE = 200
+
+
+def top_lists(events, top_items, n):
+    """Top `n` tracks, artists and albums, with `top_items` from a backend or the sampler, computed concurrently."""
+    graph = taskgraph.TaskGraph()
+    for name, keys in TOP_LISTS.items():
+        graph.add(name, lambda keys=keys: top_items(events, keys, n))
+    results = graph.run()
+    return {name: results[name] for name in TOP_LISTS}
+
+
+def _panel_values(events):
+    short = (events['minutes'] < 10).to_numpy()
+    return {
+        'hour': (events['hour'], None),
+        'weekday': (events['weekday'], None),
+        'month': (events['month'], None),
+        'year': (events['year'], None),
+        'duration': (events['minutes'], short),
+        'start_second': (events['ts'].dt.second, None),
+    }
+
+
+def histogram(values, bins, density_curve, weights=None):
+    """Counts over `bins` equal bins, plus a KDE scaled to the bars as seaborn's histplot draws it."""
+    values = np.asarray(values, dtype=float)
+    if bins is None:
+        bins = max(len(np.unique(values)), 1)
+    counts, edges = np.histogram(values, bins=bins, weights=weights)
+    result = {'edges': edges, 'counts': counts, 'curve': None}
+    if density_curve and len(values) > 1 and np.var(values) > 0:
+        from scipy import stats
+
+        kde = stats.gaussian_kde(values, bw_method='scott', weights=weights)
+        support = np.linspace(values.min(), values.max(), KDE_GRIDSIZE)
+        result['curve'] = (support, kde(support) * (counts * np.diff(edges)).sum())
+    return result
+
+
+def distributions(events, weights=None):
+    panels = {}
+    for name, (values, mask) in _panel_values(events).items():
+        bins, density_curve = DISTRIBUTION_PANELS[name]
+        values = values.to_numpy()
+        panel_weights = None if weights is None else np.asarray(weights)
+        if mask is not None:
+            values = values[mask]
+            panel_weights = None if panel_weights is None else panel_weights[mask]
+        panels[name] = histogram(values, bins, density_curve, panel_weights)
+    return panels
+
+
+def activity_pivots(events, weights=None):
+    """Minutes by weekday × hour and by month × day of month."""
+    frame = pd.DataFrame({
+        'weekday': events['weekday'].to_numpy(),
+        'hour': events['hour'].to_numpy(),
+        'month': events['month'].to_numpy(),
+        'day_of_month': events['ts'].dt.day.to_numpy(),
+        'minutes': events['minutes'].to_numpy() * (1 if weights is None else np.asarray(weights)),
+    })
+    by_hour = frame.pivot_table(index='weekday', columns='hour', values='minutes', aggfunc='sum', fill_value=0)
+    calendar = frame.pivot_table(index='month', columns='day_of_month', values='minutes', aggfunc='sum', fill_value=0)
+    return by_hour, calendar
@@ -0,0 +1,126 @@
+"""Polars implementation of the compute backend interface (see `backends`).
+
+Inputs are converted once per call to a LazyFrame holding only the columns
+the query needs. Plans are collected with the streaming engine, which runs
+them multi-threaded and in bounded memory. Outputs match the pandas backend
+row for row, including tie order.
+"""
+
+import polars as pl
+
+from analytics import ranking, streaks
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ENGINE = "streaming"
+
+
+def _lazy(frame, columns):
+    return pl.from_pandas(frame[list(dict.fromkeys(columns))]).lazy()
+
+
+def _collect(query):
+    return query.collect(engine=ENGINE)
+
+
+def _longest_run(active):
+    runs = active.rle()
+    runs = runs.filter(runs.struct.field('value'))
+    return int(runs.struct.field('len').max() or 0)
+
+
+def _period_id(time_period):
+    """Same labels as `ranking.period_ids`, e.g. '2023-01-02/2023-01-08' for a week."""
+    ts = pl.col('ts').dt.replace_time_zone(None)
+    if time_period == 'Weekly':
+        start = ts.dt.truncate('1w')
+        return pl.concat_str([start.dt.strftime('%Y-%m-%d'), (start + pl.duration(days=6)).dt.strftime('%Y-%m-%d')], separator='/')
+    return ts.dt.strftime('%Y-%m' if time_period == 'Monthly' else '%Y')
+
+
+class PolarsBackend:
+    name = "polars"
+
+    def top_items(self, events, keys, n):
+        query = _lazy(events, [*keys, 'minutes', 'ts', TRACK]).drop_nulls(keys).group_by(keys).agg(
+            pl.col('minutes').sum().alias('total_minutes'),
+            pl.col('ts').count().cast(pl.Int64).alias('play_count'),
+            pl.col(TRACK).drop_nulls().n_unique().cast(pl.Int64).alias('unique_tracks'),
+        ).sort(['total_minutes', *keys], descending=[True] + [False] * len(keys)).head(n)
+        return _collect(query).to_pandas()
+
+    def weekly_ranking(self, daily):
+        if daily.empty:
+            return ranking.weekly_ranking(daily)
+        frame = _lazy(daily, ['date', TRACK, ARTIST, 'minutes'])
+        track_artist_map = frame.select('date', TRACK, ARTIST).sort('date', maintain_order=True).unique(subset=TRACK, keep='first', maintain_order=True).drop('date')
+        week_id = pl.format('{}-W{}', pl.col('date').dt.iso_year(), pl.col('date').dt.week().cast(pl.String).str.zfill(2))
+        rank = pl.int_range(1, pl.len() + 1).over('week_id')
+        query = (
+            frame.drop_nulls(TRACK)
+            .group_by(week_id.alias('week_id'), TRACK).agg(pl.col('minutes').sum())
+            .sort(['week_id', 'minutes', TRACK], descending=[False, True, False])
+            .with_columns(rank.cast(pl.Int64).alias('rank'))
+            .filter(pl.col('rank') <= len(ranking.POINTS_MAP))
+            .with_columns(pl.col('rank').replace_strict(ranking.POINTS_MAP, return_dtype=pl.Int64).alias('points'))
+            .join(track_artist_map, on=TRACK, how='left', maintain_order='left')
+        )
+        return _collect(query).to_pandas()
+
+    def _race_input(self, events, item_col, time_period, metric_type):
+        frame = _lazy(events, ['ts', 'minutes', item_col]).with_columns(_period_id(time_period).alias('period_id'))
+        value = pl.col('minutes').sum() if metric_type == 'Minutes' else pl.col('ts').count().cast(pl.Int64)
+        return frame, value.alias('value')
+
+    def periodic_race(self, events, item_col, time_period, metric_type, top_n):
+        frame, value = self._race_input(events, item_col, time_period, metric_type)
+        rank = pl.int_range(1, pl.len() + 1).over('period_id').cast(pl.Float64)
+        query = (
+            frame.drop_nulls(item_col).group_by('period_id', item_col).agg(value)
+            .sort(['period_id', 'value', item_col], descending=[False, True, False])
+            .with_columns(rank.alias('rank'))
+            .filter(pl.col('rank') <= top_n)
+        )
+        return _collect(query).to_pandas()
+
+    def cumulative_race(self, events, item_col, time_period, metric_type, top_n):
+        frame, value = self._race_input(events, item_col, time_period, metric_type)
+        # Running totals only on the (item, period) rows that exist
+        running = _collect(
+            frame.drop_nulls(item_col).group_by(item_col, 'period_id').agg(value)
+            .sort([item_col, 'period_id'])
+            .with_columns(pl.col('value').cum_sum().over(item_col))
+        )
+        periods = _collect(frame.select('period_id').unique().sort('period_id'))['period_id']
+        if running.is_empty():
+            return ranking.cumulative_race(events.iloc[:0], item_col, time_period, metric_type, top_n)
+        changed = running.partition_by('period_id', as_dict=True, include_key=False)
+        # Totals only grow, so an item whose total did not change cannot climb into the top N:
+        # each period's top N is drawn from the items that changed and the previous top N
+        top = running.clear().select(item_col, 'value')
+        frames = []
+        for period in periods:
+            rows = changed.get((period,))
+            if rows is not None:
+                top = pl.concat([top.join(rows, on=item_col, how='anti'), rows])
+            top = top.sort(['value', item_col], descending=[True, False]).head(top_n)
+            frames.append(top.with_columns(pl.lit(period).alias('period_id')))
+        rank = pl.int_range(1, pl.len() + 1).over('period_id').cast(pl.Float64)
+        return pl.concat(frames).with_columns(rank.alias('rank')).to_pandas()
+
+    def daily_streak_stats(self, events):
+        daily = _collect(_lazy(events, ['date', 'minutes']).group_by('date').agg(pl.col('minutes').sum()))
+        if daily.is_empty():
+            return streaks.daily_streak_stats(events.iloc[:0])
+        all_days = pl.DataFrame({'date': pl.date_range(daily['date'].min(), daily['date'].max(), '1d', eager=True)})
+        minutes = all_days.join(daily, on='date', how='left').sort('date')['minutes'].fill_null(0)
+        listened = minutes.filter(minutes > 0)
+        return {
+            'total_days': len(minutes),
+            'days_with': int((minutes > 0).sum()),
+            'days_without': int((minutes == 0).sum()),
+            'max_streak': _longest_run(minutes > 0),
+            'max_zero_streak': _longest_run(minutes == 0),
+            'avg_listening_days': listened.mean() if len(listened) else float('nan'),
+            'avg_all_days': minutes.mean(),
+        }
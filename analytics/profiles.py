@@ -0,0 +1,110 @@
+"""Compare several listening profiles (one export each).
+
+Each profile is reduced to one sparse row of minutes per artist or track. The
+resulting profile × entity CSR matrix is all the comparisons need, so dozens
+of profiles never turn into dense per-profile frames. Only P × P similarity
+tables and the handful of shared top entities are made dense.
+
+A profile matrix is a plain dict: ``{'profiles': [...], 'entities': Index,
+'matrix': csr_matrix}``.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+PERIODS = ('Yearly', 'Monthly')
+
+
+def _stack(sums):
+    """CSR matrix from one minutes-per-key Series per row; returns (matrix, keys)."""
+    codes, keys = pd.factorize(np.concatenate([s.index.to_numpy() for s in sums]) if sums else np.array([], dtype=object))
+    rows = np.repeat(np.arange(len(sums)), [len(s) for s in sums])
+    data = np.concatenate([s.to_numpy(dtype=float) for s in sums]) if sums else np.array([])
+    return sparse.csr_matrix((data, (rows, codes)), shape=(len(sums), len(keys))), pd.Index(keys)
+
+
+def profile_matrix(profile_events, col):
+    """Profile × entity minutes for `col`; `profile_events` maps profile name → events."""
+    sums = [events.groupby(col, sort=False)['minutes'].sum() for events in profile_events.values()]
+    matrix, entities = _stack(sums)
+    return {'profiles': list(profile_events), 'entities': entities, 'matrix': matrix}
+
+
+def jaccard(matrix):
+    """Pairwise Jaccard overlap of the entity sets of each row."""
+    binary = (matrix > 0).astype(np.float64)
+    shared = (binary @ binary.T).toarray()
+    sizes = np.diag(shared)
+    union = sizes[:, None] + sizes[None, :] - shared
+    return np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+
+
+def cosine(matrix):
+    """Pairwise cosine similarity of the minutes vectors of each row."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = sparse.diags(inverse) @ matrix
+    return (normalized @ normalized.T).toarray()
+
+
+def similarity(pm, metric='cosine'):
+    values = cosine(pm['matrix']) if metric == 'cosine' else jaccard(pm['matrix'])
+    return pd.DataFrame(values, index=pm['profiles'], columns=pm['profiles'])
+
+
+def top_entities(pm, top_n):
+    """Column indices of each profile's `top_n` entities by minutes, read from the CSR rows."""
+    matrix = pm['matrix']
+    tops = []
+    for i in range(matrix.shape[0]):
+        row = slice(matrix.indptr[i], matrix.indptr[i + 1])
+        order = np.argsort(-matrix.data[row], kind='stable')[:top_n]
+        tops.append(matrix.indices[row][order])
+    return tops
+
+
+def shared_top(pm, top_n=25, min_profiles=2):
+    """Entities in the top `top_n` of at least `min_profiles` profiles, with each profile's minutes."""
+    tops = top_entities(pm, top_n)
+    in_tops = np.bincount(np.concatenate(tops), minlength=len(pm['entities'])) if tops else np.zeros(0, dtype=int)
+    shared = np.flatnonzero(in_tops >= min_profiles)
+    minutes = pd.DataFrame(pm['matrix'][:, shared].T.toarray(), columns=pm['profiles'])
+    table = pd.DataFrame({'entity': pm['entities'][shared], 'profiles': in_tops[shared], 'total_minutes': minutes.sum(axis=1).to_numpy()})
+    table = pd.concat([table, minutes], axis=1)
+    return table.sort_values(['profiles', 'total_minutes'], ascending=False, kind='stable').reset_index(drop=True)
+
+
+def divergence_over_time(profile_events, col, period='Yearly'):
+    """Cosine distance between every pair of profiles in each period both were active.
+
+    All (period, profile) rows share one sparse matrix; each period is a
+    contiguous block of P rows.
+    """
+    names = list(profile_events)
+    sums = []
+    for events in profile_events.values():
+        # Integer period keys (2023 or 202301); only the unique ones are formatted as labels
+        labels = (events['year'] if period == 'Yearly' else events['year'] * 100 + events['month']).rename('period')
+        sums.append(events.groupby([labels, col], sort=False)['minutes'].sum())
+    period_codes, periods = pd.factorize(np.concatenate([s.index.get_level_values('period').to_numpy() for s in sums]), sort=True)
+    entity_codes, entities = pd.factorize(np.concatenate([s.index.get_level_values(col).to_numpy() for s in sums]))
+    profile_codes = np.repeat(np.arange(len(sums)), [len(s) for s in sums])
+    n = len(names)
+    matrix = sparse.csr_matrix(
+        (np.concatenate([s.to_numpy(dtype=float) for s in sums]), (period_codes * n + profile_codes, entity_codes)),
+        shape=(len(periods) * n, len(entities)))
+
+    periods = [str(p) if period == 'Yearly' else f"{p // 100}-{p % 100:02d}" for p in periods]
+    a, b = np.triu_indices(n, k=1)
+    records = []
+    for k, label in enumerate(periods):
+        block = matrix[k * n:(k + 1) * n]
+        active = np.diff(block.indptr) > 0
+        both = active[a] & active[b]
+        if both.any():
+            distance = 1 - cosine(block)[a[both], b[both]]
+            records.append(pd.DataFrame({'period': label, 'profile_a': np.array(names)[a[both]], 'profile_b': np.array(names)[b[both]], 'divergence': distance}))
+    if not records:
+        return pd.DataFrame(columns=['period', 'profile_a', 'profile_b', 'divergence'])
+    return pd.concat(records, ignore_index=True)
@@ -0,0 +1,168 @@
+"""F1-style weekly chart ranking."""
+
+import numpy as np
+import pandas as pd
+
+from analytics import asof, taskgraph
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+POINTS_MAP = {1: 25, 2: 18, 3: 15, 4: 12, 5: 10, 6: 8, 7: 6, 8: 4, 9: 2, 10: 1}
+
+
+def week_ids(dates):
+    """ISO week labels ('2023-W07') for a Series of dates or timestamps."""
+    iso = pd.to_datetime(dates).dt.isocalendar()
+    return iso.year.astype(str) + '-W' + iso.week.astype(str).str.zfill(2)
+
+
+def weekly_ranking(daily):
+    """Weekly top 10 tracks by minutes with F1 points.
+
+    `daily` is a daily rollup (or raw events): any frame with `date`, track,
+    artist and `minutes` columns. Ties inside a week keep track-name order.
+    """
+    if daily.empty:
+        return pd.DataFrame(columns=['week_id', TRACK, 'minutes', 'rank', 'points', ARTIST])
+    track_artist_map = daily.sort_values('date', kind='stable').drop_duplicates(subset=[TRACK])[[TRACK, ARTIST]]
+    weekly_minutes = daily.assign(week_id=week_ids(daily['date']).to_numpy()).groupby(['week_id', TRACK])['minutes'].sum().reset_index()
+    weekly_minutes = weekly_minutes.sort_values(['week_id', 'minutes'], ascending=[True, False], kind='stable')
+    weekly_minutes['rank'] = weekly_minutes.groupby('week_id').cumcount() + 1
+    weekly_ranking_df = weekly_minutes[weekly_minutes['rank'] <= len(POINTS_MAP)].copy()
+    weekly_ranking_df['points'] = weekly_ranking_df['rank'].map(POINTS_MAP)
+    weekly_ranking_df = pd.merge(weekly_ranking_df, track_artist_map, on=TRACK, how='left')
+    return weekly_ranking_df
+
+
+# ─────────────────────────────────────────────
+#  INDEXED WEEKLY RANKING
+# ─────────────────────────────────────────────
+
+THRESHOLDS = (1, 3, 5, 10)
+
+
+def _slices(keys):
+    """{key: slice} over a frame already sorted by `keys`."""
+    values = keys.to_numpy()
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]]) if len(values) else np.array([], dtype=int)
+    stops = np.r_[starts[1:], len(values)]
+    return {values[start]: slice(start, stop) for start, stop in zip(starts, stops)}
+
+
+def _longest_runs(tracks, week_ordinals, mask):
+    """Longest run of consecutive weeks per track among the rows in `mask` (rows sorted by track, week)."""
+    tracks, weeks = tracks[mask], week_ordinals[mask]
+    if not len(tracks):
+        return pd.Series(dtype='int64')
+    breaks = np.r_[True, (tracks[1:] != tracks[:-1]) | (np.diff(weeks) != 1)]
+    run_ids = np.cumsum(breaks) - 1
+    run_lengths = np.bincount(run_ids)
+    return pd.Series(run_lengths, index=tracks[breaks]).groupby(level=0).max()
+
+
+def _week_ordinals(by_track):
+    # Weeks since the epoch of each ISO week's Monday, so streaks carry over year ends
+    mondays = pd.to_datetime(by_track['week_id'] + '-1', format='%G-W%V-%u')
+    return (mondays - pd.Timestamp('1970-01-05')).dt.days.to_numpy() // 7
+
+
+def _threshold_records(by_track, week_ordinals, threshold):
+    """(weeks in the top `threshold`, longest run of consecutive such weeks) per track."""
+    tracks = by_track[TRACK].to_numpy()
+    in_top = by_track['rank'].to_numpy() <= threshold
+    return pd.Series(in_top, index=tracks).groupby(level=0, sort=False).sum(), _longest_runs(tracks, week_ordinals, in_top)
+
+
+def index_weekly_ranking(weekly):
+    """Weekly ranking prepared for constant-time lookups in the Weekly Ranking tab.
+
+    A plain dict: ``by_week`` / ``by_track`` are the ranking sorted by (week,
+    rank) and (track, week), with ``week_rows`` / ``track_rows`` mapping each
+    week or track to its slice of rows. ``weeks`` (newest first) and ``tracks``
+    (sorted) feed the selectboxes. ``summary`` has one row per track (points,
+    minutes, best rank, weeks and longest streak in each top-N of
+    `THRESHOLDS`, debut week and rank), ``artists`` one per artist.
+    """
+    # The sorts, the per-threshold week counts and streaks, and the artist table are independent tasks
+    graph = taskgraph.TaskGraph()
+    graph.add('by_week', lambda: weekly.sort_values(['week_id', 'rank'], kind='stable').reset_index(drop=True))
+    graph.add('by_track', lambda: weekly.sort_values([TRACK, 'week_id'], kind='stable').reset_index(drop=True))
+    graph.add('week_ordinals', _week_ordinals, 'by_track')
+    graph.add('summary', lambda by_track: by_track.groupby(TRACK, sort=False).agg(
+        total_points=('points', 'sum'), total_minutes=('minutes', 'sum'), best_rank=('rank', 'min'),
+        debut_week=('week_id', 'first'), debut_rank=('rank', 'first')), 'by_track')
+    for threshold in THRESHOLDS:
+        graph.add(f'top{threshold}', lambda by_track, week_ordinals, threshold=threshold: _threshold_records(by_track, week_ordinals, threshold), 'by_track', 'week_ordinals')
+    graph.add('artists', lambda: weekly.groupby(ARTIST).agg(total_points=('points', 'sum'), chart_hits=(TRACK, 'nunique')))
+    graph.add('week_rows', lambda by_week: _slices(by_week['week_id']), 'by_week')
+    graph.add('track_rows', lambda by_track: _slices(by_track[TRACK]), 'by_track')
+    results = graph.run()
+
+    summary = results['summary']
+    for threshold in THRESHOLDS:
+        summary[f'weeks_top{threshold}'], summary[f'streak_top{threshold}'] = results[f'top{threshold}']
+    summary = summary.fillna(0).astype({f'{kind}_top{t}': 'int64' for kind in ('weeks', 'streak') for t in THRESHOLDS})
+    summary = summary.sort_values('total_points', ascending=False, kind='stable')
+    return {
+        'by_week': results['by_week'],
+        'week_rows': results['week_rows'],
+        'by_track': results['by_track'],
+        'track_rows': results['track_rows'],
+        'weeks': sorted(results['by_week']['week_id'].unique(), reverse=True),
+        'tracks': sorted(summary.index),
+        'summary': summary,
+        'artists': results['artists'],
+    }
+
+
+def week_rows(index, week_id):
+    return index['by_week'].iloc[index['week_rows'].get(week_id, slice(0, 0))]
+
+
+def track_rows(index, track):
+    return index['by_track'].iloc[index['track_rows'].get(track, slice(0, 0))]
+
+
+# ─────────────────────────────────────────────
+#  RANKING RACE
+# ─────────────────────────────────────────────
+
+PERIOD_FREQ = {'Weekly': 'W', 'Monthly': 'M', 'Yearly': 'Y'}
+
+
+def period_ids(ts, time_period):
+    """Period labels ('2023-01', '2023-01-02/2023-01-08', ...) for the race charts."""
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_localize(None)
+    return ts.dt.to_period(PERIOD_FREQ[time_period]).astype(str)
+
+
+def _race_input(events, item_col, time_period, metric_type):
+    metric_col = 'minutes' if metric_type == 'Minutes' else 'ts'
+    agg_func = 'sum' if metric_type == 'Minutes' else 'count'
+    frame = events[[item_col, metric_col]].assign(period_id=period_ids(events['ts'], time_period))
+    return frame, metric_col, agg_func
+
+
+def periodic_race(events, item_col, time_period, metric_type, top_n):
+    """Top N items inside each period."""
+    frame, metric_col, agg_func = _race_input(events, item_col, time_period, metric_type)
+    periodic_data = frame.groupby(['period_id', item_col])[metric_col].agg(agg_func).reset_index(name='value')
+    periodic_data['rank'] = periodic_data.groupby('period_id')['value'].rank(method='first', ascending=False)
+    return periodic_data[periodic_data['rank'] <= top_n].sort_values(['period_id', 'rank'])
+
+
+def cumulative_race(events, item_col, time_period, metric_type, top_n):
+    """Top N items by running total at the end of each period, read from an as-of index."""
+    if events.empty:
+        return pd.DataFrame(columns=[item_col, 'value', 'period_id', 'rank'])
+    index = asof.build_asof_index(events, item_col)
+    # Each period is read at its last listening day; nothing changes between that day and the period's end.
+    # Periods depend on the day only, so only the distinct listening days are labelled
+    days = pd.Series(index['days'])
+    period_end = days.groupby(period_ids(pd.Series(pd.to_datetime(index['days'], unit='D')), time_period).to_numpy()).max()
+    frames = asof.running_standings(index, period_end.to_numpy(), 'minutes' if metric_type == 'Minutes' else 'plays', top_n)
+    for period, frame in zip(period_end.index, frames):
+        frame['period_id'] = period
+        frame['rank'] = np.arange(1, len(frame) + 1, dtype=float)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,115 @@
+"""Derived rollups kept alongside a saved dataset.
+
+A rollup set is a plain dict:
+
+- ``daily``: minutes and plays per (date, track, artist, album)
+- ``first_listen``: first timestamp per track, artist and album
+- ``weekly``: the weekly F1 ranking over the whole history
+- ``track_stats``: completion and skip statistics per (track, artist)
+- ``sketches``: HyperLogLog sketches per day for distinct tracks, artists and
+  albums; only present while approximate counting is enabled
+
+Every sidebar filter (date range, artist, album, track) maps onto the daily
+rollup keys, so filtered aggregations can start from it instead of events.
+"""
+
+import pandas as pd
+
+from analytics import ranking, sketches, trackstats
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ALBUM = 'master_metadata_album_album_name'
+DAILY_KEYS = ['date', TRACK, ARTIST, ALBUM]
+ENTITY_COLUMNS = {'track': TRACK, 'artist': ARTIST, 'album': ALBUM}
+
+
+def build_daily_rollup(events):
+    return events.groupby(DAILY_KEYS, dropna=False, sort=False).agg(
+        minutes=('minutes', 'sum'),
+        plays=('ts', 'count')
+    ).reset_index()
+
+
+def build_first_listen(events):
+    return {kind: events.groupby(col)['ts'].min() for kind, col in ENTITY_COLUMNS.items()}
+
+
+def build_rollups(events):
+    daily = build_daily_rollup(events)
+    built = {
+        'daily': daily,
+        'first_listen': build_first_listen(events),
+        'weekly': ranking.weekly_ranking(daily),
+        'track_stats': trackstats.build_track_stats(events),
+    }
+    if sketches.approximate_requested():
+        built['sketches'] = sketches.build_sketches(events)
+    return built
+
+
+def complete_rollups(rollups, events):
+    """Build any rollup missing from a set saved by an older version.
+
+    Sketches are built the first time approximate counting is enabled for a
+    set saved without them (or sketched at another precision).
+    """
+    if 'track_stats' not in rollups:
+        rollups = dict(rollups, track_stats=trackstats.build_track_stats(events))
+    if sketches.approximate_requested() and rollups.get('sketches', {}).get('precision') != sketches.configured_precision():
+        rollups = dict(rollups, sketches=sketches.build_sketches(events))
+    return rollups
+
+
+def update_rollups(rollups, added, events):
+    """Fold newly added (already deduplicated) events into existing rollups.
+
+    Only daily rows for the days touched by `added` and ranking rows for the
+    weeks touched by `added` are recomputed. Track stats depend on quantiles
+    and play order, so they are rebuilt from `events`, the merged history.
+    """
+    daily = rollups['daily']
+    new_daily = build_daily_rollup(added)
+    touched_days = daily['date'].isin(new_daily['date'].unique())
+    touched = pd.concat([daily[touched_days], new_daily]).groupby(DAILY_KEYS, dropna=False, sort=False).agg(
+        minutes=('minutes', 'sum'),
+        plays=('plays', 'sum')
+    ).reset_index()
+    daily = pd.concat([daily[~touched_days], touched], ignore_index=True)
+
+    first_listen = {}
+    new_first = build_first_listen(added)
+    for kind, series in rollups['first_listen'].items():
+        first_listen[kind] = pd.concat([series, new_first[kind]]).groupby(level=0).min()
+
+    affected_weeks = ranking.week_ids(new_daily['date']).unique()
+    daily_weeks = ranking.week_ids(daily['date'])
+    week_rows = daily[daily_weeks.isin(affected_weeks).to_numpy()]
+    weekly = rollups['weekly']
+    # The track → artist label comes from the earliest daily row of each track
+    weekly = pd.concat([
+        weekly[~weekly['week_id'].isin(affected_weeks)],
+        ranking.weekly_ranking(week_rows)
+    ], ignore_index=True).sort_values(['week_id', 'rank'], kind='stable').reset_index(drop=True)
+    artist_of = daily.sort_values('date', kind='stable').drop_duplicates(subset=[TRACK]).set_index(TRACK)[ARTIST]
+    weekly[ARTIST] = weekly[TRACK].map(artist_of)
+
+    updated = {
+        'daily': daily,
+        'first_listen': first_listen,
+        'weekly': weekly,
+        'track_stats': trackstats.build_track_stats(events),
+    }
+    # Without approximate counting, saved sketches are dropped rather than left stale
+    if sketches.approximate_requested():
+        sketch_set = rollups.get('sketches')
+        if sketch_set and sketch_set['precision'] == sketches.configured_precision():
+            updated['sketches'] = sketches.update_sketches(sketch_set, added)
+        else:
+            updated['sketches'] = sketches.build_sketches(events)
+    return updated
+
+
+def first_listen_years(rollups, kind):
+    """Year of the first ever listen per entity of `kind` ('track', 'artist', 'album')."""
+    return rollups['first_listen'][kind].dt.year
@@ -0,0 +1,62 @@
+"""Stratified time samples for quick previews of large histories.
+
+A preview keeps the same fraction of plays from every calendar month, so each
+part of the history is represented in proportion to how much was played then.
+Every sampled play carries a `weight`: its month's plays per sampled play.
+Estimates scale sums and counts by that weight. Distinct counts cannot be
+scaled, so those are the ones seen in the sample (a lower bound). A month
+always keeps at least one play.
+
+Progressive rendering is opt-in with `SPOTIFY_STATS_PROGRESSIVE=1`.
+"""
+
+import os
+
+import numpy as np
+
+TRACK = 'master_metadata_track_name'
+PROGRESSIVE_ENV = "SPOTIFY_STATS_PROGRESSIVE"
+PREVIEW_ROWS = 20_000
+# Below this many events the exact results are quick enough to wait for
+PROGRESSIVE_MIN_EVENTS = 4 * PREVIEW_ROWS
+
+
+def progressive_requested():
+    return os.environ.get(PROGRESSIVE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def preview_fraction(n_events, rows=PREVIEW_ROWS):
+    return min(1.0, rows / n_events) if n_events else 1.0
+
+
+def stratified_sample(events, fraction, seed=0):
+    """About `fraction` of the plays of every month, in time order, with a `weight` column."""
+    strata = events['year'].to_numpy(dtype=np.int64) * 12 + events['month'].to_numpy(dtype=np.int64)
+    order = np.argsort(strata, kind='stable')
+    _, starts, sizes = np.unique(strata[order], return_index=True, return_counts=True)
+    rng = np.random.default_rng(seed)
+    picks, weights = [], []
+    for start, size in zip(starts, sizes):
+        k = max(1, int(round(size * fraction)))
+        picks.append(order[start + rng.choice(size, k, replace=False)])
+        weights.append(np.full(k, size / k))
+    picks = np.concatenate(picks) if picks else np.array([], dtype=np.int64)
+    weights = np.concatenate(weights) if weights else np.array([])
+    keep = np.argsort(picks, kind='stable')
+    return events.iloc[picks[keep]].assign(weight=weights[keep]).reset_index(drop=True)
+
+
+def scaled_minutes(sample):
+    """The sample with `minutes` scaled by weight, for code that only sums minutes."""
+    return sample.assign(minutes=sample['minutes'] * sample['weight'])
+
+
+def estimate_top_items(sample, keys, n):
+    """Weighted counterpart of `backend.top_items`: estimated minutes and plays per group."""
+    grouped = sample.assign(weighted=sample['minutes'] * sample['weight']).groupby(keys).agg(
+        total_minutes=('weighted', 'sum'),
+        play_count=('weight', 'sum'),
+        unique_tracks=(TRACK, 'nunique')
+    )
+    grouped['play_count'] = grouped['play_count'].round().astype(int)
+    return grouped.sort_values('total_minutes', ascending=False, kind='stable').head(n).reset_index()
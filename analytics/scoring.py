@@ -0,0 +1,104 @@
+"""Chart standings under several points systems at once.
+
+Every period (week, month or year) ranks tracks, artists or albums by
+minutes, plays or a blend of both. Only the finishing positions matter for
+scoring, so each entity is reduced to one row of a rank-indicator table:
+how many periods it finished 1st, 2nd, ... down to the deepest points table.
+Standings for any number of schemes are then a single matrix product of that
+table with a positions × schemes points matrix.
+"""
+
+import numpy as np
+import pandas as pd
+
+from analytics import ranking
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ALBUM = 'master_metadata_album_album_name'
+ENTITY_COLUMNS = {'Tracks': TRACK, 'Artists': ARTIST, 'Albums': ALBUM}
+CADENCES = ('Weekly', 'Monthly', 'Yearly')
+METRICS = ('Minutes', 'Plays', 'Blended')
+BLEND_WEIGHT = 0.5
+
+SCHEMES = {
+    'F1 (2010+)': list(ranking.POINTS_MAP.values()),
+    'F1 (1991-2002)': [10, 6, 4, 3, 2, 1],
+    'MotoGP': [25, 20, 16, 13, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1],
+    'Eurovision': [12, 10, 8, 7, 6, 5, 4, 3, 2, 1],
+    'Winner takes all': [1],
+    'Top 10 linear': list(range(10, 0, -1)),
+}
+
+
+def period_labels(dates, cadence):
+    """'2023-W07', '2023-02' or '2023' for each date; each distinct date is formatted once."""
+    codes, uniques = pd.factorize(dates)
+    uniques = pd.Series(pd.to_datetime(uniques))
+    if cadence == 'Weekly':
+        labels = ranking.week_ids(uniques)
+    elif cadence == 'Monthly':
+        labels = uniques.dt.strftime('%Y-%m')
+    else:
+        labels = uniques.dt.year.astype(str)
+    return labels.to_numpy()[codes]
+
+
+def period_values(daily, col, cadence, metric, blend_weight=BLEND_WEIGHT):
+    """Score per (period, entity) from the daily rollup.
+
+    'Blended' mixes each entity's share of the period's minutes and of its
+    plays, weighted `blend_weight` towards minutes.
+    """
+    frame = daily[[col, 'minutes', 'plays']].assign(period=period_labels(daily['date'], cadence))
+    values = frame.groupby(['period', col])[['minutes', 'plays']].sum().reset_index()
+    if metric == 'Minutes':
+        values['value'] = values['minutes']
+    elif metric == 'Plays':
+        values['value'] = values['plays'].astype(float)
+    else:
+        totals = values.groupby('period')[['minutes', 'plays']].transform('sum')
+        values['value'] = blend_weight * values['minutes'] / totals['minutes'].where(totals['minutes'] > 0) \
+            + (1 - blend_weight) * values['plays'] / totals['plays']
+        values['value'] = values['value'].fillna(0)
+    return values[['period', col, 'value']]
+
+
+def rank_table(daily, col, cadence, metric, depth=None):
+    """Rank-indicator table: entities × positions, counting the periods finished at each position.
+
+    Ties inside a period keep entity-name order, as in the weekly ranking.
+    """
+    depth = depth or max(len(points) for points in SCHEMES.values())
+    values = period_values(daily, col, cadence, metric)
+    values = values.sort_values(['period', 'value'], ascending=[True, False], kind='stable')
+    position = values.groupby('period').cumcount().to_numpy()
+    placed = position < depth
+    codes, entities = pd.factorize(values[col].to_numpy()[placed])
+    counts = np.zeros((len(entities), depth), dtype=np.int64)
+    np.add.at(counts, (codes, position[placed]), 1)
+    return pd.DataFrame(counts, index=pd.Index(entities, name=col), columns=range(1, depth + 1))
+
+
+def points_matrix(schemes, depth):
+    """Positions × schemes points, each table zero-padded (or cut) to `depth` positions."""
+    matrix = np.zeros((depth, len(schemes)))
+    for j, points in enumerate(schemes.values()):
+        points = points[:depth]
+        matrix[:len(points), j] = points
+    return matrix
+
+
+def standings(ranks, schemes=None):
+    """Points per entity under every scheme: one (entities × positions) @ (positions × schemes) product."""
+    schemes = schemes or SCHEMES
+    points = ranks.to_numpy() @ points_matrix(schemes, ranks.shape[1])
+    table = pd.DataFrame(points, index=ranks.index, columns=list(schemes))
+    table['wins'] = ranks[1].to_numpy() if ranks.shape[1] else 0
+    table['podiums'] = ranks.iloc[:, :3].sum(axis=1).to_numpy()
+    return table.sort_values(list(schemes)[0], ascending=False, kind='stable')
+
+
+def all_standings(daily, cadence, metric, schemes=None):
+    """Standings for tracks, artists and albums at one cadence and metric."""
+    return {entity: standings(rank_table(daily, col, cadence, metric), schemes) for entity, col in ENTITY_COLUMNS.items()}
@@ -0,0 +1,177 @@
+"""Listening sessions rebuilt from play end times.
+
+Spotify stamps each event with the time playback *ended*, so a play covers
+`[ts - ms_played, ts]`. A new session starts whenever the idle time between
+the end of everything played so far and the start of the next play exceeds
+the gap. Sessionization is one sort plus diff/cumsum; no Python loops.
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_GAP_MINUTES = 30
+SESSION_COLUMNS = ['session', 'start', 'end', 'date', 'plays', 'listened_minutes', 'length_minutes']
+
+
+def _play_bounds(events):
+    """Sort order plus play start/end as int64 nanoseconds in that order."""
+    end = events['ts'].dt.as_unit('ns').to_numpy(dtype=np.int64)
+    order = np.argsort(end, kind='stable')
+    end = end[order]
+    start = end - events['ms_played'].to_numpy(dtype=np.int64)[order] * 1_000_000
+    return order, start, end
+
+
+def _new_session_flags(start, end, gap_minutes):
+    # Overlapping plays (device switches) must not end a session early, so compare to the running max end
+    idle = start[1:] - np.maximum.accumulate(end)[:-1]
+    return np.concatenate([[True], idle > gap_minutes * 60 * 1_000_000_000])
+
+
+def _timestamps(nanoseconds, tz):
+    stamps = pd.DatetimeIndex(nanoseconds.view('datetime64[ns]'))
+    return stamps.tz_localize('UTC').tz_convert(tz) if tz is not None else stamps
+
+
+def session_ids(events, gap_minutes=DEFAULT_GAP_MINUTES):
+    """Session number for every event, aligned to `events.index`."""
+    ids = np.zeros(len(events), dtype=np.int64)
+    if len(events):
+        order, start, end = _play_bounds(events)
+        ids[order] = np.cumsum(_new_session_flags(start, end, gap_minutes)) - 1
+    return pd.Series(ids, index=events.index, name='session')
+
+
+def session_table(events, gap_minutes=DEFAULT_GAP_MINUTES):
+    """One row per session: start, end, plays, minutes listened and wall-clock length."""
+    if events.empty:
+        return pd.DataFrame(columns=SESSION_COLUMNS)
+    order, start, end = _play_bounds(events)
+    first = np.flatnonzero(_new_session_flags(start, end, gap_minutes))
+    tz = events['ts'].dt.tz
+    sessions = pd.DataFrame({
+        'session': np.arange(len(first)),
+        'start': _timestamps(np.minimum.reduceat(start, first), tz),
+        'end': _timestamps(np.maximum.reduceat(end, first), tz),
+        'plays': np.diff(np.append(first, len(order))),
+        'listened_minutes': np.add.reduceat(events['minutes'].to_numpy(dtype=float)[order], first),
+    })
+    sessions['length_minutes'] = (sessions['end'] - sessions['start']).dt.total_seconds() / 60
+    sessions['date'] = sessions['start'].dt.date
+    return sessions[SESSION_COLUMNS]
+
+
+def sessions_per_day(sessions):
+    """Sessions started on each calendar day, zero-filled between the first and last day."""
+    per_day = sessions.groupby('date').size()
+    if per_day.empty:
+        return per_day
+    full_date_range = pd.date_range(start=per_day.index.min(), end=per_day.index.max())
+    return per_day.reindex(full_date_range.date, fill_value=0).rename_axis('date')
+
+
+def session_summary(sessions):
+    if sessions.empty:
+        return {'sessions': 0, 'median_length': float('nan'), 'mean_length': float('nan'), 'median_plays': float('nan'), 'longest_length': float('nan')}
+    return {
+        'sessions': len(sessions),
+        'median_length': sessions['length_minutes'].median(),
+        'mean_length': sessions['length_minutes'].mean(),
+        'median_plays': sessions['plays'].median(),
+        'longest_length': sessions['length_minutes'].max(),
+    }
+
+
+# ─────────────────────────────────────────────
+#  REPEATS, BINGES & FULL ALBUMS
+# ─────────────────────────────────────────────
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ALBUM = 'master_metadata_album_album_name'
+MIN_REPEAT_PLAYS = 2
+MIN_BINGE_PLAYS = 10
+MIN_ALBUM_TRACKS = 4
+RUN_COLUMNS = {
+    'repeats': [TRACK, ARTIST, 'plays', 'minutes', 'start', 'end', 'date'],
+    'binges': [ARTIST, 'plays', 'minutes', 'start', 'end', 'date'],
+    'albums': [ALBUM, ARTIST, 'tracks', 'plays', 'minutes', 'start', 'end', 'date'],
+}
+
+
+def _pair_codes(first, second):
+    """One dense integer per (first, second) pair of factorized codes; -1 where either is missing.
+
+    Codes run from 0 to the number of distinct pairs, so arrays indexed by them
+    stay sized by the pairs seen rather than by names × artists.
+    """
+    valid = (first >= 0) & (second >= 0)
+    codes = np.full(len(first), -1, dtype=np.int64)
+    codes[valid] = pd.factorize(first[valid].astype(np.int64) * (int(second.max(initial=0)) + 1) + second[valid])[0]
+    return codes
+
+
+def _run_starts(codes, new_session):
+    # A run ends where the code changes or a session ends
+    return np.flatnonzero(np.concatenate([[True], (codes[1:] != codes[:-1]) | new_session[1:]]))
+
+
+def listening_runs(events, gap_minutes=DEFAULT_GAP_MINUTES, min_repeat=MIN_REPEAT_PLAYS, min_binge=MIN_BINGE_PLAYS, min_album_tracks=MIN_ALBUM_TRACKS):
+    """Leaderboards of back-to-back runs in the time-ordered play stream.
+
+    - ``repeats``: the same track (name and artist) at least `min_repeat` times in a row
+    - ``binges``: at least `min_binge` consecutive plays of one artist
+    - ``albums``: an album played front to back: an unshuffled run of one album
+      (name and artist) covering every track of it seen in `events`, at least
+      `min_album_tracks` of them. Exports carry no track numbers, so the order
+      inside the run is not checked.
+
+    Runs never span a session break (`gap_minutes` of silence). Each
+    leaderboard is sorted by plays, then minutes.
+    """
+    if events.empty:
+        return {kind: pd.DataFrame(columns=columns) for kind, columns in RUN_COLUMNS.items()}
+    order, start, end = _play_bounds(events)
+    new_session = _new_session_flags(start, end, gap_minutes)
+    minutes = events['minutes'].to_numpy(dtype=float)[order]
+    shuffled = events['shuffle'].fillna(False).to_numpy(dtype=bool)[order] if 'shuffle' in events else np.zeros(len(order), dtype=bool)
+    # Strings are hashed once in their stored order; only the integer codes are put in time order
+    artist = pd.factorize(events[ARTIST])[0][order]
+    track = _pair_codes(pd.factorize(events[TRACK])[0][order], artist)
+    album = _pair_codes(pd.factorize(events[ALBUM])[0][order], artist)
+    tz = events['ts'].dt.tz
+
+    def leaderboard(kind, codes, keep, starts, lengths, **extra):
+        first = starts[keep]
+        table = events.iloc[order[first]][[TRACK, ARTIST, ALBUM]].reset_index(drop=True)
+        table['plays'] = lengths[keep]
+        table['minutes'] = np.add.reduceat(minutes, starts)[keep]
+        table['start'] = _timestamps(start[first], tz)
+        table['end'] = _timestamps(end[first + lengths[keep] - 1], tz)
+        table['date'] = table['start'].dt.date
+        for name, values in extra.items():
+            table[name] = values
+        return table[RUN_COLUMNS[kind]].sort_values(['plays', 'minutes'], ascending=False, kind='stable').reset_index(drop=True)
+
+    runs = {}
+    for kind, codes, minimum in [('repeats', track, min_repeat), ('binges', artist, min_binge)]:
+        starts = _run_starts(codes, new_session)
+        lengths = np.diff(np.append(starts, len(codes)))
+        runs[kind] = leaderboard(kind, codes, (lengths >= minimum) & (codes[starts] >= 0), starts, lengths)
+
+    # Album runs: distinct tracks per run against the distinct tracks each album has overall
+    starts = _run_starts(album, new_session)
+    lengths = np.diff(np.append(starts, len(album)))
+    run_of = np.repeat(np.arange(len(starts)), lengths)
+    candidate = (album[starts] >= 0) & (lengths >= min_album_tracks) & (np.add.reduceat(shuffled.astype(np.int64), starts) == 0)
+    rows = candidate[run_of] & (track >= 0)
+    n_tracks = int(track.max(initial=-1)) + 1
+    run_tracks = np.bincount(np.unique(run_of[rows] * n_tracks + track[rows]) // n_tracks, minlength=len(starts))
+    # Track counts are only needed for the albums that have a candidate run
+    wanted = np.zeros(int(album.max(initial=-1)) + 1, dtype=bool)
+    wanted[album[starts[candidate]]] = True
+    known = wanted[np.maximum(album, 0)] & (album >= 0) & (track >= 0)
+    album_tracks = np.bincount(np.unique(album[known] * n_tracks + track[known]) // n_tracks, minlength=len(wanted))
+    complete = candidate & (run_tracks >= min_album_tracks) & (run_tracks == album_tracks[np.maximum(album[starts], 0)])
+    runs['albums'] = leaderboard('albums', album, complete, starts, lengths, tracks=run_tracks[complete])
+    return runs
@@ -0,0 +1,104 @@
+"""Preprocessed datasets shared between server processes.
+
+With `SPOTIFY_STATS_SHARED_DIR` set (ideally to a tmpfs such as
+/dev/shm/spotify_stats), the first worker process that loads an export or a
+saved dataset publishes the prepared events as an uncompressed Arrow IPC
+file named after the dataset's hash, next to its pickled rollups. Every
+other worker memory-maps that file instead of re-parsing. Numeric and
+timestamp columns and the string columns (as `string[pyarrow]`) point
+straight into the mapping, so the bulk of a dataset lives once in the page
+cache however many workers attach to it.
+
+Files are written to a temporary name and renamed, so readers only ever see
+complete files. Two workers publishing the same hash at once both write and
+the last rename wins, with identical contents. Requires pyarrow.
+"""
+
+import hashlib
+import importlib.util
+import os
+
+import pandas as pd
+
+SHARED_DIR_ENV = "SPOTIFY_STATS_SHARED_DIR"
+HASH_CHUNK = 1 << 20
+
+
+def shared_dir():
+    return os.environ.get(SHARED_DIR_ENV) or None
+
+
+def enabled():
+    return shared_dir() is not None and importlib.util.find_spec('pyarrow') is not None
+
+
+def file_hash(file):
+    """Content hash of an uploaded file, identical in every process."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()[:32]
+
+
+def saved_dataset_hash(path, version):
+    return hashlib.sha256(f"{os.path.abspath(path)}:{version}".encode()).hexdigest()[:32]
+
+
+def _paths(digest):
+    root = shared_dir()
+    return os.path.join(root, f"{digest}.arrow"), os.path.join(root, f"{digest}.rollups.pkl")
+
+
+def _replace(path, write):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def publish(digest, events, rollups):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    os.makedirs(shared_dir(), exist_ok=True)
+    events_path, rollups_path = _paths(digest)
+    table = pa.Table.from_pandas(events, preserve_index=False)
+
+    def write_events(path):
+        with pa.OSFile(path, 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    # Rollups first: a reader that sees the events file always finds its rollups
+    _replace(rollups_path, lambda path: pd.to_pickle(rollups, path))
+    _replace(events_path, write_events)
+
+
+def _dtype_for(arrow_type):
+    import pyarrow as pa
+
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def attach(digest):
+    """(events, rollups) mapped from a published dataset, or None if it was never published."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    events_path, rollups_path = _paths(digest)
+    if not os.path.exists(events_path):
+        return None
+    table = ipc.open_file(pa.memory_map(events_path)).read_all()
+    events = table.to_pandas(split_blocks=True, types_mapper=_dtype_for)
+    return events, pd.read_pickle(rollups_path)
+
+
+def attach_or_publish(digest, build):
+    """Attach to a published dataset, building and publishing it first if needed."""
+    dataset = attach(digest)
+    if dataset is None:
+        publish(digest, *build())
+        dataset = attach(digest)
+    return dataset
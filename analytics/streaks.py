@@ -0,0 +1,41 @@
+"""Daily and hourly listening streaks."""
+
+import pandas as pd
+
+
+def _longest_run(active):
+    """Longest run of True values in a boolean Series."""
+    if active.empty:
+        return 0
+    return int(active.astype(int).groupby((~active).cumsum()).sum().max())
+
+
+def daily_streak_stats(events):
+    daily_minutes = events.groupby('date')['minutes'].sum()
+    if daily_minutes.empty:
+        return {'total_days': 0, 'days_with': 0, 'days_without': 0, 'max_streak': 0, 'max_zero_streak': 0, 'avg_listening_days': float('nan'), 'avg_all_days': float('nan')}
+    full_date_range = pd.date_range(start=daily_minutes.index.min(), end=daily_minutes.index.max())
+    daily_minutes = daily_minutes.reindex(full_date_range.date, fill_value=0)
+
+    return {
+        'total_days': len(daily_minutes),
+        'days_with': int((daily_minutes > 0).sum()),
+        'days_without': int((daily_minutes == 0).sum()),
+        'max_streak': _longest_run(daily_minutes > 0),
+        'max_zero_streak': _longest_run(daily_minutes == 0),
+        'avg_listening_days': daily_minutes[daily_minutes > 0].mean(),
+        'avg_all_days': daily_minutes.mean(),
+    }
+
+
+def hourly_minutes(events):
+    """Minutes per clock hour over the full hour range, zero-filled."""
+    hourly = events.groupby(events['ts'].dt.floor('h'))['minutes'].sum()
+    if hourly.empty:
+        return hourly
+    full_hour_range = pd.date_range(start=hourly.index.min(), end=hourly.index.max(), freq='h')
+    return hourly.reindex(full_hour_range, fill_value=0)
+
+
+def longest_hourly_streak(events):
+    return _longest_run(hourly_minutes(events) > 0)
@@ -0,0 +1,83 @@
+"""Concurrent execution of the independent computations behind one view.
+
+A `TaskGraph` names computations and the results each one needs:
+
+    graph = TaskGraph()
+    graph.add('daily', lambda: events.groupby('date')['minutes'].sum())
+    graph.add('best_day', lambda daily: daily.idxmax(), 'daily')
+    results = graph.run()   # {'daily': ..., 'best_day': ...}
+
+`run` starts every task whose inputs are ready on a thread pool shared by the
+process, and returns once all are done. Much of pandas' and NumPy's grouping,
+sorting and reduction work releases the GIL, so independent aggregations
+overlap on several cores. The caller renders the results in order, on its
+own thread. Tasks must not call Streamlit: they run without a script
+context.
+
+Threads default to one, and the tasks run inline in the order they were
+added. `SPOTIFY_STATS_SECTION_THREADS` opts into the pool; `bench.sections`
+measures whether it pays off on a given machine. Tasks inside a task of
+another graph also run inline, so nested graphs never wait on a full pool.
+Each thread count has one pool for the whole process, so concurrent sessions
+queue behind each other's tasks.
+"""
+
+import concurrent.futures
+import os
+import threading
+
+THREADS_ENV = "SPOTIFY_STATS_SECTION_THREADS"
+THREAD_PREFIX = "taskgraph"
+
+_lock = threading.Lock()
+_executors = {}
+
+
+def configured_threads():
+    value = os.environ.get(THREADS_ENV, "").strip()
+    return max(1, int(value)) if value else 1
+
+
+def _executor(threads):
+    with _lock:
+        if threads not in _executors:
+            _executors[threads] = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix=THREAD_PREFIX)
+        return _executors[threads]
+
+
+class TaskGraph:
+    def __init__(self, threads=None):
+        self.threads = threads or configured_threads()
+        self.tasks = {}
+
+    def add(self, name, compute, *needs):
+        """Declare `compute(*results of needs)`. Needed tasks must be added first, so there are no cycles."""
+        missing = [need for need in needs if need not in self.tasks]
+        if name in self.tasks or missing:
+            raise ValueError(f"Task {name!r} is already declared." if name in self.tasks else f"Task {name!r} needs undeclared tasks: {', '.join(missing)}.")
+        self.tasks[name] = (compute, needs)
+        return self
+
+    def run(self):
+        """Results of every task by name. The first task to fail raises its exception here."""
+        if self.threads <= 1 or len(self.tasks) <= 1 or threading.current_thread().name.startswith(THREAD_PREFIX):
+            results = {}
+            for name, (compute, needs) in self.tasks.items():
+                results[name] = compute(*(results[need] for need in needs))
+            return results
+
+        executor = _executor(self.threads)
+        results, running, waiting = {}, {}, dict(self.tasks)
+        try:
+            while waiting or running:
+                for name, (compute, needs) in list(waiting.items()):
+                    if all(need in results for need in needs):
+                        running[executor.submit(compute, *(results[need] for need in needs))] = name
+                        del waiting[name]
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        finally:
+            for future in running:
+                future.cancel()
+        return results
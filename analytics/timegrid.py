@@ -0,0 +1,84 @@
+"""Entity × time-bucket minutes, built once and sliced by every evolution chart.
+
+A time grid holds the minutes of every artist, album or track in every hour,
+day, week, month or year between the first and last event. Entities are
+ordered by total minutes (ties by name, as `nlargest` would). The top
+`DENSE_TOP` rows are kept as a dense NumPy array, so "top N over time"
+is a slice. The long tail is a CSR matrix, so single-entity drill-downs read
+one sparse row.
+
+A grid is a plain dict: ``{'freq', 'periods': DatetimeIndex of bucket
+starts, 'entities': Index, 'totals': ndarray, 'dense': ndarray,
+'sparse': csr_matrix}``.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DENSE_TOP = 50
+FREQS = ('Y', 'M', 'W', 'D', 'h')
+NS_PER_HOUR = 3_600_000_000_000
+# 1970-01-01 was a Thursday; shifting by 3 days makes weeks start on Monday
+WEEK_SHIFT_DAYS = 3
+
+
+def bucket_codes(ts, freq):
+    """Integer bucket of every timestamp (UTC wall time), and a function mapping codes back to bucket starts."""
+    values = ts.dt.tz_localize(None) if ts.dt.tz is not None else ts
+    values = values.dt.as_unit('ns').to_numpy()
+    if freq == 'W':
+        days = values.astype('datetime64[D]').astype(np.int64)
+        codes = (days + WEEK_SHIFT_DAYS) // 7
+        return codes, lambda c: pd.to_datetime(c * 7 - WEEK_SHIFT_DAYS, unit='D')
+    codes = values.astype(f'datetime64[{freq}]').astype(np.int64)
+    return codes, lambda c: pd.DatetimeIndex(np.asarray(c, dtype=np.int64).astype(f'datetime64[{freq}]').astype('datetime64[ns]'))
+
+
+def build_time_grid(events, col, freq='M', dense_top=DENSE_TOP):
+    codes, to_start = bucket_codes(events['ts'], freq)
+    entity_codes, entities = pd.factorize(events[col], sort=True)
+    present = entity_codes >= 0
+    first = codes.min() if len(codes) else 0
+    n_periods = int(codes.max() - first + 1) if len(codes) else 0
+
+    totals = np.bincount(entity_codes[present], weights=events['minutes'].to_numpy(dtype=float)[present], minlength=len(entities))
+    order = np.argsort(-totals, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    matrix = sparse.csr_matrix(
+        (events['minutes'].to_numpy(dtype=float)[present], (rank[entity_codes[present]], codes[present] - first)),
+        shape=(len(entities), n_periods))
+    return {
+        'freq': freq,
+        'periods': to_start(np.arange(first, first + n_periods)),
+        'entities': pd.Index(np.asarray(entities)[order]),
+        'totals': totals[order],
+        'dense': matrix[:dense_top].toarray(),
+        'sparse': matrix[dense_top:].tocsr(),
+    }
+
+
+def top(grid, n):
+    """Periods × top `n` entities, like a pivot table of minutes over time."""
+    dense = grid['dense']
+    values = dense[:n] if n <= len(dense) else np.vstack([dense, grid['sparse'][:n - len(dense)].toarray()])
+    return pd.DataFrame(values.T, index=grid['periods'], columns=grid['entities'][:len(values)])
+
+
+def entity_series(grid, entity):
+    """Minutes of one entity in every period (zeros if it never played)."""
+    position = grid['entities'].get_indexer([entity])[0]
+    if position < 0:
+        values = np.zeros(len(grid['periods']))
+    elif position < len(grid['dense']):
+        values = grid['dense'][position]
+    else:
+        values = grid['sparse'][position - len(grid['dense'])].toarray().ravel()
+    return pd.Series(values, index=grid['periods'], name=entity)
+
+
+def by_year(frame):
+    """Sum a period-indexed frame into calendar years."""
+    return frame.groupby(frame.index.year).sum().rename_axis('year')
@@ -0,0 +1,73 @@
+"""Per-track completion and skip statistics.
+
+The export has no track durations, so a track's length is estimated as a high
+quantile of its `ms_played` (most plays of a track run to the end). Every play
+then gets a completion ratio against that length. A play counts as skipped
+when the export flags it, when it ended for a reason other than the track
+finishing (as `processEntry` in js/store.js does), or when it lasted under
+`SKIP_MS`. The table is keyed by (track, artist) so tabs can join it onto
+their own aggregates.
+"""
+
+import numpy as np
+import pandas as pd
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+LENGTH_QUANTILE = 0.95
+SKIP_MS = 10000
+FINISHED_REASONS = ('trackdone', 'endplay')
+COMPLETION_BINS = [0, 0.25, 0.5, 0.75, 0.9]
+COMPLETION_LABELS = ['completion_lt_25', 'completion_25_50', 'completion_50_75', 'completion_75_90', 'completion_ge_90']
+
+
+def skip_flags(events):
+    """Boolean array: was each play a skip?"""
+    skipped = events['ms_played'].to_numpy() < SKIP_MS
+    if 'skipped' in events.columns:
+        skipped |= events['skipped'].eq(True).to_numpy()
+    if 'reason_end' in events.columns:
+        reason = events['reason_end']
+        skipped |= (reason.notna() & ~reason.isin(FINISHED_REASONS)).to_numpy()
+    return skipped
+
+
+def build_track_stats(events):
+    """One row per (track, artist): plays, estimated length, completion, skip rate and replays."""
+    if events.empty:
+        return pd.DataFrame(columns=['plays', 'est_length_ms', 'completion_median', 'completion_mean', *COMPLETION_LABELS, 'skip_rate', 'replays'],
+                            index=pd.MultiIndex.from_arrays([[], []], names=[TRACK, ARTIST]))
+    keys = events.groupby([TRACK, ARTIST], sort=False, dropna=False)
+    codes = keys.ngroup().to_numpy()
+    n_tracks = codes.max() + 1
+    ms = events['ms_played'].to_numpy(dtype=float)
+
+    length = pd.Series(ms).groupby(codes).quantile(LENGTH_QUANTILE).to_numpy()
+    ratio = np.divide(ms, length[codes], out=np.zeros_like(ms), where=length[codes] > 0).clip(0, 1)
+    plays = np.bincount(codes, minlength=n_tracks)
+
+    # Completion buckets as shares of each track's plays
+    bucket = np.searchsorted(COMPLETION_BINS, ratio, side='right') - 1
+    n_buckets = len(COMPLETION_LABELS)
+    bucket_counts = np.bincount(codes * n_buckets + bucket, minlength=n_tracks * n_buckets).reshape(n_tracks, n_buckets)
+
+    # A replay is a play of the same track straight after itself
+    order = events['ts'].argsort(kind='stable').to_numpy()
+    in_order = codes[order]
+    replay = np.concatenate([[False], in_order[1:] == in_order[:-1]])
+
+    stats = pd.DataFrame({
+        'plays': plays,
+        'est_length_ms': length.round().astype(np.int64),
+        'completion_median': pd.Series(ratio).groupby(codes).median().to_numpy(),
+        'completion_mean': np.bincount(codes, weights=ratio, minlength=n_tracks) / plays,
+        **dict(zip(COMPLETION_LABELS, (bucket_counts / plays[:, None]).T)),
+        'skip_rate': np.bincount(codes, weights=skip_flags(events), minlength=n_tracks) / plays,
+        'replays': np.bincount(in_order[replay], minlength=n_tracks),
+    }, index=keys.size().index)
+    return stats
+
+
+def join_track_stats(frame, track_stats, columns=('completion_median', 'skip_rate')):
+    """Add track stat columns to any frame with track and artist columns."""
+    return frame.join(track_stats[list(columns)], on=[TRACK, ARTIST])
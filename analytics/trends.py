@@ -0,0 +1,124 @@
+"""Rolling-window listening trends over a dense daily series.
+
+`daily_activity` reduces the daily rollup to one (day, artist, minutes) row per
+artist and day. All windowed numbers are derived from it, so changing the
+window never touches the events again. Every window is computed in near-linear
+time with prefix sums or difference arrays:
+
+- rolling minutes per day: difference of the cumulative daily total
+- rolling top-artist share: per-artist windowed sums from cumulative sums,
+  read only where they change (play days and `window` days after them), then
+  the largest per day with a sparse table, O(n log days)
+- rolling distinct artists: each play day of an artist covers the windows up
+  to its next play (or the window length), summed with a difference array
+
+Windows ending in the first days of the history are partial; the average is
+taken over the days actually covered.
+"""
+
+import numpy as np
+import pandas as pd
+
+ARTIST = 'master_metadata_album_artist_name'
+WINDOWS = (7, 30, 90)
+
+
+def daily_activity(daily):
+    """Minutes per (day, artist) from the daily rollup, plus the dense day range they span."""
+    days = np.asarray(pd.to_datetime(daily['date']).to_numpy(), dtype='datetime64[D]').astype(np.int64)
+    codes, artists = pd.factorize(daily[ARTIST])
+    present = codes >= 0
+    first = days.min() if len(days) else 0
+    n_days = days.max() - first + 1 if len(days) else 0
+    n_artists = len(artists)
+    # One row per (artist, day), sorted by artist then day
+    key = codes[present] * max(n_days, 1) + (days[present] - first)
+    pairs, pair_codes = np.unique(key, return_inverse=True)
+    minutes = np.bincount(pair_codes, weights=daily['minutes'].to_numpy(dtype=float)[present], minlength=len(pairs))
+    total = np.bincount(days - first, weights=daily['minutes'].to_numpy(dtype=float), minlength=n_days) if n_days else np.zeros(0)
+    return {
+        'dates': pd.date_range(pd.Timestamp(first, unit='D'), periods=n_days, freq='D') if n_days else pd.DatetimeIndex([]),
+        'total': total,
+        'artist': pairs // max(n_days, 1),
+        'day': pairs % max(n_days, 1),
+        'minutes': minutes,
+        'n_artists': n_artists,
+    }
+
+
+def _window_sum(cumulative, window):
+    """Trailing `window`-day sums along axis 0 from an inclusive cumulative sum."""
+    shifted = np.zeros_like(cumulative)
+    shifted[window:] = cumulative[:-window]
+    return cumulative - shifted
+
+
+def _top_artist_minutes(activity, window):
+    """Minutes of the leading artist in each trailing window."""
+    n_days = len(activity['total'])
+    artist, day = activity['artist'], activity['day']
+    # Keys keep artists apart even `window` days before their first day, so searchsorted never crosses artists
+    stride = n_days + window
+    keys = artist * stride + day
+    cumulative = np.concatenate([[0.0], np.cumsum(activity['minutes'])])
+    # An artist's windowed sum only changes on a play day or `window` days after one.
+    # Both key lists are sorted already, so the stable sort is a merge
+    changes = np.sort(np.concatenate([keys, (keys + window)[day + window < n_days]]), kind='stable')
+    changes = changes[np.concatenate([[True], changes[1:] != changes[:-1]])]
+    sums = cumulative[np.searchsorted(keys, changes, side='right')] - cumulative[np.searchsorted(keys, changes - window, side='right')]
+    # Each sum holds until the artist's next change
+    start = changes % stride
+    end = np.full(len(changes), n_days)
+    same_artist = changes[1:] // stride == changes[:-1] // stride
+    end[:-1][same_artist] = start[1:][same_artist]
+    held = sums > 0
+    return _interval_max(start[held], end[held], sums[held], n_days)
+
+
+def _interval_max(start, end, values, n_days):
+    """Per day, the largest of `values` whose [start, end) interval covers it (0 where none does).
+
+    A sparse table run backwards: each interval is written as two overlapping
+    power-of-two blocks, then every level is pushed down into the next one.
+    """
+    best = np.zeros(n_days)
+    if not len(values):
+        return best
+    level = np.floor(np.log2(end - start)).astype(np.int64)
+    table = np.zeros((int(level.max()) + 1, n_days))
+    np.maximum.at(table, (level, start), values)
+    np.maximum.at(table, (level, end - (1 << level)), values)
+    for k in range(len(table) - 1, 0, -1):
+        half = 1 << (k - 1)
+        np.maximum(table[k - 1], table[k], out=table[k - 1])
+        np.maximum(table[k - 1][half:], table[k][:n_days - half], out=table[k - 1][half:])
+    return np.maximum(best, table[0], out=best)
+
+
+def _distinct_artists(activity, window):
+    """Artists with at least one play in each trailing window."""
+    n_days = len(activity['total'])
+    artist, day = activity['artist'], activity['day']
+    # A play day covers windows ending on it up to the artist's next play day, at most `window` days on
+    next_day = np.full(len(day), n_days)
+    same_artist = artist[1:] == artist[:-1]
+    next_day[:-1][same_artist] = day[1:][same_artist]
+    end = np.minimum(next_day, day + window)
+    change = np.bincount(day, minlength=n_days + 1) - np.bincount(end, minlength=n_days + window + 1)[:n_days + 1]
+    return np.cumsum(change)[:n_days]
+
+
+def rolling_trends(activity, window):
+    """Per-day rolling average minutes, top-artist share and distinct artists over `window` days."""
+    columns = ['avg_minutes', 'top_artist_share', 'distinct_artists']
+    if not len(activity['total']):
+        return pd.DataFrame(columns=columns, index=activity['dates'])
+    minutes = _window_sum(np.cumsum(activity['total']), window)
+    covered = np.minimum(np.arange(1, len(minutes) + 1), window)
+    top = _top_artist_minutes(activity, window)
+    share = np.divide(top, minutes, out=np.zeros_like(top), where=minutes > 1e-9)
+    return pd.DataFrame({
+        'avg_minutes': minutes / covered,
+        'top_artist_share': share * 100,
+        'distinct_artists': _distinct_artists(activity, window),
+    }, index=activity['dates'], columns=columns)
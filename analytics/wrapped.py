@@ -0,0 +1,134 @@
+"""Computations behind the "Your Wrapped" tab. Each function takes one year of events."""
+
+import pandas as pd
+
+from analytics import asof, taskgraph
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ALBUM = 'master_metadata_album_album_name'
+MONTH_ORDER = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+SKIP_MS = 10000
+
+
+def headlines(year_df, distinct=None):
+    """`distinct` optionally supplies precomputed distinct counts by kind (see `sketches`)."""
+    distinct = distinct or {'artist': year_df[ARTIST].nunique(), 'track': year_df[TRACK].nunique()}
+    top_track_info = year_df.groupby([TRACK, ARTIST])['minutes'].sum().nlargest(1).reset_index()
+    daily = year_df.groupby('date')['minutes'].sum()
+    albums = year_df.groupby(ALBUM)['minutes'].sum()
+    return {
+        'total_minutes': year_df['minutes'].sum(),
+        'top_artist': year_df.groupby(ARTIST)['minutes'].sum().idxmax(),
+        'top_track': top_track_info[TRACK].iloc[0],
+        'busiest_day': daily.idxmax(),
+        'busiest_day_minutes': daily.max(),
+        'unique_artists': distinct['artist'],
+        'unique_tracks': distinct['track'],
+        'top_hour': year_df['hour'].mode()[0],
+        'top_album': albums.idxmax(),
+        'top_album_minutes': albums.max(),
+    }
+
+
+def monthly_race(year_df):
+    month_name = year_df['ts'].dt.strftime('%B')
+    monthly_top5 = year_df.groupby([month_name.rename('month_name'), ARTIST])['minutes'].sum().reset_index()
+    monthly_top5['rank'] = monthly_top5.groupby('month_name')['minutes'].rank(method='first', ascending=False)
+    return monthly_top5[monthly_top5['rank'] <= 5]
+
+
+def cumulative_monthly_race(year_df):
+    """Running minutes of the year's top 5 artists at the end of every month."""
+    index = asof.build_asof_index(year_df, ARTIST)
+    if not len(index['days']):
+        return pd.DataFrame(columns=[ARTIST, 'minutes', 'month_num', 'month_name', 'rank'])
+    year = pd.Timestamp(index['days'][0], unit='D').year
+    month_ends = pd.date_range(f"{year}-01-01", periods=12, freq='ME')
+    # Get all top artists in the year, in name order so that ties rank as before
+    top_artists = sorted(asof.standings(index, month_ends[-1], n=5)[ARTIST])
+    cumulative = []
+    for m, month_end in enumerate(month_ends, start=1):
+        cum_minutes = asof.entity_totals(index, top_artists, month_end)
+        cum_minutes = cum_minutes[cum_minutes['plays'] > 0].drop(columns='plays')
+        cum_minutes['month_num'] = m
+        cum_minutes['month_name'] = MONTH_ORDER[m - 1]
+        cum_minutes['rank'] = cum_minutes['minutes'].rank(method='first', ascending=False)
+        cumulative.append(cum_minutes)
+    return pd.concat(cumulative, ignore_index=True)
+
+
+def listener_dna(first_track_years, year_df, current_year):
+    """Split a year's minutes into Explorer / Loyalist / Deep Cuts / Casual listening."""
+    new_discoveries_this_year = first_track_years[first_track_years == current_year].index
+    plays_in_year = year_df[TRACK].value_counts()
+    explorer_tracks = plays_in_year[plays_in_year.isin([1, 2]) & plays_in_year.index.isin(new_discoveries_this_year)].index
+    minutes_explorer = year_df[year_df[TRACK].isin(explorer_tracks)]['minutes'].sum()
+    loyalist_tracks = plays_in_year[plays_in_year >= 5].index
+    minutes_loyalist = year_df[year_df[TRACK].isin(loyalist_tracks)]['minutes'].sum()
+    old_discoveries = first_track_years[first_track_years < current_year].index
+    deep_cut_tracks = plays_in_year[(plays_in_year < 5) & (plays_in_year.index.isin(old_discoveries))].index
+    minutes_deep_cuts = year_df[year_df[TRACK].isin(deep_cut_tracks)]['minutes'].sum()
+    minutes_total = year_df['minutes'].sum()
+    minutes_casual = minutes_total - minutes_explorer - minutes_loyalist - minutes_deep_cuts
+    return pd.DataFrame([
+        {'Category': 'Explorer (New songs)', 'Minutes': minutes_explorer},
+        {'Category': 'Loyalist (Heavy rotation)', 'Minutes': minutes_loyalist},
+        {'Category': 'Deep Cuts (Old favorites)', 'Minutes': minutes_deep_cuts},
+        {'Category': 'Casual (The rest)', 'Minutes': minutes_casual}
+    ])
+
+
+def time_of_day_distribution(year_df):
+    bins = [-1, 4, 11, 17, 21, 23]
+    labels = ['Late Night', 'Morning', 'Afternoon', 'Evening', 'Late Night']
+    time_of_day = pd.cut(year_df['ts'].dt.hour, bins=bins, labels=labels, ordered=False).rename('time_of_day')
+    return year_df.groupby(time_of_day, observed=False)['minutes'].sum().reset_index()
+
+
+def calendar_minutes(year_df):
+    """Minutes by month × day of month."""
+    return year_df.pivot_table(index='month', columns=year_df['ts'].dt.day.rename('day_of_month'), values='minutes', aggfunc='sum', fill_value=0)
+
+
+def masterpiece_stats(year_df, first_listen_years, current_year, distinct=None):
+    """Stats for the shareable Masterpiece card.
+
+    `first_listen_years` maps 'track' / 'album' / 'artist' to the year of the
+    first ever listen of each entity. `distinct` is as in `headlines`.
+    """
+    unique = distinct or {'track': year_df[TRACK].nunique(), 'album': year_df[ALBUM].nunique(), 'artist': year_df[ARTIST].nunique()}
+    # % of new songs/albums/artists (not listened in previous years)
+    percent_new = {
+        kind: 100 * (first_listen_years[kind] == current_year).sum() / count if count else 0
+        for kind, count in unique.items()
+    }
+
+    # Number of devices used (if device info exists)
+    device_col_candidates = [col for col in year_df.columns if 'device' in col.lower()]
+    num_devices = year_df[device_col_candidates[0]].nunique() if device_col_candidates else "N/A"
+
+    return {
+        'unique': unique,
+        'percent_new': percent_new,
+        'total_days': year_df['date'].nunique(),
+        'top_tracks': year_df.groupby([TRACK, ARTIST])['minutes'].sum().nlargest(5).reset_index(),
+        # Songs played less than 10 seconds
+        'percent_skips': 100 * (year_df['ms_played'] < SKIP_MS).sum() / len(year_df) if len(year_df) else 0,
+        'num_devices': num_devices,
+    }
+
+
+def year_overview(year_df, first_listen_years, current_year, distinct=None):
+    """Headlines, time of day, calendar and Masterpiece stats of one year, computed concurrently.
+
+    `distinct` optionally returns the distinct counts for `headlines` and
+    `masterpiece_stats`; it runs as a task too.
+    """
+    graph = taskgraph.TaskGraph()
+    graph.add('distinct', distinct or (lambda: None))
+    graph.add('headlines', lambda counts: headlines(year_df, counts), 'distinct')
+    graph.add('time_of_day', lambda: time_of_day_distribution(year_df))
+    graph.add('calendar', lambda: calendar_minutes(year_df))
+    graph.add('masterpiece', lambda counts: masterpiece_stats(year_df, first_listen_years, current_year, counts), 'distinct')
+    return graph.run()
@@ -0,0 +1,65 @@
+"""Year-over-year movement of artists, albums and tracks.
+
+Everything derives from one (year, entity) aggregate of the daily rollup.
+Every listening year is paired with the previous listening year in a single
+outer merge, so all pairs are computed at once and comparing another pair
+is just a slice. Ranks are by minutes within a year, ties in name order.
+"""
+
+import numpy as np
+import pandas as pd
+
+RETENTION_TOP = 10
+
+
+def yearly_totals(daily, col):
+    """Minutes, plays and rank per (year, entity) from a daily rollup (or events)."""
+    years = pd.to_datetime(daily['date']).dt.year.rename('year')
+    yearly = daily.groupby([years, daily[col]])[['minutes', 'plays']].sum().reset_index()
+    yearly = yearly.sort_values(['year', 'minutes', col], ascending=[True, False, True], kind='stable').reset_index(drop=True)
+    yearly['rank'] = yearly.groupby('year').cumcount() + 1
+    return yearly
+
+
+def year_over_year(yearly, col):
+    """One row per entity and year pair: this year's and the previous listening year's totals and ranks.
+
+    `status` is 'entered' (not played the year before), 'dropped' (played
+    the year before, not this year) or 'kept'. `movement` is positive for
+    a climb in the ranking.
+    """
+    years = np.sort(yearly['year'].unique())
+    if len(years) < 2:
+        return pd.DataFrame(columns=['year', 'previous_year', col, 'minutes', 'previous_minutes', 'delta_minutes',
+                                     'rank', 'previous_rank', 'movement', 'status'])
+    next_year = dict(zip(years[:-1], years[1:]))
+    current = yearly[yearly['year'] > years[0]][['year', col, 'minutes', 'rank']]
+    previous = yearly[yearly['year'] < years[-1]][['year', col, 'minutes', 'rank']]
+    previous = previous.assign(year=previous['year'].map(next_year)).rename(columns={'minutes': 'previous_minutes', 'rank': 'previous_rank'})
+
+    pairs = current.merge(previous, on=['year', col], how='outer')
+    pairs['previous_year'] = pairs['year'].map({later: earlier for earlier, later in next_year.items()})
+    played, played_before = pairs['rank'].notna(), pairs['previous_rank'].notna()
+    pairs['status'] = np.select([played & played_before, played], ['kept', 'entered'], 'dropped')
+    pairs[['minutes', 'previous_minutes']] = pairs[['minutes', 'previous_minutes']].fillna(0.0)
+    pairs['delta_minutes'] = pairs['minutes'] - pairs['previous_minutes']
+    pairs['rank'] = pairs['rank'].astype('Int64')
+    pairs['previous_rank'] = pairs['previous_rank'].astype('Int64')
+    pairs['movement'] = pairs['previous_rank'] - pairs['rank']
+    # This year's ranking first, then the dropped entities by last year's rank
+    pairs = pairs.sort_values(['year', 'rank', 'previous_rank'], na_position='last', kind='stable').reset_index(drop=True)
+    return pairs[['year', 'previous_year', col, 'minutes', 'previous_minutes', 'delta_minutes', 'rank', 'previous_rank', 'movement', 'status']]
+
+
+def retention(pairs, top_n=RETENTION_TOP):
+    """Per year pair: how many of the previous year's top `top_n` stayed in the top `top_n` or were still played."""
+    previous_top = pairs[pairs['previous_rank'] <= top_n]
+    if previous_top.empty:
+        return pd.DataFrame(columns=['year', 'previous_year', 'previous_top', 'still_top', 'still_played',
+                                     'entered', 'dropped', 'kept'])
+    summary = previous_top.assign(
+        still_top=(previous_top['rank'] <= top_n).fillna(False).astype(int),
+        still_played=(previous_top['status'] == 'kept').astype(int),
+    ).groupby(['year', 'previous_year']).agg(previous_top=('status', 'size'), still_top=('still_top', 'sum'), still_played=('still_played', 'sum'))
+    counts = pd.crosstab([pairs['year'], pairs['previous_year']], pairs['status']).reindex(columns=['entered', 'dropped', 'kept'], fill_value=0)
+    return summary.join(counts).reset_index()
@@ -1,52 +1,186 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import zipfile
-import json
-from datetime import datetime
+from datetime import date, datetime
 import random
 
+from analytics import asof, backends, colisten, filters, ingest, overview, profiles, ranking, rollups, sampling, scoring, sessions, shared, sketches, streaks, timegrid, trackstats, trends, wrapped, yoy
+from dashboard import metrics, plotting, profiling, report, tables, timeseries, warmup
+
 st.set_page_config(page_title="Spotify Extended Dashboard", layout="wide")
 st.markdown("### 📦 Spotify Extended Streaming History Dashboard")
 
+# Opt-in profiling: ?profile=1 or SPOTIFY_STATS_PROFILE=1. Cache and call metrics always go to the
+# process-wide registry (file/endpoint export via SPOTIFY_STATS_METRICS_FILE / _PORT, panel via ?admin=1)
+profiler = profiling.Profiler(profiling.profiling_requested(), metrics.REGISTRY, trace_memory=profiling.memory_tracing_requested())
+# Compute backend for the heavy aggregations: SPOTIFY_STATS_BACKEND=pandas|polars
+backend = backends.get_backend()
+
+
+RACE_ITEM_COLUMNS = {"Artists": "master_metadata_album_artist_name", "Tracks": "master_metadata_track_name", "Albums": "master_metadata_album_album_name"}
+# Number of items in each list of the Top tab
+TOP_N = 15
 
 # UPLOAD ZIP FILE
 uploaded_file = st.sidebar.file_uploader("Upload your ZIP file with Spotify data", type="zip")
 
-if uploaded_file:
-    with zipfile.ZipFile(uploaded_file, 'r') as archive:
-        # The folder name can vary, so we look for the pattern
-        json_files = [f for f in archive.namelist() if f.startswith('MyData/endsong_') and f.endswith('.json')]
-        # Fallback for the old naming convention if the new one is not found
-        if not json_files:
-            target_dir = "Spotify Extended Streaming History"
-            json_files = [f for f in archive.namelist() if f.startswith(target_dir) and f.endswith('.json')]
-
-
-        if not json_files:
-            st.error("No 'endsong_...json' or 'Spotify Extended Streaming History' files found in the ZIP archive. Please make sure you have the correct file from Spotify.")
-            st.stop()
-
-        data = []
-        for file in json_files:
-            with archive.open(file) as f:
-                content = json.load(f)
-                data.extend(content)
-
-    df = pd.DataFrame(data)
-
-    # Basic preprocessing
-    df['ts'] = pd.to_datetime(df['ts'], errors='coerce')
-    df = df.dropna(subset=['ts', 'master_metadata_track_name']) # Ensure track name is not null
-    df['minutes'] = df['ms_played'] / 60000
-    df['year'] = df['ts'].dt.year
-    df['month'] = df['ts'].dt.month
-    df['weekday'] = df['ts'].dt.dayofweek # Monday=0, Sunday=6
-    df['hour'] = df['ts'].dt.hour
-    df['date'] = df['ts'].dt.date
 
+def prepare_upload(file):
+    events = ingest.load_export(file)
+    return events, rollups.build_rollups(events)
+
+
+@profiler.cache_data(show_spinner="Processing your ZIP file...")
+def load_uploaded_export(_file, file_id):
+    prepared = prepare_upload(_file)
+    metrics.REGISTRY.dataset_loaded('load_uploaded_export', file_id)
+    return prepared
+
+
+@profiler.cache_data(show_spinner="Loading saved dataset...")
+def load_saved_dataset(name, version):
+    prepared = ingest.load_dataset(name)
+    metrics.REGISTRY.dataset_loaded('load_saved_dataset', (name, version))
+    return prepared
+
+
+# Several server processes: SPOTIFY_STATS_SHARED_DIR publishes prepared datasets as memory-mapped Arrow
+# files (analytics/shared.py). cache_resource hands every session the mapped frame itself, not a copy
+@st.cache_resource(show_spinner="Attaching shared dataset...")
+def attach_shared_dataset(digest, _build):
+    return shared.attach_or_publish(digest, _build)
+
+
+@profiler.cache_data(show_spinner=False)
+def upload_digest(_file, file_id):
+    return shared.file_hash(_file)
+
+
+def open_upload(file):
+    if shared.enabled():
+        return attach_shared_dataset(upload_digest(file, file.file_id), lambda: prepare_upload(file))
+    return load_uploaded_export(file, file.file_id)
+
+
+def open_saved_dataset(name, version):
+    if shared.enabled():
+        return attach_shared_dataset(shared.saved_dataset_hash(ingest.dataset_path(name), version), lambda: ingest.load_dataset(name))
+    return load_saved_dataset(name, version)
+
+
+# SAVED DATASETS: merge new exports into a persisted, deduplicated history
+st.sidebar.markdown("### 💾 Saved Datasets")
+saved_datasets = ingest.list_datasets()
+append_mode = st.sidebar.checkbox("Merge upload into a saved dataset", value=False, help="Spotify exports overlap. New events are appended and duplicates (same timestamp, track URI and ms played) are skipped.")
+if append_mode:
+    dataset_name = st.sidebar.text_input("Dataset name", value=saved_datasets[0] if saved_datasets else "default")
+elif saved_datasets and not uploaded_file:
+    dataset_name = st.sidebar.selectbox("Open a saved dataset", ["None"] + saved_datasets)
+else:
+    dataset_name = "None"
+
+# COMPARE PROFILES: several exports side by side, one sparse row per profile
+st.sidebar.markdown("### 👥 Compare Profiles")
+compare_mode = st.sidebar.checkbox("Compare several exports", value=False, help="Upload one ZIP per person (or pick saved datasets) to compare overlap and taste over time.")
+if compare_mode:
+    profile_files = st.sidebar.file_uploader("One ZIP per profile", type="zip", accept_multiple_files=True, key="profile_uploads")
+    profile_datasets = st.sidebar.multiselect("Saved datasets as profiles", saved_datasets)
+
+    @profiler.cache_data(show_spinner="Processing profile export...")
+    def load_profile_events(_file, file_id):
+        events = ingest.load_export(_file)
+        metrics.REGISTRY.dataset_loaded('load_profile_events', file_id)
+        return events
+
+    @profiler.cache_data(show_spinner="Comparing profiles...")
+    def compare_profiles(_profile_events, profile_key, col, period, top_n):
+        pm = profiles.profile_matrix(_profile_events, col)
+        return {
+            'cosine': profiles.similarity(pm, 'cosine'),
+            'jaccard': profiles.similarity(pm, 'jaccard'),
+            'shared_top': profiles.shared_top(pm, top_n),
+            'divergence': profiles.divergence_over_time(_profile_events, col, period),
+            'entities': pm['matrix'].getnnz(axis=1),
+        }
+
+    st.subheader("👥 Profile Comparison")
+    profile_events, profile_key = {}, []
+    try:
+        label_cols = st.columns(3)
+        for i, file in enumerate(profile_files or []):
+            label = label_cols[i % 3].text_input(f"Label for {file.name}", value=file.name.rsplit('.', 1)[0], key=f"profile_label_{file.file_id}")
+            label = label if label not in profile_events else f"{label} ({i + 1})"
+            profile_events[label] = load_profile_events(file, file.file_id)
+            profile_key.append((label, file.file_id))
+        for name in profile_datasets:
+            version = ingest.dataset_version(name)
+            profile_events[name] = open_saved_dataset(name, version)[0]
+            profile_key.append((name, version))
+    except ingest.ExportError as e:
+        st.error(str(e))
+        st.stop()
+
+    if len(profile_events) < 2:
+        st.info("Add at least two exports or saved datasets in the sidebar to compare them.")
+    else:
+        px = plotting.plotly_express()
+        control_cols = st.columns(3)
+        entity_type = control_cols[0].radio("Compare by", ["Artists", "Tracks"], horizontal=True, key="compare_entity")
+        period = control_cols[1].radio("Divergence over", ["Yearly", "Monthly"], horizontal=True, key="compare_period")
+        top_n = control_cols[2].slider("Top N per profile", 5, 100, 25, 5, key="compare_top_n")
+        entity_col = 'master_metadata_album_artist_name' if entity_type == "Artists" else 'master_metadata_track_name'
+        comparison = compare_profiles(profile_events, tuple(profile_key), entity_col, period, top_n)
+
+        st.caption(" · ".join(f"**{name}**: {count:,} {entity_type.lower()}" for name, count in zip(profile_events, comparison['entities'])))
+        sim_cols = st.columns(2)
+        for col, metric, title in [(sim_cols[0], 'cosine', "Cosine similarity (minutes)"), (sim_cols[1], 'jaccard', "Jaccard overlap (shared entities)")]:
+            fig = px.imshow(comparison[metric].round(2), text_auto=True, zmin=0, zmax=1, color_continuous_scale='Greens', title=title)
+            col.plotly_chart(fig, use_container_width=True)
+
+        st.subheader(f"🤝 Shared Top {entity_type}")
+        shared_top = comparison['shared_top']
+        if shared_top.empty:
+            st.info(f"No {entity_type.lower()} appear in the top {top_n} of more than one profile.")
+        else:
+            tables.paginated_table(shared_top.rename(columns={'entity': entity_type[:-1], 'profiles': 'In top of', 'total_minutes': 'Total minutes'}).round(0), key="shared_top", hide_index=True, use_container_width=True)
+
+        st.subheader("📉 Taste Divergence Over Time")
+        divergence = comparison['divergence']
+        if divergence.empty:
+            st.info("No period where two profiles were both active.")
+        else:
+            divergence = divergence.assign(pair=divergence['profile_a'] + " ↔ " + divergence['profile_b'])
+            fig = px.line(divergence, x='period', y='divergence', color='pair', markers=True, labels={'divergence': 'Cosine distance (0 = same taste)', 'period': ''})
+            st.plotly_chart(fig, use_container_width=True)
+
+    profiling.render_panel(profiler)
+    metrics.record_rerun("Compare profiles", profiler.total_seconds())
+    metrics.render_admin_panel()
+    st.stop()
+
+df = None
+try:
+    if uploaded_file and append_mode:
+        merged_uploads = st.session_state.setdefault("merged_uploads", {})
+        merge_key = (dataset_name, uploaded_file.file_id)
+        if merge_key not in merged_uploads:
+            with st.spinner("Merging upload into saved dataset..."), profiler.section("Merge upload"):
+                _, _, added_count, duplicate_count = ingest.append_to_dataset(dataset_name, uploaded_file)
+            merged_uploads[merge_key] = (added_count, duplicate_count)
+        added_count, duplicate_count = merged_uploads[merge_key]
+        st.sidebar.success(f"{added_count:,} new events merged, {duplicate_count:,} duplicates skipped.")
+        dataset_key = (dataset_name, ingest.dataset_version(dataset_name))
+        df, dataset_rollups = open_saved_dataset(*dataset_key)
+    elif uploaded_file:
+        dataset_key = ("upload", uploaded_file.file_id)
+        df, dataset_rollups = open_upload(uploaded_file)
+    elif dataset_name != "None" and ingest.dataset_version(dataset_name) is not None:
+        dataset_key = (dataset_name, ingest.dataset_version(dataset_name))
+        df, dataset_rollups = open_saved_dataset(*dataset_key)
+except ingest.ExportError as e:
+    st.error(str(e))
+    st.stop()
+
+if df is not None:
     # Sidebar date filter
     st.sidebar.markdown("### 📅 Date Filters")
     min_date = df['date'].min()
@@ -64,1188 +198,1359 @@ if uploaded_file:
     if isinstance(end_date, datetime):
         end_date = end_date.date()
 
-    df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+    df = filters.filter_by_date(df, start_date, end_date)
 
 
     artist_filter = st.sidebar.multiselect("Filter by artist", df['master_metadata_album_artist_name'].dropna().unique())
     album_filter = st.sidebar.multiselect("Filter by album", df['master_metadata_album_album_name'].dropna().unique())
     track_filter = st.sidebar.multiselect("Filter by track", df['master_metadata_track_name'].dropna().unique())
 
-    filtered_df = df.copy()
-    if artist_filter:
-        filtered_df = filtered_df[filtered_df['master_metadata_album_artist_name'].isin(artist_filter)]
-    if album_filter:
-        filtered_df = filtered_df[filtered_df['master_metadata_album_album_name'].isin(album_filter)]
-    if track_filter:
-        filtered_df = filtered_df[filtered_df['master_metadata_track_name'].isin(track_filter)]
+    filtered_df = profiler.call("Filters", filters.apply_filters, df, artists=artist_filter, albums=album_filter, tracks=track_filter).copy()
+
+    # Same filters over the daily rollup, used by aggregations that do not need single events
+    filters_active = start_date > min_date or end_date < max_date or bool(artist_filter or album_filter or track_filter)
+    filtered_daily_df = filters.apply_filters(dataset_rollups['daily'], start_date, end_date, artist_filter, album_filter, track_filter)
+    # Identifies filtered_df for cached functions that take it unhashed
+    filter_key = filters.filter_signature(dataset_key, start_date, end_date, artist_filter, album_filter, track_filter)
+
+    # Opt-in approximate distinct counts (SPOTIFY_STATS_APPROX_DISTINCT=1): the per-day sketches
+    # only cover date ranges, so entity filters fall back to exact counting
+    approx_distinct = sketches.approximate_requested()
+
+    @profiler.cache_data(show_spinner="Building distinct-count sketches...")
+    def dataset_sketches(_events, dataset_key, precision):
+        return sketches.build_sketches(_events, precision)
+
+    def distinct_sketches():
+        # Shared datasets published before approximate counting was enabled carry no sketches
+        sketch_set = dataset_rollups.get('sketches')
+        if sketch_set and sketch_set['precision'] == sketches.configured_precision():
+            return sketch_set
+        return dataset_sketches(df, dataset_key, sketches.configured_precision())
+
+    def distinct_counts(frame, start, end, entity_filtered=False):
+        if approx_distinct and not entity_filtered:
+            return sketches.distinct_counts(distinct_sketches(), start, end)
+        return sketches.exact_distinct_counts(frame)
+
+    def approx_caption():
+        if approx_distinct:
+            st.caption(f"Unique counts are HyperLogLog estimates (±{100 * sketches.relative_error(sketches.configured_precision()):.1f}% standard error).")
+
+    # Co-listening index: which tracks/artists share listening sessions
+    @profiler.cache_data(show_spinner="Indexing what you listen to together...")
+    def colisten_index(_events, events_key, col):
+        return colisten.build_colisten_index(_events, col)
+
+    def show_colistened(index, item, noun):
+        together = colisten.most_colistened(index, item)
+        st.write(f"#### 🎧 Most Co-listened {noun}s")
+        if together.empty:
+            st.caption(f"No other {noun.lower()} shares a listening session with this one.")
+        else:
+            st.dataframe(together.rename(columns={'item': noun, 'sessions_together': 'Sessions together', 'score': 'Affinity'}).round({'Affinity': 3}), hide_index=True, use_container_width=True)
+
+    # Entity × month minutes shared by the evolution charts, heatmaps and drill-downs
+    @profiler.cache_data(show_spinner=False)
+    def time_grid(_events, events_key, col, freq='M'):
+        return timegrid.build_time_grid(_events, col, freq)
+
+    # Running minutes and plays per entity and day, for standings on any date
+    @profiler.cache_data(show_spinner=False)
+    def asof_index(_events, events_key, col):
+        return asof.build_asof_index(_events, col)
+
+    def race_results(events, item_col, time_period, metric_type, top_n):
+        periodic_data = backend.periodic_race(events, item_col, time_period, metric_type, top_n)
+        # The cumulative race takes the top N at *each* step, not from the overall total
+        cumulative_data = backend.cumulative_race(events, item_col, time_period, metric_type, top_n)
+        return periodic_data, cumulative_data
+
+    # Background warm-up of the heavy tabs for the current filters and tab controls, viewed tab first.
+    # The tabs' cached functions pick the results up through warmer.take()
+    warmer = warmup.session_warmer()
+
+    # Progressive rendering (SPOTIFY_STATS_PROGRESSIVE=1) of large histories: Top, Distributions and Heatmaps
+    # draw estimates from a stratified sample while their exact aggregations run in the background
+    progressive = sampling.progressive_requested() and len(filtered_df) >= sampling.PROGRESSIVE_MIN_EVENTS
+    overview_results = {
+        "Top": lambda events: overview.top_lists(events, backend.top_items, TOP_N),
+        "Distributions": overview.distributions,
+        "Heatmaps": overview.activity_pivots,
+    }
+
+    def overview_key(tab):
+        return ('overview', tab, filter_key, backend.name)
+
+    @profiler.cache_data(show_spinner=False)
+    def overview_result(_events, filter_key, backend_name, tab):
+        return warmer.take(overview_key(tab), lambda: overview_results[tab](_events))
+
+    @profiler.cache_data(show_spinner=False)
+    def preview_sample(_events, filter_key):
+        return sampling.stratified_sample(_events, sampling.preview_fraction(len(_events)))
+
+    def exact_or_preview(tab, estimate):
+        """(result, sample): the exact result, or `estimate(sample)` while the exact one is still running."""
+        if progressive and not warmer.ready(overview_key(tab)) and warmer.pending(overview_key(tab)):
+            warmer.watch(overview_key(tab))
+            sample = preview_sample(filtered_df, filter_key)
+            return estimate(sample), sample
+        result = overview_result(filtered_df, filter_key, backend.name, tab)
+        warmer.release(overview_key(tab))
+        return result, None
+
+    def preview_notice(sample):
+        if sample is not None:
+            st.info(f"⏳ Preview estimated from a {len(sample) / len(filtered_df):.1%} stratified sample ({len(sample):,} of {len(filtered_df):,} plays, "
+                    "sampled evenly from every month). Exact results replace it as soon as they are ready.")
+
+    race_controls = (
+        RACE_ITEM_COLUMNS[st.session_state.get("race_item_type_v2", "Artists")],
+        st.session_state.get("race_time_period_v2", "Weekly"),
+        st.session_state.get("race_metric_v2", "Minutes"),
+        st.session_state.get("race_top_n_v2", 10),
+    )
+    wrapped_year = st.session_state.get("wrapped_year_selector_final", df['year'].max())
+    wrapped_key = (dataset_key, start_date, end_date, wrapped_year)
+    first_track_years = rollups.first_listen_years(dataset_rollups, 'track')
+    warm_jobs = {
+        "🏆 Weekly Ranking": [(('weekly', filter_key, backend.name), "Weekly Ranking", lambda: backend.weekly_ranking(filtered_daily_df))] if filters_active else [],
+        "🌟 Your Wrapped": [
+            (('monthly_race', wrapped_key), "Wrapped", lambda: wrapped.monthly_race(df[df['year'] == wrapped_year])),
+            (('cumulative_monthly_race', wrapped_key), "Wrapped", lambda: wrapped.cumulative_monthly_race(df[df['year'] == wrapped_year])),
+            (('listener_dna', wrapped_key), "Wrapped", lambda: wrapped.listener_dna(first_track_years, df[df['year'] == wrapped_year], wrapped_year)),
+        ],
+        "🏁 Ranking Race": [(('race', filter_key, backend.name, *race_controls), "Ranking Race", lambda: race_results(filtered_df, *race_controls))],
+        **{tab: [(overview_key(tab), tab, lambda compute=compute: compute(filtered_df))] if progressive else [] for tab, compute in overview_results.items()},
+    }
+    viewed_tab = st.session_state.get("active_tab")
+    plan = sorted(warm_jobs, key=lambda t: t != viewed_tab)
+    # While a preview is on screen its exact result is the only new job, so other tabs do not slow it (or the page) down.
+    # Their jobs already queued or running are kept, and start as usual once the exact result is in
+    deferred = set()
+    if progressive and viewed_tab in overview_results and not warmer.ready(overview_key(viewed_tab)):
+        deferred = {key for tab in plan if tab != viewed_tab for key, _, _ in warm_jobs[tab]}
+    warmer.schedule([job for tab in plan for job in warm_jobs[tab]], defer=deferred)
+    with st.sidebar:
+        warmup.render_progress()
+
+    # Shared by the Weekly Ranking tab and the report, so neither recomputes what the other (or the warm-up) did
+    @profiler.cache_data(show_spinner="Calculating weekly rankings...")
+    def calculate_weekly_ranking(_daily_df, filter_key, backend_name):
+        return warmer.take(('weekly', filter_key, backend_name), lambda: backend.weekly_ranking(_daily_df))
+
+    def weekly_ranking_results():
+        # The saved rollups already hold the full-history ranking
+        if not filters_active:
+            return dataset_rollups['weekly']
+        results = calculate_weekly_ranking(filtered_daily_df, filter_key, backend.name)
+        warmer.release(('weekly', filter_key, backend.name))
+        return results
+
+    # Static HTML report of the current filters (dashboard/report.py): built on request, then offered as a download
+    @profiler.cache_data(show_spinner="Building the HTML report...")
+    def static_report(_events, _weekly, _first_listen, filter_key, backend_name):
+        return report.build_report(_events, _weekly, _first_listen, backend)
+
+    st.sidebar.markdown("### 📄 Static Report")
+    if st.sidebar.button("Build HTML report", help="One self-contained HTML file with the Top lists, weekly leaderboard, heatmaps, streaks and a Wrapped card per year, for the current filters. It opens offline and needs no server."):
+        st.session_state["report_filter_key"] = filter_key
+    if st.session_state.get("report_filter_key") == filter_key:
+        report_weekly = weekly_ranking_results()
+        st.sidebar.download_button("Download report", static_report(filtered_df, report_weekly, dataset_rollups['first_listen'], filter_key, backend.name), file_name="spotify_report.html", mime="text/html")
 
     # NUEVO: Lista de pestañas actualizada
-    tabs = st.tabs(["Top", "🏆 Weekly Ranking", "Temporal", "Distributions", "Heatmaps", "Streaks", "Artists & Albums", "Summary", "Game", "🌟 Your Wrapped", "🏁 Ranking Race"])
-
-    with tabs[0]:
-        st.subheader("🏆 Your All-Time & Filtered Top Lists")
-        st.markdown("An overview of your most listened to tracks, artists, and albums based on the selected filters. Charts show total listening time, and tables provide additional details.")
-        st.markdown("---")
-
-        # Define el número de elementos a mostrar
-        TOP_N = 15
-
-        # Creamos las tres columnas para el dashboard
-        col1, col2, col3 = st.columns(3, gap="large")
-
-        # --- COLUMNA 1: TOP TRACKS ---
-        with col1:
-            st.markdown("#### 🎵 Top Tracks")
-
-            # Agregamos para obtener minutos, conteo de reproducciones y el artista
-            top_tracks_df = filtered_df.groupby(['master_metadata_track_name', 'master_metadata_album_artist_name']).agg(
-                total_minutes=('minutes', 'sum'),
-                play_count=('ts', 'count')
-            ).sort_values('total_minutes', ascending=False).head(TOP_N).reset_index()
-
-            # Gráfico de barras horizontal con Plotly para mejor visualización
-            if not top_tracks_df.empty:
-                fig_tracks = px.bar(
-                    top_tracks_df.sort_values('total_minutes', ascending=True),
-                    x='total_minutes',
-                    y='master_metadata_track_name',
-                    orientation='h',
-                    text_auto='.0f',
-                    title=f"Top {TOP_N} Tracks by Listening Time"
-                )
-                fig_tracks.update_traces(textposition='outside', marker_color='#1DB954')
-                fig_tracks.update_layout(
-                    yaxis_title=None,
-                    xaxis_title="Total Minutes",
-                    margin=dict(l=0, r=0, t=40, b=20),
-                    height=450
-                )
-                st.plotly_chart(fig_tracks, use_container_width=True)
-
-                # Tabla con detalles adicionales
-                st.markdown("###### Detailed View")
-                display_tracks = top_tracks_df[['master_metadata_track_name', 'master_metadata_album_artist_name', 'play_count', 'total_minutes']]
-                display_tracks.columns = ['Track', 'Artist', 'Plays', 'Minutes']
-                display_tracks['Minutes'] = display_tracks['Minutes'].round(0).astype(int)
-                display_tracks.index = range(1, len(display_tracks) + 1)
-                st.dataframe(display_tracks, use_container_width=True)
-            else:
-                st.warning("No track data available for the selected filters.")
-
-
-        # --- COLUMNA 2: TOP ARTISTS ---
-        with col2:
-            st.markdown("#### 👩‍🎤 Top Artists")
-
-            # Agregamos para obtener minutos y número de canciones únicas
-            top_artists_df = filtered_df.groupby('master_metadata_album_artist_name').agg(
-                total_minutes=('minutes', 'sum'),
-                unique_tracks=('master_metadata_track_name', 'nunique')
-            ).sort_values('total_minutes', ascending=False).head(TOP_N).reset_index()
-
-            # Gráfico de barras horizontal con Plotly
-            if not top_artists_df.empty:
-                fig_artists = px.bar(
-                    top_artists_df.sort_values('total_minutes', ascending=True),
-                    x='total_minutes',
-                    y='master_metadata_album_artist_name',
-                    orientation='h',
-                    text_auto='.0f',
-                    title=f"Top {TOP_N} Artists by Listening Time"
-                )
-                fig_artists.update_traces(textposition='outside', marker_color='#1DB954')
-                fig_artists.update_layout(
-                    yaxis_title=None,
-                    xaxis_title="Total Minutes",
-                    margin=dict(l=0, r=0, t=40, b=20),
-                    height=450
-                )
-                st.plotly_chart(fig_artists, use_container_width=True)
-
-                # Tabla con detalles adicionales
-                st.markdown("###### Detailed View")
-                display_artists = top_artists_df.rename(columns={'master_metadata_album_artist_name': 'Artist', 'unique_tracks': 'Unique Tracks', 'total_minutes': 'Minutes'})
-                display_artists['Minutes'] = display_artists['Minutes'].round(0).astype(int)
-                display_artists.index = range(1, len(display_artists) + 1)
-                st.dataframe(display_artists, use_container_width=True)
-            else:
-                st.warning("No artist data available for the selected filters.")
-
-        # --- COLUMNA 3: TOP ALBUMS ---
-        with col3:
-            st.markdown("#### 📀 Top Albums")
-
-            # Agregamos para obtener minutos, artista y número de canciones únicas
-            top_albums_df = filtered_df.groupby(['master_metadata_album_album_name', 'master_metadata_album_artist_name']).agg(
-                total_minutes=('minutes', 'sum'),
-                unique_tracks=('master_metadata_track_name', 'nunique')
-            ).sort_values('total_minutes', ascending=False).head(TOP_N).reset_index()
-
-            # Gráfico de barras horizontal con Plotly
-            if not top_albums_df.empty:
-                fig_albums = px.bar(
-                    top_albums_df.sort_values('total_minutes', ascending=True),
-                    x='total_minutes',
-                    y='master_metadata_album_album_name',
-                    orientation='h',
-                    text_auto='.0f',
-                    title=f"Top {TOP_N} Albums by Listening Time"
-                )
-                fig_albums.update_traces(textposition='outside', marker_color='#1DB954')
-                fig_albums.update_layout(
-                    yaxis_title=None,
-                    xaxis_title="Total Minutes",
-                    margin=dict(l=0, r=0, t=40, b=20),
-                    height=450
-                )
-                st.plotly_chart(fig_albums, use_container_width=True)
-
-                # Tabla con detalles adicionales
-                st.markdown("###### Detailed View")
-                display_albums = top_albums_df.rename(columns={'master_metadata_album_album_name': 'Album', 'master_metadata_album_artist_name': 'Artist', 'unique_tracks': 'Unique Tracks', 'total_minutes': 'Minutes'})
-                display_albums['Minutes'] = display_albums['Minutes'].round(0).astype(int)
-                display_albums.index = range(1, len(display_albums) + 1)
-                st.dataframe(display_albums, use_container_width=True)
-            else:
-                st.warning("No album data available for the selected filters.")
-
-    ## NUEVO: Pestaña completa de Ranking Semanal con récords y historial por canción
-    # NUEVO: Pestaña completa de Ranking Semanal con analytics de "data nerd", manejo de empates y formato mejorado
-    with tabs[1]:
-        st.subheader("🏆 Weekly Ranking Leaderboard (F1 Style)")
-        st.markdown("""
-        This chart calculates a leaderboard for your most listened-to tracks using a Formula 1 style scoring system.
-        - Each week, we find your **top 10** most-listened tracks (by total minutes).
-        - Points are awarded like in F1: **1st (25), 2nd (18), 3rd (15), 4th (12), 5th (10), 6th (8), 7th (6), 8th (4), 9th (2), 10th (1)**.
-        - Below, you'll find the all-time leaderboard, a deep-dive into records, and a detailed history for each track.
-        """)
-
-        @st.cache_data(show_spinner="Calculating weekly rankings...")
-        def calculate_weekly_ranking(df):
-            track_artist_map = df.drop_duplicates(subset=['master_metadata_track_name'])[['master_metadata_track_name', 'master_metadata_album_artist_name']]
-            df_copy = df.copy()
-            df_copy['week_id'] = df_copy['ts'].dt.isocalendar().year.astype(str) + '-W' + df_copy['ts'].dt.isocalendar().week.astype(str).str.zfill(2)
-            weekly_minutes = df_copy.groupby(['week_id', 'master_metadata_track_name'])['minutes'].sum().reset_index()
-            points_map = {1: 25, 2: 18, 3: 15, 4: 12, 5: 10, 6: 8, 7: 6, 8: 4, 9: 2, 10: 1}
-            def rank_and_score(group):
-                top10 = group.nlargest(10, 'minutes').copy()
-                top10['rank'] = range(1, len(top10) + 1)
-                top10['points'] = top10['rank'].map(points_map)
-                return top10
-            weekly_ranking_df = weekly_minutes.groupby('week_id', group_keys=False).apply(rank_and_score)
-            weekly_ranking_df = pd.merge(weekly_ranking_df, track_artist_map, on='master_metadata_track_name', how='left')
-            return weekly_ranking_df
-
-        weekly_results_df = calculate_weekly_ranking(filtered_df)
-
-        if weekly_results_df.empty:
-            st.warning("Not enough listening data in the selected period to generate weekly rankings.")
-        else:
-            st.markdown("---")
-            st.subheader("🏁 All-Time Points Leaderboard")
-            overall_scores = weekly_results_df.groupby('master_metadata_track_name').agg(total_points=('points', 'sum'), total_minutes=('minutes', 'sum')).sort_values(by='total_points', ascending=False).reset_index()
-            overall_scores.rename(columns={'master_metadata_track_name': 'Track Name', 'total_points': 'Total Points', 'total_minutes': 'Total Minutes'}, inplace=True)
-            overall_scores['Total Minutes'] = overall_scores['Total Minutes'].round(1)
-            overall_scores = overall_scores[['Track Name', 'Total Points', 'Total Minutes']]
-            overall_scores.index += 1
-            st.dataframe(overall_scores, use_container_width=True)
-
-            # --- SECCIÓN DE RÉCORDS Y FUN FACTS AMPLIADA ---
+    # Only the selected tab runs (`.open`), so plotting backends load the first time a tab needs them
+    tabs = st.tabs(["Top", "🏆 Weekly Ranking", "Temporal", "Distributions", "Heatmaps", "Streaks", "Artists & Albums", "Summary", "Game", "🌟 Your Wrapped", "🏁 Ranking Race", "⏱️ Sessions"], key="active_tab", on_change="rerun")
+
+    with tabs[0], profiler.section("Top"):
+        if tabs[0].open:
+            px = plotting.plotly_express()
+            st.subheader("🏆 Your All-Time & Filtered Top Lists")
+            st.markdown("An overview of your most listened to tracks, artists, and albums based on the selected filters. Charts show total listening time, and tables provide additional details.")
             st.markdown("---")
-            st.subheader("🏆 All-Time Records & Fun Facts")
-
-            # --- Funciones de ayuda para calcular récords y manejar empates ---
-            def get_ties(series):
-                if series.empty: return ("N/A", 0)
-                max_value = series.max()
-                tied_songs = series[series == max_value].index.tolist()
-                return (", ".join(tied_songs), max_value)
-
-            def get_max_consecutive_streak_series(df, rank_threshold):
-                filtered_df = df[df['rank'] <= rank_threshold].copy()
-                if filtered_df.empty: return pd.Series(dtype='int64')
-                def calculate_streaks(group):
-                    group = group.sort_values('week_id')
-                    group['week_num'] = group['week_id'].str.split('-W').str[1].astype(int)
-                    streaks = (group['week_num'].diff() != 1).cumsum()
-                    return streaks.value_counts().max()
-                return filtered_df.groupby('master_metadata_track_name').apply(calculate_streaks)
-
-            def display_record(column, title, songs_str, value_str):
-                column.markdown(f"**{title}**")
-                column.markdown(f"<small>{songs_str}</small>", unsafe_allow_html=True)
-                column.markdown(f"### {value_str}")
-
-            with st.expander("👑 The GOATs (Greatest of All Time - Track Records)", expanded=True):
-                st.markdown("#### Most Total Weeks In...")
-                col1, col2, col3, col4 = st.columns(4)
-                
-                # Most Weeks in Top 1
-                counts_t1 = weekly_results_df[weekly_results_df['rank'] <= 1].groupby('master_metadata_track_name').size()
-                songs_t1, value_t1 = get_ties(counts_t1)
-                display_record(col1, "Top 1", songs_t1, f"{int(value_t1)} weeks")
-
-                # Most Weeks in Top 3
-                counts_t3 = weekly_results_df[weekly_results_df['rank'] <= 3].groupby('master_metadata_track_name').size()
-                songs_t3, value_t3 = get_ties(counts_t3)
-                display_record(col2, "Top 3", songs_t3, f"{int(value_t3)} weeks")
-
-                # Most Weeks in Top 5
-                counts_t5 = weekly_results_df[weekly_results_df['rank'] <= 5].groupby('master_metadata_track_name').size()
-                songs_t5, value_t5 = get_ties(counts_t5)
-                display_record(col3, "Top 5", songs_t5, f"{int(value_t5)} weeks")
-
-                # Most Weeks in Top 10
-                counts_t10 = weekly_results_df.groupby('master_metadata_track_name').size()
-                songs_t10, value_t10 = get_ties(counts_t10)
-                display_record(col4, "Top 10", songs_t10, f"{int(value_t10)} weeks")
-                
-                st.divider()
-                
-                st.markdown("#### Most Consecutive Weeks In...")
-                colA, colB, colC, colD = st.columns(4)
-
-                # Most Consecutive Weeks in Top 1
-                streaks_t1 = get_max_consecutive_streak_series(weekly_results_df, 1)
-                songs_s_t1, value_s_t1 = get_ties(streaks_t1)
-                display_record(colA, "Top 1", songs_s_t1, f"{int(value_s_t1)} weeks")
-
-                # Most Consecutive Weeks in Top 3
-                streaks_t3 = get_max_consecutive_streak_series(weekly_results_df, 3)
-                songs_s_t3, value_s_t3 = get_ties(streaks_t3)
-                display_record(colB, "Top 3", songs_s_t3, f"{int(value_s_t3)} weeks")
-
-                # Most Consecutive Weeks in Top 5
-                streaks_t5 = get_max_consecutive_streak_series(weekly_results_df, 5)
-                songs_s_t5, value_s_t5 = get_ties(streaks_t5)
-                display_record(colC, "Top 5", songs_s_t5, f"{int(value_s_t5)} weeks")
-
-                # Most Consecutive Weeks in Top 10
-                streaks_t10 = get_max_consecutive_streak_series(weekly_results_df, 10)
-                songs_s_t10, value_s_t10 = get_ties(streaks_t10)
-                display_record(colD, "Top 10", songs_s_t10, f"{int(value_s_t10)} weeks")
-
-
-            with st.expander("👩‍🎤 Artist Dominance & Chart Volatility Records"):
-                col1, col2, col3 = st.columns(3)
-                # Constructor's Champion
-                constructor_points = weekly_results_df.groupby('master_metadata_album_artist_name')['points'].sum()
-                songs_c, value_c = get_ties(constructor_points)
-                display_record(col1, "Constructor's Champion", songs_c, f"{int(value_c)} points")
-                
-                # Most Chart Hits
-                artist_chart_hits = weekly_results_df.groupby('master_metadata_album_artist_name')['master_metadata_track_name'].nunique()
-                songs_h, value_h = get_ties(artist_chart_hits)
-                display_record(col2, "Most Chart Hits (Artist)", songs_h, f"{int(value_h)} songs")
 
-                # Highest Debut
-                debuts = weekly_results_df.loc[weekly_results_df.groupby('master_metadata_track_name')['week_id'].idxmin()]
-                min_rank = debuts['rank'].min()
-                highest_debut_songs = debuts[debuts['rank'] == min_rank]['master_metadata_track_name'].tolist()
-                display_record(col3, "Highest Debut of All Time", ", ".join(highest_debut_songs), f"#{int(min_rank)}")
+            top_lists, top_sample = exact_or_preview("Top", lambda sample: overview.top_lists(sample, sampling.estimate_top_items, TOP_N))
+            preview_notice(top_sample)
 
+            # Creamos las tres columnas para el dashboard
+            col1, col2, col3 = st.columns(3, gap="large")
 
-            # --- SECCIÓN DE HISTORIAL POR CANCIÓN ---
-            st.markdown("---")
-            st.subheader("📜 Track Position History")
-            track_list = ["Select a track..."] + sorted(weekly_results_df['master_metadata_track_name'].unique())
-            selected_track = st.selectbox("Choose a track to see its full history:", track_list)
-            if selected_track != "Select a track...":
-                history_df = weekly_results_df[weekly_results_df['master_metadata_track_name'] == selected_track].sort_values('week_id')
-                fig = px.line(history_df, x='week_id', y='rank', title=f'Weekly Rank for "{selected_track}"', markers=True, labels={'week_id': 'Week', 'rank': 'Rank'})
-                fig.update_yaxes(autorange="reversed", tick0=1, dtick=1)
-                st.plotly_chart(fig, use_container_width=True)
-                st.write("#### Weekly Data")
-                history_display = history_df[['week_id', 'rank', 'minutes', 'points']].rename(columns={'week_id': 'Week', 'rank': 'Rank', 'minutes': 'Minutes Listened', 'points': 'Points Awarded'}).set_index('Week')
-                history_display['Minutes Listened'] = history_display['Minutes Listened'].round(1)
-                st.dataframe(history_display, use_container_width=True)
+            # --- COLUMNA 1: TOP TRACKS ---
+            with col1, profiler.section("Top · tracks"):
+                st.markdown("#### 🎵 Top Tracks")
+
+                # Agregamos para obtener minutos, conteo de reproducciones y el artista
+                top_tracks_df = top_lists['tracks']
+
+                # Gráfico de barras horizontal con Plotly para mejor visualización
+                if not top_tracks_df.empty:
+                    fig_tracks = px.bar(
+                        top_tracks_df.sort_values('total_minutes', ascending=True),
+                        x='total_minutes',
+                        y='master_metadata_track_name',
+                        orientation='h',
+                        text_auto='.0f',
+                        title=f"Top {TOP_N} Tracks by Listening Time"
+                    )
+                    fig_tracks.update_traces(textposition='outside', marker_color='#1DB954')
+                    fig_tracks.update_layout(
+                        yaxis_title=None,
+                        xaxis_title="Total Minutes",
+                        margin=dict(l=0, r=0, t=40, b=20),
+                        height=450
+                    )
+                    st.plotly_chart(fig_tracks, use_container_width=True)
+
+                    # Tabla con detalles adicionales
+                    st.markdown("###### Detailed View")
+                    # Completion and skip rate come from the all-time per-track stats
+                    display_tracks = trackstats.join_track_stats(top_tracks_df, dataset_rollups['track_stats'])
+                    display_tracks = display_tracks[['master_metadata_track_name', 'master_metadata_album_artist_name', 'play_count', 'total_minutes', 'completion_median', 'skip_rate']]
+                    display_tracks.columns = ['Track', 'Artist', 'Plays', 'Minutes', 'Completion %', 'Skip %']
+                    display_tracks['Minutes'] = display_tracks['Minutes'].round(0).astype(int)
+                    display_tracks[['Completion %', 'Skip %']] = (100 * display_tracks[['Completion %', 'Skip %']]).round(0)
+                    display_tracks.index = range(1, len(display_tracks) + 1)
+                    st.dataframe(display_tracks, use_container_width=True)
+                else:
+                    st.warning("No track data available for the selected filters.")
+
+
+            # --- COLUMNA 2: TOP ARTISTS ---
+            with col2, profiler.section("Top · artists"):
+                st.markdown("#### 👩‍🎤 Top Artists")
+
+                # Agregamos para obtener minutos y número de canciones únicas
+                top_artists_df = top_lists['artists']
+
+                # Gráfico de barras horizontal con Plotly
+                if not top_artists_df.empty:
+                    fig_artists = px.bar(
+                        top_artists_df.sort_values('total_minutes', ascending=True),
+                        x='total_minutes',
+                        y='master_metadata_album_artist_name',
+                        orientation='h',
+                        text_auto='.0f',
+                        title=f"Top {TOP_N} Artists by Listening Time"
+                    )
+                    fig_artists.update_traces(textposition='outside', marker_color='#1DB954')
+                    fig_artists.update_layout(
+                        yaxis_title=None,
+                        xaxis_title="Total Minutes",
+                        margin=dict(l=0, r=0, t=40, b=20),
+                        height=450
+                    )
+                    st.plotly_chart(fig_artists, use_container_width=True)
+
+                    # Tabla con detalles adicionales
+                    st.markdown("###### Detailed View")
+                    display_artists = top_artists_df.drop(columns='play_count').rename(columns={'master_metadata_album_artist_name': 'Artist', 'unique_tracks': 'Unique Tracks', 'total_minutes': 'Minutes'})
+                    display_artists['Minutes'] = display_artists['Minutes'].round(0).astype(int)
+                    display_artists.index = range(1, len(display_artists) + 1)
+                    st.dataframe(display_artists, use_container_width=True)
+                else:
+                    st.warning("No artist data available for the selected filters.")
+
+            # --- COLUMNA 3: TOP ALBUMS ---
+            with col3, profiler.section("Top · albums"):
+                st.markdown("#### 📀 Top Albums")
+
+                # Agregamos para obtener minutos, artista y número de canciones únicas
+                top_albums_df = top_lists['albums']
 
-            # --- VISTA SEMANAL ---
+                # Gráfico de barras horizontal con Plotly
+                if not top_albums_df.empty:
+                    fig_albums = px.bar(
+                        top_albums_df.sort_values('total_minutes', ascending=True),
+                        x='total_minutes',
+                        y='master_metadata_album_album_name',
+                        orientation='h',
+                        text_auto='.0f',
+                        title=f"Top {TOP_N} Albums by Listening Time"
+                    )
+                    fig_albums.update_traces(textposition='outside', marker_color='#1DB954')
+                    fig_albums.update_layout(
+                        yaxis_title=None,
+                        xaxis_title="Total Minutes",
+                        margin=dict(l=0, r=0, t=40, b=20),
+                        height=450
+                    )
+                    st.plotly_chart(fig_albums, use_container_width=True)
+
+                    # Tabla con detalles adicionales
+                    st.markdown("###### Detailed View")
+                    display_albums = top_albums_df.drop(columns='play_count').rename(columns={'master_metadata_album_album_name': 'Album', 'master_metadata_album_artist_name': 'Artist', 'unique_tracks': 'Unique Tracks', 'total_minutes': 'Minutes'})
+                    display_albums['Minutes'] = display_albums['Minutes'].round(0).astype(int)
+                    display_albums.index = range(1, len(display_albums) + 1)
+                    st.dataframe(display_albums, use_container_width=True)
+                else:
+                    st.warning("No album data available for the selected filters.")
+
+        ## NUEVO: Pestaña completa de Ranking Semanal con récords y historial por canción
+        # NUEVO: Pestaña completa de Ranking Semanal con analytics de "data nerd", manejo de empates y formato mejorado
+    with tabs[1], profiler.section("Weekly Ranking"):
+        if tabs[1].open:
+            st.subheader("🏆 Weekly Ranking Leaderboard (F1 Style)")
+            st.markdown("""
+            This chart calculates a leaderboard for your most listened-to tracks using a Formula 1 style scoring system.
+            - Each week, we find your **top 10** most-listened tracks (by total minutes).
+            - Points are awarded like in F1: **1st (25), 2nd (18), 3rd (15), 4th (12), 5th (10), 6th (8), 7th (6), 8th (4), 9th (2), 10th (1)**.
+            - Below, you'll find the all-time leaderboard, a deep-dive into records, and a detailed history for each track.
+            """)
+
+            @profiler.cache_data(show_spinner=False)
+            def index_weekly_ranking(_weekly_results_df, filter_key, backend_name):
+                return ranking.index_weekly_ranking(_weekly_results_df)
+
+            weekly_results_df = weekly_ranking_results()
+
+            if weekly_results_df.empty:
+                st.warning("Not enough listening data in the selected period to generate weekly rankings.")
+            else:
+                st.markdown("---")
+                st.subheader("🏁 All-Time Points Leaderboard")
+                weekly_index = index_weekly_ranking(weekly_results_df, filter_key, backend.name)
+                track_summary = weekly_index['summary']
+                overall_scores = track_summary[['total_points', 'total_minutes']].rename_axis('master_metadata_track_name').reset_index()
+                overall_scores.rename(columns={'master_metadata_track_name': 'Track Name', 'total_points': 'Total Points', 'total_minutes': 'Total Minutes'}, inplace=True)
+                overall_scores['Total Minutes'] = overall_scores['Total Minutes'].round(1)
+                overall_scores = overall_scores[['Track Name', 'Total Points', 'Total Minutes']]
+                overall_scores.index += 1
+                tables.paginated_table(overall_scores, key="leaderboard", use_container_width=True)
+
+                # --- SECCIÓN DE RÉCORDS Y FUN FACTS AMPLIADA ---
+                st.markdown("---")
+                st.subheader("🏆 All-Time Records & Fun Facts")
+
+                # --- Funciones de ayuda para calcular récords y manejar empates ---
+                def get_ties(series):
+                    if series.empty: return ("N/A", 0)
+                    max_value = series.max()
+                    tied_songs = series[series == max_value].index.tolist()
+                    return (", ".join(tied_songs), max_value)
+
+                def display_record(column, title, songs_str, value_str):
+                    column.markdown(f"**{title}**")
+                    column.markdown(f"<small>{songs_str}</small>", unsafe_allow_html=True)
+                    column.markdown(f"### {value_str}")
+
+                with st.expander("👑 The GOATs (Greatest of All Time - Track Records)", expanded=True):
+                    st.markdown("#### Most Total Weeks In...")
+                    for column, threshold in zip(st.columns(len(ranking.THRESHOLDS)), ranking.THRESHOLDS):
+                        songs, value = get_ties(track_summary[f'weeks_top{threshold}'])
+                        display_record(column, f"Top {threshold}", songs, f"{int(value)} weeks")
+
+                    st.divider()
+
+                    st.markdown("#### Most Consecutive Weeks In...")
+                    for column, threshold in zip(st.columns(len(ranking.THRESHOLDS)), ranking.THRESHOLDS):
+                        songs, value = get_ties(track_summary[f'streak_top{threshold}'])
+                        display_record(column, f"Top {threshold}", songs, f"{int(value)} weeks")
+
+
+                with st.expander("👩‍🎤 Artist Dominance & Chart Volatility Records"):
+                    col1, col2, col3 = st.columns(3)
+                    # Constructor's Champion
+                    songs_c, value_c = get_ties(weekly_index['artists']['total_points'])
+                    display_record(col1, "Constructor's Champion", songs_c, f"{int(value_c)} points")
+
+                    # Most Chart Hits
+                    songs_h, value_h = get_ties(weekly_index['artists']['chart_hits'])
+                    display_record(col2, "Most Chart Hits (Artist)", songs_h, f"{int(value_h)} songs")
+
+                    # Highest Debut
+                    min_rank = track_summary['debut_rank'].min()
+                    highest_debut_songs = track_summary.index[track_summary['debut_rank'] == min_rank].tolist()
+                    display_record(col3, "Highest Debut of All Time", ", ".join(highest_debut_songs), f"#{int(min_rank)}")
+
+
+                # --- SECCIÓN DE HISTORIAL POR CANCIÓN ---
+                st.markdown("---")
+                st.subheader("📜 Track Position History")
+                track_list = ["Select a track..."] + weekly_index['tracks']
+                selected_track = st.selectbox("Choose a track to see its full history:", track_list)
+                if selected_track != "Select a track...":
+                    history_df = ranking.track_rows(weekly_index, selected_track)
+                    # Plotted on each ISO week's Monday, so weeks out of the chart show as gaps in time
+                    rank_history = pd.Series(history_df['rank'].to_numpy(), index=pd.to_datetime(history_df['week_id'] + '-1', format='%G-W%V-%u'))
+                    timeseries.time_series_chart(rank_history, key=f"track_history_{selected_track}", title=f'Weekly Rank for "{selected_track}"', y_title="Rank", reverse_y=True, markers=True)
+                    st.write("#### Weekly Data")
+                    history_display = history_df[['week_id', 'rank', 'minutes', 'points']].rename(columns={'week_id': 'Week', 'rank': 'Rank', 'minutes': 'Minutes Listened', 'points': 'Points Awarded'}).set_index('Week')
+                    history_display['Minutes Listened'] = history_display['Minutes Listened'].round(1)
+                    st.dataframe(history_display, use_container_width=True)
+                    show_colistened(colisten_index(filtered_df, filter_key, 'master_metadata_track_name'), selected_track, "Track")
+
+                # --- VISTA SEMANAL ---
+                st.markdown("---")
+                st.subheader("📅 View a Specific Week's Ranking")
+                selected_week = st.selectbox("Choose a week to inspect:", weekly_index['weeks'])
+                if selected_week:
+                    week_data = ranking.week_rows(weekly_index, selected_week)
+                    week_data_display = week_data[['rank', 'master_metadata_track_name', 'minutes', 'points']].rename(columns={'rank': 'Rank', 'master_metadata_track_name': 'Track Name', 'minutes': 'Minutes Listened', 'points': 'Points Awarded'})
+                    st.dataframe(week_data_display.set_index('Rank'), use_container_width=True)
+
+            # --- SISTEMAS DE PUNTUACIÓN ---
             st.markdown("---")
-            st.subheader("📅 View a Specific Week's Ranking")
-            unique_weeks = sorted(weekly_results_df['week_id'].unique(), reverse=True)
-            selected_week = st.selectbox("Choose a week to inspect:", unique_weeks)
-            if selected_week:
-                week_data = weekly_results_df[weekly_results_df['week_id'] == selected_week].sort_values('rank').copy()
-                week_data['Minutes Listened'] = week_data['minutes'].round(1)
-                week_data_display = week_data[['rank', 'master_metadata_track_name', 'minutes', 'points']].rename(columns={'rank': 'Rank', 'master_metadata_track_name': 'Track Name', 'minutes': 'Minutes Listened', 'points': 'Points Awarded'})
-                st.dataframe(week_data_display.set_index('Rank'), use_container_width=True)
-
-    with tabs[2]:
-        st.subheader("📈 Monthly Evolution")
-        monthly = filtered_df.set_index('ts').resample('M')['minutes'].sum()
-        st.line_chart(monthly)
-
-        st.subheader("📈 Weekly Evolution")
-        weekly = filtered_df.set_index('ts').resample('W')['minutes'].sum()
-        st.line_chart(weekly)
-
-        # Selector for number of artists, albums, and tracks
-        num_artists = st.number_input("Number of artists to show", min_value=1, max_value=20, value=5, step=1, key="artist_num")
-        num_albums = st.number_input("Number of albums to show", min_value=1, max_value=20, value=5, step=1, key="album_num")
-        num_tracks = st.number_input("Number of tracks to show", min_value=1, max_value=20, value=5, step=1, key="track_num")
-
-        # Monthly evolution by artist
-        st.subheader("📈 Monthly Evolution by Artist")
-        top_artists = filtered_df.groupby('master_metadata_album_artist_name')['minutes'].sum().nlargest(num_artists).index
-        artist_monthly = filtered_df[filtered_df['master_metadata_album_artist_name'].isin(top_artists)].copy()
-        pivot_artist = artist_monthly.pivot_table(index=pd.Grouper(key='ts', freq='M'), columns='master_metadata_album_artist_name', values='minutes', aggfunc='sum', fill_value=0)
-        st.line_chart(pivot_artist)
-
-        # Monthly evolution by album
-        st.subheader("📈 Monthly Evolution by Album")
-        top_albums = filtered_df.groupby('master_metadata_album_album_name')['minutes'].sum().nlargest(num_albums).index
-        album_monthly = filtered_df[filtered_df['master_metadata_album_album_name'].isin(top_albums)].copy()
-        pivot_album = album_monthly.pivot_table(index=pd.Grouper(key='ts', freq='M'), columns='master_metadata_album_album_name', values='minutes', aggfunc='sum', fill_value=0)
-        st.line_chart(pivot_album)
-
-        # Monthly evolution by track
-        st.subheader("📈 Monthly Evolution by Track")
-        top_tracks = filtered_df.groupby('master_metadata_track_name')['minutes'].sum().nlargest(num_tracks).index
-        track_monthly = filtered_df[filtered_df['master_metadata_track_name'].isin(top_tracks)].copy()
-        pivot_track = track_monthly.pivot_table(index=pd.Grouper(key='ts', freq='M'), columns='master_metadata_track_name', values='minutes', aggfunc='sum', fill_value=0)
-        st.line_chart(pivot_track)
-
-    with tabs[3]:
-        st.subheader("📊 Distributions")
-        fig, axs = plt.subplots(3, 2, figsize=(15, 12))
-        fig.tight_layout(pad=4.0)
-
-        sns.histplot(filtered_df['hour'], bins=24, ax=axs[0, 0], kde=True).set_title("By Hour of Day")
-        sns.histplot(filtered_df['weekday'], bins=7, ax=axs[0, 1], kde=True).set_title("By Day of Week")
-        axs[0, 1].set_xticks(range(7), ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
-
-        sns.histplot(filtered_df['month'], bins=12, ax=axs[1, 0], kde=True).set_title("By Month")
-        axs[1, 0].set_xticks(range(1, 13))
+            st.subheader("🧮 Compare Scoring Systems")
+
+            @profiler.cache_data(show_spinner="Ranking every period...")
+            def calculate_rank_table(_daily_df, filter_key, col, cadence, metric, depth):
+                return scoring.rank_table(_daily_df, col, cadence, metric, depth)
+
+            col1, col2, col3 = st.columns(3)
+            score_entity = col1.selectbox("Rank", list(scoring.ENTITY_COLUMNS), key="score_entity")
+            score_cadence = col2.selectbox("Every", scoring.CADENCES, key="score_cadence")
+            score_metric = col3.selectbox("By", scoring.METRICS, key="score_metric", help="Blended mixes each item's share of the period's minutes and plays 50/50.")
+            score_schemes = st.multiselect("Points systems", list(scoring.SCHEMES), default=list(scoring.SCHEMES)[:3], key="score_schemes")
+            custom_points = st.text_input("Custom points table (comma separated, 1st place first)", placeholder="e.g. 10, 7, 5, 3, 1", key="score_custom")
+            schemes = {name: scoring.SCHEMES[name] for name in score_schemes}
+            try:
+                custom = [float(p) for p in custom_points.split(',') if p.strip()]
+            except ValueError:
+                st.warning("The custom points table must be a list of numbers.")
+                custom = []
+            if custom:
+                schemes['Custom'] = custom
+
+            if schemes:
+                # One rank table serves every scheme; it only gets rebuilt for a deeper custom table
+                depth = max(len(points) for points in [*scoring.SCHEMES.values(), custom])
+                rank_counts = calculate_rank_table(filtered_daily_df, filter_key, scoring.ENTITY_COLUMNS[score_entity], score_cadence, score_metric, depth)
+                table = scoring.standings(rank_counts, schemes)
+                # Position under each system next to its points
+                for name in schemes:
+                    table[f"{name} pos"] = table[name].rank(method='min', ascending=False).astype(int)
+                table.index.name = score_entity[:-1]
+                tables.paginated_table(table, key="standings", use_container_width=True)
+            else:
+                st.info("Pick at least one points system.")
+
+    with tabs[2], profiler.section("Temporal"):
+        if tabs[2].open:
+            st.subheader("📈 Monthly Evolution")
+            monthly = filtered_df.set_index('ts').resample('M')['minutes'].sum()
+            st.line_chart(monthly)
+
+            st.subheader("📈 Weekly Evolution")
+            weekly = filtered_df.set_index('ts').resample('W')['minutes'].sum()
+            timeseries.time_series_chart(weekly, key="weekly_evolution", y_title="Minutes")
+
+            # Rolling trends: the daily base is built once per filter set, windows are derived from it
+            @profiler.cache_data(show_spinner=False)
+            def daily_activity(_daily_df, filter_key):
+                return trends.daily_activity(_daily_df)
+
+            @profiler.cache_data(show_spinner=False)
+            def rolling_trends(_activity, filter_key, window):
+                return trends.rolling_trends(_activity, window)
+
+            st.subheader("📈 Rolling Trends")
+            window = st.radio("Window (days)", trends.WINDOWS, index=1, horizontal=True, key="trend_window")
+            rolling = rolling_trends(daily_activity(filtered_daily_df, filter_key), filter_key, window)
+            st.caption(f"Average minutes per day over the last {window} days")
+            st.line_chart(rolling['avg_minutes'])
+            col1, col2 = st.columns(2)
+            with col1:
+                st.caption(f"Top artist's share of minutes over the last {window} days (%)")
+                st.line_chart(rolling['top_artist_share'])
+            with col2:
+                st.caption(f"Distinct artists played in the last {window} days")
+                st.line_chart(rolling['distinct_artists'])
+
+            # Selector for number of artists, albums, and tracks
+            num_artists = st.number_input("Number of artists to show", min_value=1, max_value=20, value=5, step=1, key="artist_num")
+            num_albums = st.number_input("Number of albums to show", min_value=1, max_value=20, value=5, step=1, key="album_num")
+            num_tracks = st.number_input("Number of tracks to show", min_value=1, max_value=20, value=5, step=1, key="track_num")
+
+            # Monthly evolution by artist
+            st.subheader("📈 Monthly Evolution by Artist")
+            st.line_chart(timegrid.top(time_grid(filtered_df, filter_key, 'master_metadata_album_artist_name'), num_artists))
+
+            # Monthly evolution by album
+            st.subheader("📈 Monthly Evolution by Album")
+            st.line_chart(timegrid.top(time_grid(filtered_df, filter_key, 'master_metadata_album_album_name'), num_albums))
+
+            # Monthly evolution by track
+            st.subheader("📈 Monthly Evolution by Track")
+            st.line_chart(timegrid.top(time_grid(filtered_df, filter_key, 'master_metadata_track_name'), num_tracks))
+
+    with tabs[3], profiler.section("Distributions"):
+        if tabs[3].open:
+            plt, sns = plotting.pyplot_and_seaborn()
+            st.subheader("📊 Distributions")
+            panels, distribution_sample = exact_or_preview("Distributions", lambda sample: overview.distributions(sample, sample['weight']))
+            preview_notice(distribution_sample)
+
+            def draw_histogram(ax, panel, xlabel, color='C0'):
+                # Bars and density curve from precomputed counts, drawn like sns.histplot(kde=True)
+                edges = panel['edges']
+                sns.histplot(x=edges[:-1], weights=panel['counts'], bins=list(edges), ax=ax, color=color)
+                if panel['curve'] is not None:
+                    ax.plot(*panel['curve'], color=color)
+                ax.set_xlabel(xlabel)
+                return ax
+
+            fig, axs = plt.subplots(3, 2, figsize=(15, 12))
+            fig.tight_layout(pad=4.0)
+
+            draw_histogram(axs[0, 0], panels['hour'], 'hour').set_title("By Hour of Day")
+            draw_histogram(axs[0, 1], panels['weekday'], 'weekday').set_title("By Day of Week")
+            axs[0, 1].set_xticks(range(7), ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
+
+            draw_histogram(axs[1, 0], panels['month'], 'month').set_title("By Month")
+            axs[1, 0].set_xticks(range(1, 13))
         
-        years = sorted(filtered_df['year'].unique())
-        sns.histplot(filtered_df['year'], bins=len(years), ax=axs[1, 1]).set_title("By Year")
-        axs[1, 1].set_xticks(years)
+            years = sorted(filtered_df['year'].unique())
+            draw_histogram(axs[1, 1], panels['year'], 'year').set_title("By Year")
+            axs[1, 1].set_xticks(years)
 
-        # Distribution of track duration
-        sns.histplot(filtered_df[filtered_df['minutes'] < 10]['minutes'], bins=50, ax=axs[2, 0], kde=True).set_title("Track Duration (Minutes, <10min)")
+            # Distribution of track duration
+            draw_histogram(axs[2, 0], panels['duration'], 'minutes').set_title("Track Duration (Minutes, <10min)")
         
-        # Distribution of playback start second
-        filtered_df['start_second'] = filtered_df['ts'].dt.second
-        sns.histplot(filtered_df['start_second'], bins=60, ax=axs[2, 1], color='orange', kde=True)
-        axs[2, 1].set_title("Playback Start Second")
-        axs[2, 1].set_xlabel("Second of the Minute (0-59)")
-        axs[2, 1].set_ylabel("Count")
-
-        st.pyplot(fig)
-
-
-    with tabs[4]:
-        st.subheader("🗺️ Activity Heatmap (Day of Week vs Hour)")
-        pivot = filtered_df.pivot_table(index='weekday', columns='hour', values='minutes', aggfunc='sum', fill_value=0)
-        pivot.index = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        fig = plt.figure(figsize=(12, 5))
-        sns.heatmap(pivot, cmap="viridis", linewidths=.5)
-        plt.title("Listening activity by hour and day of the week")
-        st.pyplot(fig)
-
-        st.subheader("📅 Calendar Heatmap (Day vs Month)")
-        filtered_df['day_of_month'] = filtered_df['ts'].dt.day
-        calendar_pivot = filtered_df.pivot_table(index='month', columns='day_of_month', values='minutes', aggfunc='sum', fill_value=0)
-        fig = plt.figure(figsize=(14, 6))
-        sns.heatmap(calendar_pivot, cmap="viridis", linewidths=.5)
-        plt.title("Listening activity by day and month")
-        st.pyplot(fig)
-
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.subheader("Top 5 Artists")
-            top_artists = filtered_df.groupby('master_metadata_album_artist_name')['minutes'].sum().nlargest(5).index
-            top_artists_df = filtered_df[filtered_df['master_metadata_album_artist_name'].isin(top_artists)]
-            artist_pivot = top_artists_df.pivot_table(index='year', columns='master_metadata_album_artist_name', values='minutes', aggfunc='sum', fill_value=0)
-            fig = plt.figure(figsize=(10, 4))
-            sns.heatmap(artist_pivot, cmap="viridis", annot=True, fmt=".0f")
-            st.pyplot(fig)
-        with col2:
-            st.subheader("Top 5 Albums")
-            top_albums = filtered_df.groupby('master_metadata_album_album_name')['minutes'].sum().nlargest(5).index
-            top_albums_df = filtered_df[filtered_df['master_metadata_album_album_name'].isin(top_albums)]
-            album_pivot = top_albums_df.pivot_table(index='year', columns='master_metadata_album_album_name', values='minutes', aggfunc='sum', fill_value=0)
-            fig = plt.figure(figsize=(10, 4))
-            sns.heatmap(album_pivot, cmap="viridis", annot=True, fmt=".0f")
-            st.pyplot(fig)
-        with col3:
-            st.subheader("Top 5 Tracks")
-            top_tracks = filtered_df.groupby('master_metadata_track_name')['minutes'].sum().nlargest(5).index
-            top_tracks_df = filtered_df[filtered_df['master_metadata_track_name'].isin(top_tracks)]
-            track_pivot = top_tracks_df.pivot_table(index='year', columns='master_metadata_track_name', values='minutes', aggfunc='sum', fill_value=0)
-            fig = plt.figure(figsize=(10, 4))
-            sns.heatmap(track_pivot, cmap="viridis", annot=True, fmt=".0f")
-            st.pyplot(fig)
-
+            # Distribution of playback start second
+            draw_histogram(axs[2, 1], panels['start_second'], 'start_second', color='orange')
+            axs[2, 1].set_title("Playback Start Second")
+            axs[2, 1].set_xlabel("Second of the Minute (0-59)")
+            axs[2, 1].set_ylabel("Count")
 
-    with tabs[5]:
-        st.subheader("📆 Listening Streaks")
+            st.pyplot(fig)
 
-        daily_minutes = filtered_df.groupby('date')['minutes'].sum()
-        full_date_range = pd.date_range(start=daily_minutes.index.min(), end=daily_minutes.index.max())
-        daily_minutes = daily_minutes.reindex(full_date_range.date, fill_value=0)
 
-        days_with = (daily_minutes > 0).sum()
-        days_without = (daily_minutes == 0).sum()
-        total_days_in_range = len(daily_minutes)
+    with tabs[4], profiler.section("Heatmaps"):
+        if tabs[4].open:
+            plt, sns = plotting.pyplot_and_seaborn()
+            (pivot, calendar_pivot), heatmap_sample = exact_or_preview("Heatmaps", lambda sample: overview.activity_pivots(sample, sample['weight']))
+            preview_notice(heatmap_sample)
 
-        streaks = (daily_minutes > 0).astype(int).groupby(daily_minutes.eq(0).cumsum()).sum()
-        max_streak = streaks.max() if not streaks.empty else 0
+            def top_by_year(col):
+                # The preview's grid comes from the sample, with minutes scaled by the sample weights
+                if heatmap_sample is None:
+                    grid = time_grid(filtered_df, filter_key, col)
+                else:
+                    grid = timegrid.build_time_grid(sampling.scaled_minutes(heatmap_sample), col)
+                return timegrid.by_year(timegrid.top(grid, 5))
+
+            st.subheader("🗺️ Activity Heatmap (Day of Week vs Hour)")
+            pivot = pivot.copy()
+            pivot.index = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+            fig = plt.figure(figsize=(12, 5))
+            sns.heatmap(pivot, cmap="viridis", linewidths=.5)
+            plt.title("Listening activity by hour and day of the week")
+            st.pyplot(fig)
 
-        zero_streaks = (daily_minutes == 0).astype(int).groupby(daily_minutes.gt(0).cumsum()).sum()
-        max_zero_streak = zero_streaks.max() if not zero_streaks.empty else 0
+            st.subheader("📅 Calendar Heatmap (Day vs Month)")
+            fig = plt.figure(figsize=(14, 6))
+            sns.heatmap(calendar_pivot, cmap="viridis", linewidths=.5)
+            plt.title("Listening activity by day and month")
+            st.pyplot(fig)
 
-        st.metric("Total days in selected range", total_days_in_range)
-        st.metric("Days with listening", f"{days_with} days")
-        st.metric("Days without listening", f"{days_without} days")
-        st.metric("Longest streak of consecutive listening days", f"{max_streak} days")
-        st.metric("Longest streak of consecutive days without listening", f"{max_zero_streak} days")
-        st.write(f"Average minutes per day (on days you listened): {daily_minutes[daily_minutes > 0].mean():.2f}")
-        st.write(f"Average minutes per day (across all days in range): {daily_minutes.mean():.2f}")
+            col1, col2, col3 = st.columns(3)
+            with col1, profiler.section("Heatmaps · top artists"):
+                st.subheader("Top 5 Artists")
+                artist_pivot = top_by_year('master_metadata_album_artist_name')
+                fig = plt.figure(figsize=(10, 4))
+                sns.heatmap(artist_pivot, cmap="viridis", annot=True, fmt=".0f")
+                st.pyplot(fig)
+            with col2, profiler.section("Heatmaps · top albums"):
+                st.subheader("Top 5 Albums")
+                album_pivot = top_by_year('master_metadata_album_album_name')
+                fig = plt.figure(figsize=(10, 4))
+                sns.heatmap(album_pivot, cmap="viridis", annot=True, fmt=".0f")
+                st.pyplot(fig)
+            with col3, profiler.section("Heatmaps · top tracks"):
+                st.subheader("Top 5 Tracks")
+                track_pivot = top_by_year('master_metadata_track_name')
+                fig = plt.figure(figsize=(10, 4))
+                sns.heatmap(track_pivot, cmap="viridis", annot=True, fmt=".0f")
+                st.pyplot(fig)
 
-    with tabs[6]:
-        st.subheader("👑 Top 5 Artists by Year")
-        artist_year = filtered_df.groupby(['year', 'master_metadata_album_artist_name'])['minutes'].sum().reset_index()
-        top = artist_year.sort_values(['year','minutes'], ascending=[True, False]).groupby('year').head(5)
-        fig = px.bar(top, x='year', y='minutes', color='master_metadata_album_artist_name',
-                     title="Top 5 Most Listened Artists Each Year", barmode='group',
-                     labels={'minutes': 'Total Minutes Listened', 'year': 'Year', 'master_metadata_album_artist_name': 'Artist'})
-        st.plotly_chart(fig, use_container_width=True)
 
-    with tabs[7]:
-        st.subheader("📋 Global Statistics Summary")
+    with tabs[5], profiler.section("Streaks"):
+        if tabs[5].open:
+            st.subheader("📆 Listening Streaks")
+
+            streak_stats = backend.daily_streak_stats(filtered_df)
+
+            st.metric("Total days in selected range", streak_stats['total_days'])
+            st.metric("Days with listening", f"{streak_stats['days_with']} days")
+            st.metric("Days without listening", f"{streak_stats['days_without']} days")
+            st.metric("Longest streak of consecutive listening days", f"{streak_stats['max_streak']} days")
+            st.metric("Longest streak of consecutive days without listening", f"{streak_stats['max_zero_streak']} days")
+            st.write(f"Average minutes per day (on days you listened): {streak_stats['avg_listening_days']:.2f}")
+            st.write(f"Average minutes per day (across all days in range): {streak_stats['avg_all_days']:.2f}")
+
+    with tabs[6], profiler.section("Artists & Albums"):
+        if tabs[6].open:
+            px = plotting.plotly_express()
+
+            # One (year, entity) aggregate of the daily rollup per filter set; every year pair is derived from it
+            @profiler.cache_data(show_spinner=False)
+            def yearly_comparison(_daily_df, filter_key, col):
+                yearly = yoy.yearly_totals(_daily_df, col)
+                pairs = yoy.year_over_year(yearly, col)
+                return yearly, pairs, yoy.retention(pairs)
+
+            st.subheader("👑 Top 5 Artists by Year")
+            artist_year, _, _ = yearly_comparison(filtered_daily_df, filter_key, 'master_metadata_album_artist_name')
+            top = artist_year[artist_year['rank'] <= 5]
+            fig = px.bar(top, x='year', y='minutes', color='master_metadata_album_artist_name',
+                         title="Top 5 Most Listened Artists Each Year", barmode='group',
+                         labels={'minutes': 'Total Minutes Listened', 'year': 'Year', 'master_metadata_album_artist_name': 'Artist'})
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.subheader("🔁 Year over Year")
+            yoy_cols = st.columns([1, 1, 2])
+            yoy_entity = yoy_cols[0].selectbox("Compare", list(RACE_ITEM_COLUMNS), key="yoy_entity")
+            yoy_col = RACE_ITEM_COLUMNS[yoy_entity]
+            _, yoy_pairs, yoy_retention = yearly_comparison(filtered_daily_df, filter_key, yoy_col)
+            if yoy_retention.empty:
+                st.info("Year-over-year comparisons need listening in at least two different years.")
+            else:
+                pair_labels = {f"{int(row.previous_year)} → {int(row.year)}": int(row.year) for row in yoy_retention.itertuples()}
+                yoy_year = pair_labels[yoy_cols[1].selectbox("Years", list(pair_labels)[::-1], key="yoy_years")]
+                pair = yoy_pairs[yoy_pairs['year'] == yoy_year]
+                summary = yoy_retention[yoy_retention['year'] == yoy_year].iloc[0]
+
+                metric_cols = st.columns(4)
+                metric_cols[0].metric(f"Top {yoy.RETENTION_TOP} kept in the top {yoy.RETENTION_TOP}", f"{summary['still_top']} / {summary['previous_top']}")
+                metric_cols[1].metric(f"Last year's top {yoy.RETENTION_TOP} still played", f"{summary['still_played']} / {summary['previous_top']}")
+                metric_cols[2].metric(f"New {yoy_entity.lower()}", f"{summary['entered']:,}")
+                metric_cols[3].metric(f"Dropped {yoy_entity.lower()}", f"{summary['dropped']:,}")
+
+                movers = pair.rename(columns={yoy_col: yoy_entity[:-1], 'minutes': 'Minutes', 'previous_minutes': 'Prev. minutes', 'delta_minutes': 'Δ minutes',
+                                              'rank': 'Rank', 'previous_rank': 'Prev. rank', 'movement': 'Movement', 'status': 'Status'})
+                movers = movers.drop(columns=['year', 'previous_year']).round({'Minutes': 0, 'Prev. minutes': 0, 'Δ minutes': 0})
+                tables.paginated_table(movers, key="yoy", search_columns=[yoy_entity[:-1]], hide_index=True, use_container_width=True)
+
+                st.markdown(f"###### Retention of each year's top {yoy.RETENTION_TOP} {yoy_entity.lower()}")
+                st.line_chart(yoy_retention.set_index('year')[['still_top', 'still_played']].rename(
+                    columns={'still_top': f'Still in the top {yoy.RETENTION_TOP}', 'still_played': 'Still played'}))
+
+    with tabs[7], profiler.section("Summary"):
+        if tabs[7].open:
+            st.subheader("📋 Global Statistics Summary")
         
-        total_minutes = int(filtered_df['minutes'].sum())
-        total_hours = round(filtered_df['minutes'].sum() / 60, 2)
-        total_tracks = filtered_df['master_metadata_track_name'].nunique()
-        total_albums = filtered_df['master_metadata_album_album_name'].nunique()
-        total_artists = filtered_df['master_metadata_album_artist_name'].nunique()
-        total_days = filtered_df['date'].nunique()
-        total_weeks = filtered_df.groupby([filtered_df['ts'].dt.isocalendar().year, filtered_df['ts'].dt.isocalendar().week]).ngroups
-        total_months = filtered_df.groupby(['year', 'month']).ngroups
-        total_years = filtered_df['year'].nunique()
-
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Total Hours Listened", f"{total_hours:,.2f} h")
-        col2.metric("Total Minutes Listened", f"{total_minutes:,.0f} min")
-        col3.metric("Total Days with Listening", f"{total_days:,}")
-
-        col1.metric("Unique Tracks", f"{total_tracks:,}")
-        col2.metric("Unique Albums", f"{total_albums:,}")
-        col3.metric("Unique Artists", f"{total_artists:,}")
+            total_minutes = int(filtered_df['minutes'].sum())
+            total_hours = round(filtered_df['minutes'].sum() / 60, 2)
+            distinct = distinct_counts(filtered_df, start_date, end_date, bool(artist_filter or album_filter or track_filter))
+            total_tracks = distinct['track']
+            total_albums = distinct['album']
+            total_artists = distinct['artist']
+            total_days = filtered_df['date'].nunique()
+            total_weeks = filtered_df.groupby([filtered_df['ts'].dt.isocalendar().year, filtered_df['ts'].dt.isocalendar().week]).ngroups
+            total_months = filtered_df.groupby(['year', 'month']).ngroups
+            total_years = filtered_df['year'].nunique()
+
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Total Hours Listened", f"{total_hours:,.2f} h")
+            col2.metric("Total Minutes Listened", f"{total_minutes:,.0f} min")
+            col3.metric("Total Days with Listening", f"{total_days:,}")
+
+            col1.metric("Unique Tracks", f"{total_tracks:,}")
+            col2.metric("Unique Albums", f"{total_albums:,}")
+            col3.metric("Unique Artists", f"{total_artists:,}")
+            approx_caption()
         
-        st.markdown("---")
-        most_played_track = filtered_df.groupby('master_metadata_track_name')['minutes'].sum().idxmax()
-        most_played_track_minutes = filtered_df.groupby('master_metadata_track_name')['minutes'].sum().max()
-        most_played_artist = filtered_df.groupby('master_metadata_album_artist_name')['minutes'].sum().idxmax()
-        most_played_artist_minutes = filtered_df.groupby('master_metadata_album_artist_name')['minutes'].sum().max()
-        most_played_album = filtered_df.groupby('master_metadata_album_album_name')['minutes'].sum().idxmax()
-        most_played_album_minutes = filtered_df.groupby('master_metadata_album_album_name')['minutes'].sum().max()
-
-        st.write(f"🔝 **Most played track:** {most_played_track} ({int(most_played_track_minutes)} min)")
-        st.write(f"👑 **Most played artist:** {most_played_artist} ({int(most_played_artist_minutes)} min)")
-        st.write(f"🏆 **Most played album:** {most_played_album} ({int(most_played_album_minutes)} min)")
-        st.markdown("---")
+            st.markdown("---")
+            most_played_track = filtered_df.groupby('master_metadata_track_name')['minutes'].sum().idxmax()
+            most_played_track_minutes = filtered_df.groupby('master_metadata_track_name')['minutes'].sum().max()
+            most_played_artist = filtered_df.groupby('master_metadata_album_artist_name')['minutes'].sum().idxmax()
+            most_played_artist_minutes = filtered_df.groupby('master_metadata_album_artist_name')['minutes'].sum().max()
+            most_played_album = filtered_df.groupby('master_metadata_album_album_name')['minutes'].sum().idxmax()
+            most_played_album_minutes = filtered_df.groupby('master_metadata_album_album_name')['minutes'].sum().max()
+
+            st.write(f"🔝 **Most played track:** {most_played_track} ({int(most_played_track_minutes)} min)")
+            st.write(f"👑 **Most played artist:** {most_played_artist} ({int(most_played_artist_minutes)} min)")
+            st.write(f"🏆 **Most played album:** {most_played_album} ({int(most_played_album_minutes)} min)")
+            st.markdown("---")
         
-        avg_minutes_per_day = filtered_df.groupby('date')['minutes'].sum().mean()
-        st.write(f"📊 **Average minutes per day (on listening days):** {avg_minutes_per_day:.2f} min")
+            avg_minutes_per_day = filtered_df.groupby('date')['minutes'].sum().mean()
+            st.write(f"📊 **Average minutes per day (on listening days):** {avg_minutes_per_day:.2f} min")
         
-        st.markdown("---")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.markdown("### 🏅 Top 5 Tracks")
-            st.dataframe(filtered_df.groupby('master_metadata_track_name')['minutes'].sum().nlargest(5).reset_index().rename(columns={'minutes': 'Minutes (sum)'}))
-        with col2:
-            st.markdown("### 🏅 Top 5 Artists")
-            st.dataframe(filtered_df.groupby('master_metadata_album_artist_name')['minutes'].sum().nlargest(5).reset_index().rename(columns={'minutes': 'Minutes (sum)'}))
-        with col3:
-            st.markdown("### 🏅 Top 5 Albums")
-            st.dataframe(filtered_df.groupby('master_metadata_album_album_name')['minutes'].sum().nlargest(5).reset_index().rename(columns={'minutes': 'Minutes (sum)'}))
-            
-        st.markdown("---")
-        filtered_df['datetime_hour'] = filtered_df['ts'].dt.floor('H')
-        hourly_minutes = filtered_df.groupby('datetime_hour')['minutes'].sum()
-        if not hourly_minutes.empty:
-            full_hour_range = pd.date_range(start=hourly_minutes.index.min(), end=hourly_minutes.index.max(), freq='H')
-            hourly_minutes = hourly_minutes.reindex(full_hour_range, fill_value=0)
+            st.markdown("---")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.markdown("### 🏅 Top 5 Tracks")
+                st.dataframe(filtered_df.groupby('master_metadata_track_name')['minutes'].sum().nlargest(5).reset_index().rename(columns={'minutes': 'Minutes (sum)'}))
+            with col2:
+                st.markdown("### 🏅 Top 5 Artists")
+                st.dataframe(filtered_df.groupby('master_metadata_album_artist_name')['minutes'].sum().nlargest(5).reset_index().rename(columns={'minutes': 'Minutes (sum)'}))
+            with col3:
+                st.markdown("### 🏅 Top 5 Albums")
+                st.dataframe(filtered_df.groupby('master_metadata_album_album_name')['minutes'].sum().nlargest(5).reset_index().rename(columns={'minutes': 'Minutes (sum)'}))
             
-            hourly_streaks = (hourly_minutes > 0).astype(int).groupby(hourly_minutes.eq(0).cumsum()).sum()
-            max_hour_streak = hourly_streaks.max() if not hourly_streaks.empty else 0
-            st.write(f"⏰ **Longest streak of consecutive hours with listening:** {max_hour_streak} hours")
-
-
-    with tabs[8]:
-        st.subheader("🎲 Game: Which is more played?")
-        game_type = st.radio("What do you want to compare?", ["Artists", "Tracks"], horizontal=True)
-
-        @st.cache_data(show_spinner=False)
-        def get_top_items(df, col_name, n):
-            return (df.groupby(col_name)['minutes']
-                      .sum()
-                      .nlargest(n)
-                      .reset_index()
-                      .rename(columns={col_name: 'name', 'minutes': 'minutes'}))
-
-        if game_type == "Artists":
-            top_items = get_top_items(filtered_df, 'master_metadata_album_artist_name', 100)
-            label = "artist"
-        else: # Tracks
-            top_items = get_top_items(filtered_df, 'master_metadata_track_name', 200)
-            label = "track"
-
-        if f"game_score_{label}" not in st.session_state:
-            st.session_state[f"game_score_{label}"] = {'correct': 0, 'incorrect': 0}
-        if f"game_pair_{label}" not in st.session_state:
-            st.session_state[f"game_pair_{label}"] = None
-        if f"game_answered_{label}" not in st.session_state:
-            st.session_state[f"game_answered_{label}"] = True
-
-        if len(top_items) < 2:
-            st.warning(f"Not enough {label} data to play. Try adjusting filters.")
-        else:
-            if st.session_state[f"game_answered_{label}"]:
-                st.session_state[f"game_pair_{label}"] = random.sample(range(len(top_items)), 2)
-                st.session_state[f"game_answered_{label}"] = False
+            st.markdown("---")
+            if not filtered_df.empty:
+                max_hour_streak = streaks.longest_hourly_streak(filtered_df)
+                st.write(f"⏰ **Longest streak of consecutive hours with listening:** {max_hour_streak} hours")
+
+
+    with tabs[8], profiler.section("Game"):
+        if tabs[8].open:
+            st.subheader("🎲 Game: Which is more played?")
+            game_type = st.radio("What do you want to compare?", ["Artists", "Tracks"], horizontal=True)
+
+            @profiler.cache_data(show_spinner=False)
+            def get_top_items(df, col_name, n):
+                return (df.groupby(col_name)['minutes']
+                          .sum()
+                          .nlargest(n)
+                          .reset_index()
+                          .rename(columns={col_name: 'name', 'minutes': 'minutes'}))
+
+            if game_type == "Artists":
+                top_items = get_top_items(filtered_df, 'master_metadata_album_artist_name', 100)
+                label = "artist"
+            else: # Tracks
+                top_items = get_top_items(filtered_df, 'master_metadata_track_name', 200)
+                label = "track"
+
+            if f"game_score_{label}" not in st.session_state:
+                st.session_state[f"game_score_{label}"] = {'correct': 0, 'incorrect': 0}
+            if f"game_pair_{label}" not in st.session_state:
+                st.session_state[f"game_pair_{label}"] = None
+            if f"game_answered_{label}" not in st.session_state:
+                st.session_state[f"game_answered_{label}"] = True
+
+            if len(top_items) < 2:
+                st.warning(f"Not enough {label} data to play. Try adjusting filters.")
+            else:
+                if st.session_state[f"game_answered_{label}"]:
+                    st.session_state[f"game_pair_{label}"] = random.sample(range(len(top_items)), 2)
+                    st.session_state[f"game_answered_{label}"] = False
             
-            idx1, idx2 = st.session_state[f"game_pair_{label}"]
-            option1 = top_items.iloc[idx1]
-            option2 = top_items.iloc[idx2]
+                idx1, idx2 = st.session_state[f"game_pair_{label}"]
+                option1 = top_items.iloc[idx1]
+                option2 = top_items.iloc[idx2]
 
-            st.write(f"Which {label} have you listened to more?")
+                st.write(f"Which {label} have you listened to more?")
             
-            colA, colB = st.columns(2)
+                colA, colB = st.columns(2)
             
-            is_answered = st.session_state.get(f"game_show_result_{label}", False)
+                is_answered = st.session_state.get(f"game_show_result_{label}", False)
             
-            with colA:
-                if st.button(option1['name'], key=f"{label}_A", use_container_width=True, disabled=is_answered):
-                    st.session_state[f"game_show_result_{label}"] = True
-                    st.session_state[f"game_player_choice_{label}"] = option1['name']
-                    st.rerun()
-
-            with colB:
-                if st.button(option2['name'], key=f"{label}_B", use_container_width=True, disabled=is_answered):
-                    st.session_state[f"game_show_result_{label}"] = True
-                    st.session_state[f"game_player_choice_{label}"] = option2['name']
-                    st.rerun()
+                with colA:
+                    if st.button(option1['name'], key=f"{label}_A", use_container_width=True, disabled=is_answered):
+                        st.session_state[f"game_show_result_{label}"] = True
+                        st.session_state[f"game_player_choice_{label}"] = option1['name']
+                        st.rerun()
+
+                with colB:
+                    if st.button(option2['name'], key=f"{label}_B", use_container_width=True, disabled=is_answered):
+                        st.session_state[f"game_show_result_{label}"] = True
+                        st.session_state[f"game_player_choice_{label}"] = option2['name']
+                        st.rerun()
             
-            score = st.session_state[f"game_score_{label}"]
-            st.info(f"Score: {score['correct']} Correct | {score['incorrect']} Incorrect")
+                score = st.session_state[f"game_score_{label}"]
+                st.info(f"Score: {score['correct']} Correct | {score['incorrect']} Incorrect")
 
-            if is_answered:
-                player_choice_name = st.session_state[f"game_player_choice_{label}"]
+                if is_answered:
+                    player_choice_name = st.session_state[f"game_player_choice_{label}"]
                 
-                if option1['minutes'] >= option2['minutes']:
-                    correct_choice = option1
-                else:
-                    correct_choice = option2
+                    if option1['minutes'] >= option2['minutes']:
+                        correct_choice = option1
+                    else:
+                        correct_choice = option2
                 
-                if player_choice_name == correct_choice['name']:
-                    st.success("Correct!")
-                    if not st.session_state.get(f"game_scored_this_round_{label}", False):
-                        st.session_state[f"game_score_{label}"]['correct'] += 1
-                else:
-                    st.error("Incorrect!")
-                    if not st.session_state.get(f"game_scored_this_round_{label}", False):
-                        st.session_state[f"game_score_{label}"]['incorrect'] += 1
-
-                st.session_state[f"game_scored_this_round_{label}"] = True
+                    if player_choice_name == correct_choice['name']:
+                        st.success("Correct!")
+                        if not st.session_state.get(f"game_scored_this_round_{label}", False):
+                            st.session_state[f"game_score_{label}"]['correct'] += 1
+                    else:
+                        st.error("Incorrect!")
+                        if not st.session_state.get(f"game_scored_this_round_{label}", False):
+                            st.session_state[f"game_score_{label}"]['incorrect'] += 1
+
+                    st.session_state[f"game_scored_this_round_{label}"] = True
                 
-                st.write(f"**{option1['name']}**: {option1['minutes']:.0f} minutes")
-                st.write(f"**{option2['name']}**: {option2['minutes']:.0f} minutes")
+                    st.write(f"**{option1['name']}**: {option1['minutes']:.0f} minutes")
+                    st.write(f"**{option2['name']}**: {option2['minutes']:.0f} minutes")
                 
-                if st.button("Next Question", key=f"{label}_next"):
-                    st.session_state[f"game_answered_{label}"] = True
-                    st.session_state[f"game_show_result_{label}"] = False
-                    st.session_state[f"game_scored_this_round_{label}"] = False
-                    st.rerun()
-
-
-    with tabs[9]: # Ajustado para la posición 9
-        st.title("🌟 Your Personalized Wrapped")
-        st.markdown("Relive your year in music. Unlike the official Wrapped, here *you* are in control. Select a year to generate a deep and interactive analysis of your listening habits.")
-
-        # --- 1. CONTROL DEL TIEMPO: EL SELECTOR DE AÑO ---
-        available_years = sorted(df['year'].unique(), reverse=True)
-        if not available_years:
-            st.warning("No data available to generate a Wrapped report.")
-            st.stop()
+                    if st.button("Next Question", key=f"{label}_next"):
+                        st.session_state[f"game_answered_{label}"] = True
+                        st.session_state[f"game_show_result_{label}"] = False
+                        st.session_state[f"game_scored_this_round_{label}"] = False
+                        st.rerun()
+
+
+    with tabs[9], profiler.section("Wrapped"): # Ajustado para la posición 9
+        if tabs[9].open:
+            px = plotting.plotly_express()
+            plt, sns = plotting.pyplot_and_seaborn()
+            st.title("🌟 Your Personalized Wrapped")
+            st.markdown("Relive your year in music. Unlike the official Wrapped, here *you* are in control. Select a year to generate a deep and interactive analysis of your listening habits.")
+
+            # --- 1. CONTROL DEL TIEMPO: EL SELECTOR DE AÑO ---
+            available_years = sorted(df['year'].unique(), reverse=True)
+            if not available_years:
+                st.warning("No data available to generate a Wrapped report.")
+                st.stop()
         
-        header_cols = st.columns([3, 1])
-        with header_cols[0]:
-            st.markdown("###")
-            selected_year = st.selectbox("Select a year to analyze:", available_years, label_visibility="collapsed", key="wrapped_year_selector_final")
-        with header_cols[1]:
-            st.image("https://storage.googleapis.com/pr-newsroom-wp/1/2023/11/Spotify_Wrapped_2023_Logo_Black.png", width=150)
+            header_cols = st.columns([3, 1])
+            with header_cols[0]:
+                st.markdown("###")
+                selected_year = st.selectbox("Select a year to analyze:", available_years, label_visibility="collapsed", key="wrapped_year_selector_final")
+            with header_cols[1]:
+                st.image("https://storage.googleapis.com/pr-newsroom-wp/1/2023/11/Spotify_Wrapped_2023_Logo_Black.png", width=150)
 
-        wrapped_df = df[df['year'] == selected_year].copy()
+            wrapped_df = df[df['year'] == selected_year].copy()
 
-        if wrapped_df.empty:
-            st.error(f"No listening data found for the year {selected_year}. Please select another year.")
-        else:
-            # --- SECCIÓN 2: HEADLINES Y FUN FACTS AMPLIADO ---
-            st.header(f"Your {selected_year} Headlines")
+            if wrapped_df.empty:
+                st.error(f"No listening data found for the year {selected_year}. Please select another year.")
+            else:
+                # --- SECCIÓN 2: HEADLINES Y FUN FACTS AMPLIADO ---
+                st.header(f"Your {selected_year} Headlines")
             
-            # Cálculos principales
-            total_minutes = wrapped_df['minutes'].sum()
-            top_artist_info = wrapped_df.groupby('master_metadata_album_artist_name')['minutes'].sum().nlargest(1).reset_index()
-            top_track_info = wrapped_df.groupby(['master_metadata_track_name', 'master_metadata_album_artist_name'])['minutes'].sum().nlargest(1).reset_index()
-            top_artist_name = top_artist_info['master_metadata_album_artist_name'].iloc[0]
-            top_track_name = top_track_info['master_metadata_track_name'].iloc[0]
-
-            card_cols = st.columns(3)
-            with card_cols[0]:
-                st.markdown(f'<div style="background: linear-gradient(135deg, #003973, #E5E5BE); border-radius: 10px; padding: 20px; height: 160px; display: flex; flex-direction: column; justify-content: center;"><p style="font-size: 16px; color: #FFFFFF; margin:0;">Total Listening Time</p><p style="font-size: 36px; font-weight: bold; color: #FFFFFF;">{int(total_minutes):,}</p><p style="font-size: 16px; color: #FFFFFF; margin:0;">minutes</p></div>', unsafe_allow_html=True)
-            with card_cols[1]:
-                st.markdown(f'<div style="background: linear-gradient(135deg, #B43B3B, #FF7878); border-radius: 10px; padding: 20px; height: 160px; display: flex; flex-direction: column; justify-content: center;"><p style="font-size: 16px; color: #FFFFFF; margin:0;">Your Top Artist</p><p style="font-size: 28px; font-weight: bold; color: #FFFFFF; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; padding-top:10px" title="{top_artist_name}">{top_artist_name}</p></div>', unsafe_allow_html=True)
-            with card_cols[2]:
-                st.markdown(f'<div style="background: linear-gradient(135deg, #2A52BE, #5F9EA0); border-radius: 10px; padding: 20px; height: 160px; display: flex; flex-direction: column; justify-content: center;"><p style="font-size: 16px; color: #FFFFFF; margin:0;">Your Top Track</p><p style="font-size: 28px; font-weight: bold; color: #FFFFFF; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; padding-top:10px" title="{top_track_name}">{top_track_name}</p></div>', unsafe_allow_html=True)
-
-            # Fun Facts Ampliado
-            st.subheader("🧐 Did You Know?")
-            facts_cols = st.columns(5)
-            # 1. Busiest Day
-            most_listened_day = wrapped_df.groupby('date')['minutes'].sum().idxmax()
-            most_listened_day_minutes = wrapped_df.groupby('date')['minutes'].sum().max()
-            facts_cols[0].metric("Busiest Day", most_listened_day.strftime('%b %d'), f"{int(most_listened_day_minutes)} min")
-            # 2. Unique Artists
-            facts_cols[1].metric("Unique Artists", f"{wrapped_df['master_metadata_album_artist_name'].nunique():,}")
-            # 3. Unique Tracks
-            facts_cols[2].metric("Unique Tracks", f"{wrapped_df['master_metadata_track_name'].nunique():,}")
-            # 4. Top Listening Hour
-            top_hour = wrapped_df['hour'].mode()[0]
-            facts_cols[3].metric("Top Listening Hour", f"{top_hour}:00 - {top_hour+1}:00")
-            # 5. Most Played Album
-            top_album = wrapped_df.groupby('master_metadata_album_album_name')['minutes'].sum().idxmax()
-            top_album_minutes = wrapped_df.groupby('master_metadata_album_album_name')['minutes'].sum().max()
-            facts_cols[4].metric("Top Album", top_album, f"{int(top_album_minutes)} min")
+                # Cálculos principales
+                # The Wrapped year ignores entity filters but stays inside the sidebar date range
+                # Headlines, time of day, calendar and Masterpiece stats are computed together, concurrently, and drawn in order below
+                first_listen_years = {kind: rollups.first_listen_years(dataset_rollups, kind) for kind in ('track', 'album', 'artist')}
+                year_blocks = profiler.call("Wrapped · year overview", wrapped.year_overview, wrapped_df, first_listen_years, selected_year,
+                                            lambda: distinct_counts(wrapped_df, max(start_date, date(selected_year, 1, 1)), min(end_date, date(selected_year, 12, 31))))
+                headline_stats = year_blocks['headlines']
+                total_minutes = headline_stats['total_minutes']
+                top_artist_name = headline_stats['top_artist']
+                top_track_name = headline_stats['top_track']
+
+                card_cols = st.columns(3)
+                with card_cols[0]:
+                    st.markdown(f'<div style="background: linear-gradient(135deg, #003973, #E5E5BE); border-radius: 10px; padding: 20px; height: 160px; display: flex; flex-direction: column; justify-content: center;"><p style="font-size: 16px; color: #FFFFFF; margin:0;">Total Listening Time</p><p style="font-size: 36px; font-weight: bold; color: #FFFFFF;">{int(total_minutes):,}</p><p style="font-size: 16px; color: #FFFFFF; margin:0;">minutes</p></div>', unsafe_allow_html=True)
+                with card_cols[1]:
+                    st.markdown(f'<div style="background: linear-gradient(135deg, #B43B3B, #FF7878); border-radius: 10px; padding: 20px; height: 160px; display: flex; flex-direction: column; justify-content: center;"><p style="font-size: 16px; color: #FFFFFF; margin:0;">Your Top Artist</p><p style="font-size: 28px; font-weight: bold; color: #FFFFFF; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; padding-top:10px" title="{top_artist_name}">{top_artist_name}</p></div>', unsafe_allow_html=True)
+                with card_cols[2]:
+                    st.markdown(f'<div style="background: linear-gradient(135deg, #2A52BE, #5F9EA0); border-radius: 10px; padding: 20px; height: 160px; display: flex; flex-direction: column; justify-content: center;"><p style="font-size: 16px; color: #FFFFFF; margin:0;">Your Top Track</p><p style="font-size: 28px; font-weight: bold; color: #FFFFFF; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; padding-top:10px" title="{top_track_name}">{top_track_name}</p></div>', unsafe_allow_html=True)
+
+                # Fun Facts Ampliado
+                st.subheader("🧐 Did You Know?")
+                facts_cols = st.columns(5)
+                # 1. Busiest Day
+                facts_cols[0].metric("Busiest Day", headline_stats['busiest_day'].strftime('%b %d'), f"{int(headline_stats['busiest_day_minutes'])} min")
+                # 2. Unique Artists
+                facts_cols[1].metric("Unique Artists", f"{headline_stats['unique_artists']:,}")
+                # 3. Unique Tracks
+                facts_cols[2].metric("Unique Tracks", f"{headline_stats['unique_tracks']:,}")
+                # 4. Top Listening Hour
+                top_hour = headline_stats['top_hour']
+                facts_cols[3].metric("Top Listening Hour", f"{top_hour}:00 - {top_hour+1}:00")
+                # 5. Most Played Album
+                facts_cols[4].metric("Top Album", headline_stats['top_album'], f"{int(headline_stats['top_album_minutes'])} min")
+                approx_caption()
             
-            st.markdown("---")
-
-            # --- SECCIÓN 3: THE MONTHLY RACE (REINCORPORADO Y MEJORADO) ---
-            st.header("The Monthly Race to the Top")
-            st.markdown("Who dominated your listening each month? This dynamic chart shows the evolution of your Top 5 artists throughout the year. Click on a month to see the ranking! The left chart shows monthly totals, the right chart shows cumulative totals.")
-
-            @st.cache_data
-            def calculate_monthly_race(df_year):
-                df_year['month_name'] = df_year['ts'].dt.strftime('%B')
-                monthly_top5 = df_year.groupby(['month_name', 'master_metadata_album_artist_name'])['minutes'].sum().reset_index()
-                monthly_top5['rank'] = monthly_top5.groupby('month_name')['minutes'].rank(method='first', ascending=False)
-                return monthly_top5[monthly_top5['rank'] <= 5]
-
-            @st.cache_data
-            def calculate_cumulative_monthly_race(df_year):
-                df_year['month_num'] = df_year['ts'].dt.month
-                df_year['month_name'] = df_year['ts'].dt.strftime('%B')
-                # Get all top artists in the year
-                top_artists = df_year.groupby('master_metadata_album_artist_name')['minutes'].sum().nlargest(5).index.tolist()
-                # Prepare cumulative data
-                cumulative = []
-                for m in range(1, 13):
-                    month_df = df_year[df_year['month_num'] <= m]
-                    cum_minutes = month_df.groupby('master_metadata_album_artist_name')['minutes'].sum().reset_index()
-                    cum_minutes['month_num'] = m
-                    cum_minutes['month_name'] = pd.to_datetime(f'{m}', format='%m').strftime('%B')
-                    cum_minutes = cum_minutes[cum_minutes['master_metadata_album_artist_name'].isin(top_artists)]
-                    cum_minutes['rank'] = cum_minutes['minutes'].rank(method='first', ascending=False)
-                    cumulative.append(cum_minutes)
-                cumulative_df = pd.concat(cumulative)
-                return cumulative_df[cumulative_df['rank'] <= 5]
-
-            race_df = calculate_monthly_race(wrapped_df.copy())
-            cumulative_race_df = calculate_cumulative_monthly_race(wrapped_df.copy())
-
-            month_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
-            race_df['month_name'] = pd.Categorical(race_df['month_name'], categories=month_order, ordered=True)
-            race_df.sort_values('month_name', inplace=True)
-            cumulative_race_df['month_name'] = pd.Categorical(cumulative_race_df['month_name'], categories=month_order, ordered=True)
-            cumulative_race_df.sort_values('month_name', inplace=True)
-
-            # Slower animation speed: set frame duration
-            animation_opts = dict(frame=dict(duration=1200, redraw=True), transition=dict(duration=500, easing='linear'))
-
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("#### Monthly Top 5 Artists")
-                if not race_df.empty:
-                    fig_race = px.bar(
-                        race_df,
-                        x="minutes",
-                        y="rank",
-                        orientation='h',
-                        color="master_metadata_album_artist_name",
-                        animation_frame="month_name",
-                        animation_group="master_metadata_album_artist_name",
-                        text="master_metadata_album_artist_name",
-                        title="Monthly Top 5 Artists"
-                    )
-                    fig_race.update_layout(
-                        yaxis=dict(autorange="reversed", showticklabels=False, title="Rank"),
-                        xaxis=dict(title="Minutes Listened"),
-                        legend_title_text='Artist',
-                        height=500,
-                        updatemenus=[{
-                            "type": "buttons",
-                            "buttons": [
-                                {
-                                    "label": "Play",
-                                    "method": "animate",
-                                    "args": [None, animation_opts]
-                                },
-                                {
-                                    "label": "Pause",
-                                    "method": "animate",
-                                    "args": [[None], dict(frame=dict(duration=0, redraw=False), mode="immediate")]
-                                }
-                            ]
-                        }]
-                    )
-                    fig_race.update_traces(textposition='outside', textfont_size=14)
-                    fig_race.layout.xaxis.range = [0, race_df['minutes'].max() * 1.15]
-                    st.plotly_chart(fig_race, use_container_width=True)
-                else:
-                    st.warning("Not enough data for the monthly race.")
-
-            with col2:
-                st.markdown("#### Cumulative Top 5 Artists")
-                if not cumulative_race_df.empty:
-                    fig_cum_race = px.bar(
-                        cumulative_race_df,
-                        x="minutes",
-                        y="rank",
-                        orientation='h',
-                        color="master_metadata_album_artist_name",
-                        animation_frame="month_name",
-                        animation_group="master_metadata_album_artist_name",
-                        text="master_metadata_album_artist_name",
-                        title="Cumulative Top 5 Artists"
-                    )
-                    fig_cum_race.update_layout(
-                        yaxis=dict(autorange="reversed", showticklabels=False, title="Rank"),
-                        xaxis=dict(title="Cumulative Minutes Listened"),
-                        legend_title_text='Artist',
-                        height=500,
-                        updatemenus=[{
-                            "type": "buttons",
-                            "buttons": [
-                                {
-                                    "label": "Play",
-                                    "method": "animate",
-                                    "args": [None, animation_opts]
-                                },
-                                {
-                                    "label": "Pause",
-                                    "method": "animate",
-                                    "args": [[None], dict(frame=dict(duration=0, redraw=False), mode="immediate")]
-                                }
-                            ]
-                        }]
-                    )
-                    fig_cum_race.update_traces(textposition='outside', textfont_size=14)
-                    fig_cum_race.layout.xaxis.range = [0, cumulative_race_df['minutes'].max() * 1.15]
-                    st.plotly_chart(fig_cum_race, use_container_width=True)
-                else:
-                    st.warning("Not enough data for the cumulative monthly race.")
-
-            st.markdown("---")
+                st.markdown("---")
+
+                # --- SECCIÓN 3: THE MONTHLY RACE (REINCORPORADO Y MEJORADO) ---
+                st.header("The Monthly Race to the Top")
+                st.markdown("Who dominated your listening each month? This dynamic chart shows the evolution of your Top 5 artists throughout the year. Click on a month to see the ranking! The left chart shows monthly totals, the right chart shows cumulative totals.")
+
+                @profiler.cache_data()
+                def calculate_monthly_race(_df_year, wrapped_key):
+                    return warmer.take(('monthly_race', wrapped_key), lambda: wrapped.monthly_race(_df_year))
+
+                @profiler.cache_data()
+                def calculate_cumulative_monthly_race(_df_year, wrapped_key):
+                    return warmer.take(('cumulative_monthly_race', wrapped_key), lambda: wrapped.cumulative_monthly_race(_df_year))
+
+                wrapped_key = (dataset_key, start_date, end_date, selected_year)
+                race_df = calculate_monthly_race(wrapped_df.copy(), wrapped_key)
+                cumulative_race_df = calculate_cumulative_monthly_race(wrapped_df.copy(), wrapped_key)
+                warmer.release(('monthly_race', wrapped_key))
+                warmer.release(('cumulative_monthly_race', wrapped_key))
+
+                month_order = wrapped.MONTH_ORDER
+                race_df['month_name'] = pd.Categorical(race_df['month_name'], categories=month_order, ordered=True)
+                race_df.sort_values('month_name', inplace=True)
+                cumulative_race_df['month_name'] = pd.Categorical(cumulative_race_df['month_name'], categories=month_order, ordered=True)
+                cumulative_race_df.sort_values('month_name', inplace=True)
+
+                # Slower animation speed: set frame duration
+                animation_opts = dict(frame=dict(duration=1200, redraw=True), transition=dict(duration=500, easing='linear'))
+
+                col1, col2 = st.columns(2)
+                with col1, profiler.section("Wrapped · monthly race"):
+                    st.markdown("#### Monthly Top 5 Artists")
+                    if not race_df.empty:
+                        fig_race = px.bar(
+                            race_df,
+                            x="minutes",
+                            y="rank",
+                            orientation='h',
+                            color="master_metadata_album_artist_name",
+                            animation_frame="month_name",
+                            animation_group="master_metadata_album_artist_name",
+                            text="master_metadata_album_artist_name",
+                            title="Monthly Top 5 Artists"
+                        )
+                        fig_race.update_layout(
+                            yaxis=dict(autorange="reversed", showticklabels=False, title="Rank"),
+                            xaxis=dict(title="Minutes Listened"),
+                            legend_title_text='Artist',
+                            height=500,
+                            updatemenus=[{
+                                "type": "buttons",
+                                "buttons": [
+                                    {
+                                        "label": "Play",
+                                        "method": "animate",
+                                        "args": [None, animation_opts]
+                                    },
+                                    {
+                                        "label": "Pause",
+                                        "method": "animate",
+                                        "args": [[None], dict(frame=dict(duration=0, redraw=False), mode="immediate")]
+                                    }
+                                ]
+                            }]
+                        )
+                        fig_race.update_traces(textposition='outside', textfont_size=14)
+                        fig_race.layout.xaxis.range = [0, race_df['minutes'].max() * 1.15]
+                        st.plotly_chart(fig_race, use_container_width=True)
+                    else:
+                        st.warning("Not enough data for the monthly race.")
+
+                with col2, profiler.section("Wrapped · cumulative race"):
+                    st.markdown("#### Cumulative Top 5 Artists")
+                    if not cumulative_race_df.empty:
+                        fig_cum_race = px.bar(
+                            cumulative_race_df,
+                            x="minutes",
+                            y="rank",
+                            orientation='h',
+                            color="master_metadata_album_artist_name",
+                            animation_frame="month_name",
+                            animation_group="master_metadata_album_artist_name",
+                            text="master_metadata_album_artist_name",
+                            title="Cumulative Top 5 Artists"
+                        )
+                        fig_cum_race.update_layout(
+                            yaxis=dict(autorange="reversed", showticklabels=False, title="Rank"),
+                            xaxis=dict(title="Cumulative Minutes Listened"),
+                            legend_title_text='Artist',
+                            height=500,
+                            updatemenus=[{
+                                "type": "buttons",
+                                "buttons": [
+                                    {
+                                        "label": "Play",
+                                        "method": "animate",
+                                        "args": [None, animation_opts]
+                                    },
+                                    {
+                                        "label": "Pause",
+                                        "method": "animate",
+                                        "args": [[None], dict(frame=dict(duration=0, redraw=False), mode="immediate")]
+                                    }
+                                ]
+                            }]
+                        )
+                        fig_cum_race.update_traces(textposition='outside', textfont_size=14)
+                        fig_cum_race.layout.xaxis.range = [0, cumulative_race_df['minutes'].max() * 1.15]
+                        st.plotly_chart(fig_cum_race, use_container_width=True)
+                    else:
+                        st.warning("Not enough data for the cumulative monthly race.")
+
+                st.markdown("---")
             
-            # --- SECCIÓN 4: DEEP DIVE (ARREGLADO) ---
-            st.header("🔎 Deep Dive into Your Tops")
-            st.markdown("Select one of your top items to see its evolution throughout the year.")
+                # --- SECCIÓN 4: DEEP DIVE (ARREGLADO) ---
+                st.header("🔎 Deep Dive into Your Tops")
+                st.markdown("Select one of your top items to see its evolution throughout the year.")
 
-            drill_tabs = st.tabs(["🎤 Artists", "🎶 Tracks", "📀 Albums"])
+                drill_tabs = st.tabs(["🎤 Artists", "🎶 Tracks", "📀 Albums"])
 
-            def create_drill_down_charts(df_year, item_name, item_value):
-                item_df = df_year[df_year[item_name] == item_value]
-                
-                # Agrupar por mes
-                monthly_data = item_df.set_index('ts').resample('ME').agg(minutes=('minutes', 'sum')).reset_index()
-                st.dataframe(monthly_data, use_container_width=True)
+                def create_drill_down_charts(item_name, item_value):
+                    # Meses del año completo, leídos de la matriz entidad × mes
+                    all_months = pd.date_range(start=f'{selected_year}-01-01', end=f'{selected_year}-12-01', freq='MS')
+                    monthly = timegrid.entity_series(time_grid(df, (dataset_key, start_date, end_date), item_name), item_value)
+                    monthly_data = monthly.reindex(all_months, fill_value=0).rename('minutes').rename_axis('ts').reset_index()
                 
-                # Rellenar meses faltantes para un año completo
-                all_months = pd.date_range(start=f'{selected_year}-01-01', end=f'{selected_year}-12-31', freq='ME')
-                monthly_data = monthly_data.set_index('ts').reindex(all_months, fill_value=0).reset_index()
-                monthly_data.rename(columns={'index': 'ts'}, inplace=True)
-                st.dataframe(monthly_data, use_container_width=True)
+                    monthly_data['month_name'] = monthly_data['ts'].dt.strftime('%b')
+                    monthly_data['cumulative_minutes'] = monthly_data['minutes'].cumsum()
                 
-                monthly_data['month_name'] = monthly_data['ts'].dt.strftime('%b')
-                monthly_data['cumulative_minutes'] = monthly_data['minutes'].cumsum()
-                st.dataframe(monthly_data, use_container_width=True)
-                
-                fig_bar = px.bar(monthly_data, x='month_name', y='minutes', title=f"Monthly Listening for: {item_value}", labels={'month_name': 'Month', 'minutes': 'Minutes Listened'})
-                st.plotly_chart(fig_bar, use_container_width=True)
-
-                fig_line = px.area(monthly_data, x='month_name', y='cumulative_minutes', title=f"Cumulative Listening Growth for: {item_value}", labels={'month_name': 'Month', 'cumulative_minutes': 'Total Minutes Accumulated'}, markers=True)
-                st.plotly_chart(fig_line, use_container_width=True)
-
-            with drill_tabs[0]:
-                top_items_list = wrapped_df.groupby('master_metadata_album_artist_name')['minutes'].sum().nlargest(10).index.tolist()
-                selected_item = st.selectbox("Select an artist:", ["Select..."] + top_items_list, key="artist_drill")
-                if selected_item != "Select...":
-                    create_drill_down_charts(wrapped_df, 'master_metadata_album_artist_name', selected_item)
+                    fig_bar = px.bar(monthly_data, x='month_name', y='minutes', title=f"Monthly Listening for: {item_value}", labels={'month_name': 'Month', 'minutes': 'Minutes Listened'})
+                    st.plotly_chart(fig_bar, use_container_width=True)
+
+                    fig_line = px.area(monthly_data, x='month_name', y='cumulative_minutes', title=f"Cumulative Listening Growth for: {item_value}", labels={'month_name': 'Month', 'cumulative_minutes': 'Total Minutes Accumulated'}, markers=True)
+                    st.plotly_chart(fig_line, use_container_width=True)
+
+                with drill_tabs[0]:
+                    top_items_list = wrapped_df.groupby('master_metadata_album_artist_name')['minutes'].sum().nlargest(10).index.tolist()
+                    selected_item = st.selectbox("Select an artist:", ["Select..."] + top_items_list, key="artist_drill")
+                    if selected_item != "Select...":
+                        create_drill_down_charts('master_metadata_album_artist_name', selected_item)
+                        show_colistened(colisten_index(wrapped_df, (dataset_key, selected_year, start_date, end_date), 'master_metadata_album_artist_name'), selected_item, "Artist")
             
-            with drill_tabs[1]:
-                top_items_list = wrapped_df.groupby('master_metadata_track_name')['minutes'].sum().nlargest(10).index.tolist()
-                selected_item = st.selectbox("Select a track:", ["Select..."] + top_items_list, key="track_drill")
-                if selected_item != "Select...":
-                    create_drill_down_charts(wrapped_df, 'master_metadata_track_name', selected_item)
-
-            with drill_tabs[2]:
-                top_items_list = wrapped_df.groupby('master_metadata_album_album_name')['minutes'].sum().nlargest(10).index.tolist()
-                selected_item = st.selectbox("Select an album:", ["Select..."] + top_items_list, key="album_drill")
-                if selected_item != "Select...":
-                    create_drill_down_charts(wrapped_df, 'master_metadata_album_album_name', selected_item)
+                with drill_tabs[1]:
+                    top_items_list = wrapped_df.groupby('master_metadata_track_name')['minutes'].sum().nlargest(10).index.tolist()
+                    selected_item = st.selectbox("Select a track:", ["Select..."] + top_items_list, key="track_drill")
+                    if selected_item != "Select...":
+                        create_drill_down_charts('master_metadata_track_name', selected_item)
+                        show_colistened(colisten_index(wrapped_df, (dataset_key, selected_year, start_date, end_date), 'master_metadata_track_name'), selected_item, "Track")
+
+                with drill_tabs[2]:
+                    top_items_list = wrapped_df.groupby('master_metadata_album_album_name')['minutes'].sum().nlargest(10).index.tolist()
+                    selected_item = st.selectbox("Select an album:", ["Select..."] + top_items_list, key="album_drill")
+                    if selected_item != "Select...":
+                        create_drill_down_charts('master_metadata_album_album_name', selected_item)
             
-            st.markdown("---")
+                st.markdown("---")
 
-            # --- SECCIÓN 5: TU PERFIL DE ESCUCHA (NUEVO "TIME TRAVELER") ---
-            st.header("Your Listening Profile")
-            profile_cols = st.columns(3)
-
-            # --- DEFINICIÓN DE LA FUNCIÓN MOVIda AQUÍ ---
-            @st.cache_data
-            def analyze_listener_dna(full_df, year_df, current_year):
-                first_listen_df = full_df.loc[full_df.groupby('master_metadata_track_name')['ts'].idxmin()]
-                new_discoveries_this_year = first_listen_df[first_listen_df['year'] == current_year]['master_metadata_track_name'].unique()
-                plays_in_year = year_df['master_metadata_track_name'].value_counts()
-                explorer_tracks = plays_in_year[plays_in_year.isin([1, 2]) & plays_in_year.index.isin(new_discoveries_this_year)].index
-                minutes_explorer = year_df[year_df['master_metadata_track_name'].isin(explorer_tracks)]['minutes'].sum()
-                loyalist_tracks = plays_in_year[plays_in_year >= 5].index
-                minutes_loyalist = year_df[year_df['master_metadata_track_name'].isin(loyalist_tracks)]['minutes'].sum()
-                old_discoveries = first_listen_df[first_listen_df['year'] < current_year]['master_metadata_track_name'].unique()
-                deep_cut_tracks = plays_in_year[(plays_in_year < 5) & (plays_in_year.index.isin(old_discoveries))].index
-                minutes_deep_cuts = year_df[year_df['master_metadata_track_name'].isin(deep_cut_tracks)]['minutes'].sum()
-                minutes_total = year_df['minutes'].sum()
-                minutes_casual = minutes_total - minutes_explorer - minutes_loyalist - minutes_deep_cuts
-                dna_df = pd.DataFrame([{'Category': 'Explorer (New songs)', 'Minutes': minutes_explorer}, {'Category': 'Loyalist (Heavy rotation)', 'Minutes': minutes_loyalist}, {'Category': 'Deep Cuts (Old favorites)', 'Minutes': minutes_deep_cuts}, {'Category': 'Casual (The rest)', 'Minutes': minutes_casual}])
-                return dna_df
-            
-            with profile_cols[0]:
-                st.subheader("🕰️ The Time of Day")
-                wrapped_df['hour'] = wrapped_df['ts'].dt.hour
-                bins = [-1, 4, 11, 17, 21, 23]; labels = ['Late Night', 'Morning', 'Afternoon', 'Evening', 'Late Night']
-                wrapped_df['time_of_day'] = pd.cut(wrapped_df['hour'], bins=bins, labels=labels, ordered=False)
-                time_of_day_dist = wrapped_df.groupby('time_of_day')['minutes'].sum().reset_index()
-                fig_tod = px.pie(time_of_day_dist, names='time_of_day', values='minutes', hole=0.4, title="Listening by Time of Day", color_discrete_sequence=px.colors.sequential.Plasma_r)
-                fig_tod.update_layout(legend_title_text=None, legend=dict(orientation="h", yanchor="bottom", y=-0.4))
-                st.plotly_chart(fig_tod, use_container_width=True)
-            with profile_cols[1]:
-                st.subheader("🧭 Listener DNA")
-                dna_df = analyze_listener_dna(df, wrapped_df, selected_year)
-                fig_dna = px.pie(dna_df, names='Category', values='Minutes', hole=0.4, title="Breakdown of Your Listening", color_discrete_sequence=px.colors.sequential.Viridis, hover_data={'Minutes':':.0f'})
-                fig_dna.update_layout(legend_title_text=None, legend=dict(orientation="h", yanchor="bottom", y=-0.4))
-                st.plotly_chart(fig_dna, use_container_width=True)
-            with profile_cols[2]:
-                st.subheader("⏳ Audio Nostalgia")
-                st.markdown("How did your listening change over the year? Here's a heatmap of your listening activity by day and month.")
-
-                # Create a pivot table for heatmap: month vs day, sum of minutes
-                wrapped_df['day_of_month'] = wrapped_df['ts'].dt.day
-                calendar_pivot = wrapped_df.pivot_table(
-                    index='month',
-                    columns='day_of_month',
-                    values='minutes',
-                    aggfunc='sum',
-                    fill_value=0
-                )
-                fig = plt.figure(figsize=(10, 4))
-                sns.heatmap(calendar_pivot, cmap="mako", linewidths=.5)
-                plt.title(f"Listening Activity Heatmap ({selected_year})")
-                st.pyplot(fig)
+                # --- SECCIÓN 5: TU PERFIL DE ESCUCHA (NUEVO "TIME TRAVELER") ---
+                st.header("Your Listening Profile")
+                profile_cols = st.columns(3)
 
-            # --- SECCIÓN 6: TARJETA "MASTERPIECE" (MEJORADA Y AMPLIADA) ---
-            st.markdown("---")
-            st.header(f"Your {selected_year} Masterpiece")
-            st.markdown("This is your year, summarized. The ultimate shareable card.")
-
-            with st.container():
-                # Main stats
-                total_tracks_unique = wrapped_df['master_metadata_track_name'].nunique()
-                total_albums_unique = wrapped_df['master_metadata_album_album_name'].nunique()
-                total_artists_unique = wrapped_df['master_metadata_album_artist_name'].nunique()
-                total_hours = round(total_minutes / 60, 1)
-                total_days = wrapped_df['date'].nunique()
-                top_dna = dna_df.loc[dna_df['Minutes'].idxmax()]['Category'] if not dna_df.empty else "Unique"
-
-                # % of new songs/albums/artists (not listened in previous years)
-                first_listen_df = df.loc[df.groupby('master_metadata_track_name')['ts'].idxmin()]
-                new_songs_this_year = first_listen_df[first_listen_df['year'] == selected_year]['master_metadata_track_name'].unique()
-                percent_new_songs = 100 * len(new_songs_this_year) / total_tracks_unique if total_tracks_unique else 0
-
-                first_album_df = df.loc[df.groupby('master_metadata_album_album_name')['ts'].idxmin()]
-                new_albums_this_year = first_album_df[first_album_df['year'] == selected_year]['master_metadata_album_album_name'].unique()
-                percent_new_albums = 100 * len(new_albums_this_year) / total_albums_unique if total_albums_unique else 0
-
-                first_artist_df = df.loc[df.groupby('master_metadata_album_artist_name')['ts'].idxmin()]
-                new_artists_this_year = first_artist_df[first_artist_df['year'] == selected_year]['master_metadata_album_artist_name'].unique()
-                percent_new_artists = 100 * len(new_artists_this_year) / total_artists_unique if total_artists_unique else 0
-
-                # Top 5 songs
-                top_tracks_df = wrapped_df.groupby(['master_metadata_track_name', 'master_metadata_album_artist_name'])['minutes'].sum().nlargest(5).reset_index()
-                top_tracks_html = ""
-                for i, row in top_tracks_df.iterrows():
-                    top_tracks_html += f"<li><b>{row['master_metadata_track_name']}</b> <span style='color:#B3B3B3;'>by {row['master_metadata_album_artist_name']}</span> <span style='color:#1DB954;'>({int(row['minutes'])} min)</span></li>"
-
-                # Calculate % of skips (songs played less than 10 seconds)
-                skips_count = wrapped_df[wrapped_df['ms_played'] < 10000]['master_metadata_track_name'].count()
-                percent_skips = 100 * skips_count / len(wrapped_df) if len(wrapped_df) else 0
-
-                # Number of devices used (if device info exists)
-                device_col_candidates = [col for col in wrapped_df.columns if 'device' in col.lower()]
-                if device_col_candidates:
-                    device_col = device_col_candidates[0]
-                    num_devices = wrapped_df[device_col].nunique()
-                else:
-                    num_devices = "N/A"
-
-                # Temporal stats row
-                temporal_stats_html = f"""
-                <div style="display: flex; flex-wrap: wrap; justify-content: space-around; text-align: center; margin-bottom: 10px;">
-                    <div style="margin:10px;">
-                        <p style="font-size: 14px; color: #B3B3B3; margin:0;">TOTAL MINUTES</p>
-                        <p style="font-size: 24px; font-weight: bold;">{int(total_minutes):,}</p>
-                    </div>
-                    <div style="margin:10px;">
-                        <p style="font-size: 14px; color: #B3B3B3; margin:0;">TOTAL HOURS</p>
-                        <p style="font-size: 24px; font-weight: bold;">{total_hours:,}</p>
-                    </div>
-                    <div style="margin:10px;">
-                        <p style="font-size: 14px; color: #B3B3B3; margin:0;">TOTAL DAYS</p>
-                        <p style="font-size: 24px; font-weight: bold;">{total_days:,}</p>
-                    </div>
-                </div>
-                """
-
-                # Unique stats row
-                unique_stats_html = f"""
-                <div style="display: flex; flex-wrap: wrap; justify-content: space-around; text-align: center; margin-bottom: 10px;">
-                    <div style="margin:10px;">
-                        <p style="font-size: 14px; color: #B3B3B3; margin:0;">UNIQUE SONGS</p>
-                        <p style="font-size: 24px; font-weight: bold;">{total_tracks_unique:,}</p>
-                        <p style="font-size: 12px; color: #1DB954; margin:0;">{percent_new_songs:.1f}% new</p>
-                    </div>
-                    <div style="margin:10px;">
-                        <p style="font-size: 14px; color: #B3B3B3; margin:0;">UNIQUE ALBUMS</p>
-                        <p style="font-size: 24px; font-weight: bold;">{total_albums_unique:,}</p>
-                        <p style="font-size: 12px; color: #1DB954; margin:0;">{percent_new_albums:.1f}% new</p>
+                # --- DEFINICIÓN DE LA FUNCIÓN MOVIda AQUÍ ---
+                @profiler.cache_data()
+                def analyze_listener_dna(_first_track_years, _year_df, current_year, wrapped_key):
+                    return warmer.take(('listener_dna', wrapped_key), lambda: wrapped.listener_dna(_first_track_years, _year_df, current_year))
+            
+                with profile_cols[0], profiler.section("Wrapped · time of day"):
+                    st.subheader("🕰️ The Time of Day")
+                    time_of_day_dist = year_blocks['time_of_day']
+                    fig_tod = px.pie(time_of_day_dist, names='time_of_day', values='minutes', hole=0.4, title="Listening by Time of Day", color_discrete_sequence=px.colors.sequential.Plasma_r)
+                    fig_tod.update_layout(legend_title_text=None, legend=dict(orientation="h", yanchor="bottom", y=-0.4))
+                    st.plotly_chart(fig_tod, use_container_width=True)
+                with profile_cols[1], profiler.section("Wrapped · listener DNA"):
+                    st.subheader("🧭 Listener DNA")
+                    dna_df = analyze_listener_dna(first_track_years, wrapped_df, selected_year, wrapped_key)
+                    warmer.release(('listener_dna', wrapped_key))
+                    fig_dna = px.pie(dna_df, names='Category', values='Minutes', hole=0.4, title="Breakdown of Your Listening", color_discrete_sequence=px.colors.sequential.Viridis, hover_data={'Minutes':':.0f'})
+                    fig_dna.update_layout(legend_title_text=None, legend=dict(orientation="h", yanchor="bottom", y=-0.4))
+                    st.plotly_chart(fig_dna, use_container_width=True)
+                with profile_cols[2], profiler.section("Wrapped · calendar heatmap"):
+                    st.subheader("⏳ Audio Nostalgia")
+                    st.markdown("How did your listening change over the year? Here's a heatmap of your listening activity by day and month.")
+
+                    calendar_pivot = year_blocks['calendar']
+                    fig = plt.figure(figsize=(10, 4))
+                    sns.heatmap(calendar_pivot, cmap="mako", linewidths=.5)
+                    plt.title(f"Listening Activity Heatmap ({selected_year})")
+                    st.pyplot(fig)
+
+                # --- SECCIÓN 6: TARJETA "MASTERPIECE" (MEJORADA Y AMPLIADA) ---
+                st.markdown("---")
+                st.header(f"Your {selected_year} Masterpiece")
+                st.markdown("This is your year, summarized. The ultimate shareable card.")
+
+                with st.container():
+                    # Main stats (new songs/albums/artists come from the first-listen index)
+                    card_stats = year_blocks['masterpiece']
+                    total_tracks_unique = card_stats['unique']['track']
+                    total_albums_unique = card_stats['unique']['album']
+                    total_artists_unique = card_stats['unique']['artist']
+                    percent_new_songs = card_stats['percent_new']['track']
+                    percent_new_albums = card_stats['percent_new']['album']
+                    percent_new_artists = card_stats['percent_new']['artist']
+                    total_hours = round(total_minutes / 60, 1)
+                    total_days = card_stats['total_days']
+                    top_dna = dna_df.loc[dna_df['Minutes'].idxmax()]['Category'] if not dna_df.empty else "Unique"
+
+                    # Top 5 songs
+                    top_tracks_html = ""
+                    for i, row in card_stats['top_tracks'].iterrows():
+                        top_tracks_html += f"<li><b>{row['master_metadata_track_name']}</b> <span style='color:#B3B3B3;'>by {row['master_metadata_album_artist_name']}</span> <span style='color:#1DB954;'>({int(row['minutes'])} min)</span></li>"
+
+                    percent_skips = card_stats['percent_skips']
+                    num_devices = card_stats['num_devices']
+
+                    # Temporal stats row
+                    temporal_stats_html = f"""
+                    <div style="display: flex; flex-wrap: wrap; justify-content: space-around; text-align: center; margin-bottom: 10px;">
+                        <div style="margin:10px;">
+                            <p style="font-size: 14px; color: #B3B3B3; margin:0;">TOTAL MINUTES</p>
+                            <p style="font-size: 24px; font-weight: bold;">{int(total_minutes):,}</p>
+                        </div>
+                        <div style="margin:10px;">
+                            <p style="font-size: 14px; color: #B3B3B3; margin:0;">TOTAL HOURS</p>
+                            <p style="font-size: 24px; font-weight: bold;">{total_hours:,}</p>
+                        </div>
+                        <div style="margin:10px;">
+                            <p style="font-size: 14px; color: #B3B3B3; margin:0;">TOTAL DAYS</p>
+                            <p style="font-size: 24px; font-weight: bold;">{total_days:,}</p>
+                        </div>
                     </div>
-                    <div style="margin:10px;">
-                        <p style="font-size: 14px; color: #B3B3B3; margin:0;">UNIQUE ARTISTS</p>
-                        <p style="font-size: 24px; font-weight: bold;">{total_artists_unique:,}</p>
-                        <p style="font-size: 12px; color: #1DB954; margin:0;">{percent_new_artists:.1f}% new</p>
+                    """
+
+                    # Unique stats row
+                    unique_stats_html = f"""
+                    <div style="display: flex; flex-wrap: wrap; justify-content: space-around; text-align: center; margin-bottom: 10px;">
+                        <div style="margin:10px;">
+                            <p style="font-size: 14px; color: #B3B3B3; margin:0;">UNIQUE SONGS</p>
+                            <p style="font-size: 24px; font-weight: bold;">{total_tracks_unique:,}</p>
+                            <p style="font-size: 12px; color: #1DB954; margin:0;">{percent_new_songs:.1f}% new</p>
+                        </div>
+                        <div style="margin:10px;">
+                            <p style="font-size: 14px; color: #B3B3B3; margin:0;">UNIQUE ALBUMS</p>
+                            <p style="font-size: 24px; font-weight: bold;">{total_albums_unique:,}</p>
+                            <p style="font-size: 12px; color: #1DB954; margin:0;">{percent_new_albums:.1f}% new</p>
+                        </div>
+                        <div style="margin:10px;">
+                            <p style="font-size: 14px; color: #B3B3B3; margin:0;">UNIQUE ARTISTS</p>
+                            <p style="font-size: 24px; font-weight: bold;">{total_artists_unique:,}</p>
+                            <p style="font-size: 12px; color: #1DB954; margin:0;">{percent_new_artists:.1f}% new</p>
+                        </div>
                     </div>
-                </div>
-                """
-
-                card_html = f"""
-                <div style="background: linear-gradient(135deg, #1D2B64, #2c3e50); border-radius: 15px; padding: 25px; color: white; font-family: sans-serif;">
-                    <h2 style="text-align: center; font-weight: bold; margin-bottom: 5px;">My Wrapped {selected_year}</h2>
-                    <p style="text-align: center; font-size: 14px; color: #B3B3B3; margin-top: 0;">A Year in Review</p>
-                    <hr style="border-color: #1DB954; margin: 15px 0;">
-                    {temporal_stats_html}
-                    {unique_stats_html}
-                    <div style="background-color: rgba(0,0,0,0.2); padding: 15px; border-radius: 10px;">
-                        <div style="display: grid; grid-template-columns: auto 1fr; gap: 10px 15px; align-items: center;">
-                            <span style="font-size: 24px;">👑</span>
-                            <div>
-                                <p style="font-size: 12px; color: #B3B3B3; margin:0;">TOP ARTIST</p>
-                                <p style="font-size: 16px; font-weight: bold; margin:0; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;" title="{top_artist_name}">{top_artist_name}</p>
+                    """
+
+                    card_html = f"""
+                    <div style="background: linear-gradient(135deg, #1D2B64, #2c3e50); border-radius: 15px; padding: 25px; color: white; font-family: sans-serif;">
+                        <h2 style="text-align: center; font-weight: bold; margin-bottom: 5px;">My Wrapped {selected_year}</h2>
+                        <p style="text-align: center; font-size: 14px; color: #B3B3B3; margin-top: 0;">A Year in Review</p>
+                        <hr style="border-color: #1DB954; margin: 15px 0;">
+                        {temporal_stats_html}
+                        {unique_stats_html}
+                        <div style="background-color: rgba(0,0,0,0.2); padding: 15px; border-radius: 10px;">
+                            <div style="display: grid; grid-template-columns: auto 1fr; gap: 10px 15px; align-items: center;">
+                                <span style="font-size: 24px;">👑</span>
+                                <div>
+                                    <p style="font-size: 12px; color: #B3B3B3; margin:0;">TOP ARTIST</p>
+                                    <p style="font-size: 16px; font-weight: bold; margin:0; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;" title="{top_artist_name}">{top_artist_name}</p>
+                                </div>
                             </div>
-                        </div>
-                        <div style="display: grid; grid-template-columns: auto 1fr; gap: 10px 15px; align-items: center; margin-top: 10px;">
-                            <span style="font-size: 24px;">🎶</span>
-                            <div>
-                                <p style="font-size: 12px; color: #B3B3B3; margin:0;">TOP 5 TRACKS</p>
-                                <ul style="font-size: 13px; margin:0 0 0 10px; padding:0; list-style-type: disc; color:#fff;">
-                                    {top_tracks_html}
-                                </ul>
+                            <div style="display: grid; grid-template-columns: auto 1fr; gap: 10px 15px; align-items: center; margin-top: 10px;">
+                                <span style="font-size: 24px;">🎶</span>
+                                <div>
+                                    <p style="font-size: 12px; color: #B3B3B3; margin:0;">TOP 5 TRACKS</p>
+                                    <ul style="font-size: 13px; margin:0 0 0 10px; padding:0; list-style-type: disc; color:#fff;">
+                                        {top_tracks_html}
+                                    </ul>
+                                </div>
                             </div>
                         </div>
+                        <div style="display: flex; flex-wrap: wrap; justify-content: space-around; text-align: center; margin-top: 25px;">
+                             <div style="margin:10px;">
+                                 <p style="font-size: 14px; color: #B3B3B3; margin:0;">LISTENER DNA</p>
+                                 <p style="font-size: 18px; font-weight: bold;">{top_dna}</p>
+                             </div>
+                             <div style="margin:10px;">
+                                 <p style="font-size: 14px; color: #B3B3B3; margin:0;">SKIP RATE</p>
+                                 <p style="font-size: 18px; font-weight: bold;">{percent_skips:.1f}%</p>
+                             </div>
+                             <div style="margin:10px;">
+                                 <p style="font-size: 14px; color: #B3B3B3; margin:0;">DEVICES USED</p>
+                                 <p style="font-size: 18px; font-weight: bold;">{num_devices}</p>
+                             </div>
+                        </div>
+                        <p style="font-size: 10px; color: #B3B3B3; text-align: center; margin-top: 20px;">Generated with Spotify Extended Dashboard</p>
                     </div>
-                    <div style="display: flex; flex-wrap: wrap; justify-content: space-around; text-align: center; margin-top: 25px;">
-                         <div style="margin:10px;">
-                             <p style="font-size: 14px; color: #B3B3B3; margin:0;">LISTENER DNA</p>
-                             <p style="font-size: 18px; font-weight: bold;">{top_dna}</p>
-                         </div>
-                         <div style="margin:10px;">
-                             <p style="font-size: 14px; color: #B3B3B3; margin:0;">SKIP RATE</p>
-                             <p style="font-size: 18px; font-weight: bold;">{percent_skips:.1f}%</p>
-                         </div>
-                         <div style="margin:10px;">
-                             <p style="font-size: 14px; color: #B3B3B3; margin:0;">DEVICES USED</p>
-                             <p style="font-size: 18px; font-weight: bold;">{num_devices}</p>
-                         </div>
-                    </div>
-                    <p style="font-size: 10px; color: #B3B3B3; text-align: center; margin-top: 20px;">Generated with Spotify Extended Dashboard</p>
-                </div>
-                """
-                st.html(card_html)
-
-
-
-    with tabs[10]:
-        # --- INYECCIÓN DE CSS PARA BOTONES ESTILO SPOTIFY ---
-        st.markdown("""
-        <style>
-        .updatemenu-button {
-            background-color: #1DB954; /* Verde Spotify */
-            color: #FFFFFF; /* Texto blanco */
-            border: none;
-            border-radius: 50px; /* Botones redondeados */
-            padding: 8px 16px !important;
-            font-weight: bold;
-            transition: background-color 0.3s ease, transform 0.2s ease;
-        }
-        .updatemenu-button:hover {
-            background-color: #1ED760; /* Verde más brillante al pasar el ratón */
-            transform: scale(1.05);
-        }
-        </style>
-        """, unsafe_allow_html=True)
-
-        st.header("🏁 The Ultimate Ranking Race")
-        st.markdown("""
-        Visualiza la batalla por el top de tus listas de reproducción. Esta herramienta crea una carrera de rankings animada,
-        con un eje dinámico que se ajusta en cada paso para un máximo impacto visual.
-        """)
-
-        # --- CONTROLES DE PERSONALIZACIÓN ---
-        st.markdown("#### ⚙️ Controles de la Carrera")
-        controls_cols = st.columns([1, 1, 1, 2])
-        with controls_cols[0]:
-            item_type = st.selectbox("Analizar por:", ["Artists", "Tracks", "Albums"], key="race_item_type_v2")
-        with controls_cols[1]:
-            time_period = st.selectbox("Agrupar por:", ["Weekly", "Monthly", "Yearly"], key="race_time_period_v2")
-        with controls_cols[2]:
-            metric_type = st.radio("Medir por:", ["Minutes", "Plays"], horizontal=True, key="race_metric_v2")
-        with controls_cols[3]:
-            top_n = st.slider("Mostrar Top N:", 3, 25, 10, 1, key="race_top_n_v2")
-
-        # --- LÓGICA DE PROCESAMIENTO DE DATOS MEJORADA ---
-        @st.cache_data(show_spinner="Calculando la carrera de rankings...")
-        def calculate_race_data_v2(_df, item_col, time_period, metric_type, top_n):
-            df_copy = _df.copy()
-
-            # Definir período
-            if time_period == 'Weekly':
-                df_copy['period_id'] = df_copy['ts'].dt.to_period('W').astype(str)
-            elif time_period == 'Monthly':
-                df_copy['period_id'] = df_copy['ts'].dt.to_period('M').astype(str)
+                    """
+                    st.html(card_html)
+
+
+
+    with tabs[10], profiler.section("Ranking Race"):
+        if tabs[10].open:
+            px = plotting.plotly_express()
+            # --- INYECCIÓN DE CSS PARA BOTONES ESTILO SPOTIFY ---
+            st.markdown("""
+            <style>
+            .updatemenu-button {
+                background-color: #1DB954; /* Verde Spotify */
+                color: #FFFFFF; /* Texto blanco */
+                border: none;
+                border-radius: 50px; /* Botones redondeados */
+                padding: 8px 16px !important;
+                font-weight: bold;
+                transition: background-color 0.3s ease, transform 0.2s ease;
+            }
+            .updatemenu-button:hover {
+                background-color: #1ED760; /* Verde más brillante al pasar el ratón */
+                transform: scale(1.05);
+            }
+            </style>
+            """, unsafe_allow_html=True)
+
+            st.header("🏁 The Ultimate Ranking Race")
+            st.markdown("""
+            Visualiza la batalla por el top de tus listas de reproducción. Esta herramienta crea una carrera de rankings animada,
+            con un eje dinámico que se ajusta en cada paso para un máximo impacto visual.
+            """)
+
+            # --- CONTROLES DE PERSONALIZACIÓN ---
+            st.markdown("#### ⚙️ Controles de la Carrera")
+            controls_cols = st.columns([1, 1, 1, 2])
+            with controls_cols[0]:
+                item_type = st.selectbox("Analizar por:", ["Artists", "Tracks", "Albums"], key="race_item_type_v2")
+            with controls_cols[1]:
+                time_period = st.selectbox("Agrupar por:", ["Weekly", "Monthly", "Yearly"], key="race_time_period_v2")
+            with controls_cols[2]:
+                metric_type = st.radio("Medir por:", ["Minutes", "Plays"], horizontal=True, key="race_metric_v2")
+            with controls_cols[3]:
+                top_n = st.slider("Mostrar Top N:", 3, 25, 10, 1, key="race_top_n_v2")
+
+            # --- LÓGICA DE PROCESAMIENTO DE DATOS MEJORADA ---
+            @profiler.cache_data(show_spinner="Calculando la carrera de rankings...")
+            def calculate_race_data_v2(_df, filter_key, backend_name, item_col, time_period, metric_type, top_n):
+                return warmer.take(('race', filter_key, backend_name, item_col, time_period, metric_type, top_n),
+                                   lambda: race_results(_df, item_col, time_period, metric_type, top_n))
+
+            # Mapeo de opciones y ejecución del cálculo
+            selected_item_col = RACE_ITEM_COLUMNS[item_type]
+
+            # --- CLASIFICACIÓN EN CUALQUIER FECHA ---
+            # A fragment: moving the slider only reruns this block, not the animated races below
+            @st.fragment
+            def render_standings_on_date():
+                st.markdown("#### 📅 Standings on Any Date")
+                index = asof_index(filtered_df, filter_key, selected_item_col)
+                if not len(index['days']):
+                    return
+                first_day, last_day = (pd.Timestamp(index['days'][i], unit='D').date() for i in (0, -1))
+                if first_day == last_day:
+                    range_start, range_end = first_day, last_day
+                else:
+                    range_start, range_end = st.slider("Entre fechas (mueve el inicio para ver solo un periodo):", min_value=first_day, max_value=last_day, value=(first_day, last_day), format="YYYY-MM-DD")
+                table = asof.standings(index, range_end, range_start, metric_type.lower(), top_n)
+                total_minutes, total_plays = asof.listening_total(index, range_end, range_start)
+                st.caption(f"{total_minutes:,.0f} minutes over {total_plays:,} plays between {range_start} and {range_end}.")
+                table = table.rename(columns={selected_item_col: item_type[:-1], 'minutes': 'Minutes', 'plays': 'Plays'}).round({'Minutes': 0})
+                table.index = range(1, len(table) + 1)
+                st.dataframe(table, use_container_width=True)
+
+            render_standings_on_date()
+
+            race_data_periodic, race_data_cumulative = calculate_race_data_v2(filtered_df, filter_key, backend.name, selected_item_col, time_period, metric_type, top_n)
+            warmer.release(('race', filter_key, backend.name, selected_item_col, time_period, metric_type, top_n))
+
+            # --- LÓGICA DE VISUALIZACIÓN MEJORADA ---
+            if race_data_periodic.empty or race_data_cumulative.empty:
+                st.warning("No hay suficientes datos para generar la carrera con los filtros seleccionados.")
             else:
-                df_copy['period_id'] = df_copy['ts'].dt.to_period('Y').astype(str)
-
-            metric_col = 'minutes' if metric_type == 'Minutes' else 'ts'
-            agg_func = 'sum' if metric_type == 'Minutes' else 'count'
-
-            # Calcular ranking periódico (sin cambios)
-            periodic_data = df_copy.groupby(['period_id', item_col])[metric_col].agg(agg_func).reset_index(name='value')
-            periodic_data['rank'] = periodic_data.groupby('period_id')['value'].rank(method='first', ascending=False)
-            periodic_data = periodic_data[periodic_data['rank'] <= top_n].sort_values(['period_id', 'rank'])
-
-            # *** CORRECCIÓN CRÍTICA: Lógica acumulativa rehecha ***
-            # Ahora calcula el top N en CADA paso, no basado en el total general.
-            all_periods = sorted(df_copy['period_id'].unique())
-            cumulative_data_list = []
-            for period in all_periods:
-                current_data = df_copy[df_copy['period_id'] <= period]
-                # Agrupar TODO hasta la fecha actual
-                cum_summary = current_data.groupby(item_col)[metric_col].agg(agg_func).reset_index(name='value')
-                # OBTENER EL TOP N DE *ESTE* MOMENTO
-                cum_summary = cum_summary.nlargest(top_n, 'value')
-                cum_summary['period_id'] = period
-                cum_summary['rank'] = cum_summary['value'].rank(method='first', ascending=False)
-                cumulative_data_list.append(cum_summary)
-
-            cumulative_data = pd.concat(cumulative_data_list, ignore_index=True)
-            return periodic_data, cumulative_data
-
-        # Mapeo de opciones y ejecución del cálculo
-        item_col_map = {"Artists": "master_metadata_album_artist_name", "Tracks": "master_metadata_track_name", "Albums": "master_metadata_album_album_name"}
-        selected_item_col = item_col_map[item_type]
-
-        race_data_periodic, race_data_cumulative = calculate_race_data_v2(filtered_df, selected_item_col, time_period, metric_type, top_n)
-
-        # --- LÓGICA DE VISUALIZACIÓN MEJORADA ---
-        if race_data_periodic.empty or race_data_cumulative.empty:
-            st.warning("No hay suficientes datos para generar la carrera con los filtros seleccionados.")
-        else:
-            # Función para crear el gráfico con eje X dinámico
-            def create_dynamic_race_chart(df, value_col, item_col, title, xaxis_title):
-                fig = px.bar(
-                    df,
-                    x=value_col,
-                    y='rank',
-                    orientation='h',
-                    color=item_col,
-                    text=item_col,
-                    animation_frame='period_id',
-                    animation_group=item_col,
-                    color_discrete_sequence=px.colors.qualitative.Vivid, # Paleta de colores variada
-                    template='plotly_dark'
-                )
+                # Función para crear el gráfico con eje X dinámico
+                def create_dynamic_race_chart(df, value_col, item_col, title, xaxis_title):
+                    fig = px.bar(
+                        df,
+                        x=value_col,
+                        y='rank',
+                        orientation='h',
+                        color=item_col,
+                        text=item_col,
+                        animation_frame='period_id',
+                        animation_group=item_col,
+                        color_discrete_sequence=px.colors.qualitative.Vivid, # Paleta de colores variada
+                        template='plotly_dark'
+                    )
 
-                # *** MEJORA CLAVE: EJE X DINÁMICO POR FOTOGRAMA ***
-                # Iteramos sobre cada frame para ajustar su rango de eje X individualmente.
-                for frame in fig.frames:
-                    max_value_frame = df[df['period_id'] == frame.name]['value'].max()
-                    frame.layout.xaxis.range = [0, max_value_frame * 1.35] # Damos 35% de espacio extra para la etiqueta
-
-                # Ajustar el estado inicial del gráfico (el primer fotograma)
-                initial_period = df['period_id'].min()
-                max_value_initial = df[df['period_id'] == initial_period]['value'].max()
-                fig.update_layout(xaxis_range=[0, max_value_initial * 1.35])
-
-                # Estilizado general del gráfico
-                fig.update_layout(
-                    title=dict(text=title, font=dict(size=20), x=0.5),
-                    yaxis=dict(autorange="reversed", showticklabels=False, title=None),
-                    xaxis=dict(title=xaxis_title, showticklabels=True),
-                    legend_title_text=None,
-                    legend=dict(orientation="h", yanchor="bottom", y=-0.25, traceorder="normal"),
-                    height=500 + top_n * 10,
-                    margin=dict(l=10, r=10, t=60, b=120),
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color="white"),
-                    updatemenus=[{
-                        "type": "buttons",
-                        "direction": "left",
-                        "x": 0.5, "xanchor": "center",
-                        "y": -0.35, "yanchor": "bottom",
-                        "buttons": [
-                            {"label": "▶ Play", "method": "animate", "args": [None, {"frame": {"duration": 800, "redraw": True}, "transition": {"duration": 300, "easing": "linear-out"}}]},
-                            {"label": "❚❚ Pause", "method": "animate", "args": [[None], {"frame": {"duration": 0, "redraw": False}, "mode": "immediate"}]}
-                        ]
-                    }]
+                    # *** MEJORA CLAVE: EJE X DINÁMICO POR FOTOGRAMA ***
+                    # Iteramos sobre cada frame para ajustar su rango de eje X individualmente.
+                    for frame in fig.frames:
+                        max_value_frame = df[df['period_id'] == frame.name]['value'].max()
+                        frame.layout.xaxis.range = [0, max_value_frame * 1.35] # Damos 35% de espacio extra para la etiqueta
+
+                    # Ajustar el estado inicial del gráfico (el primer fotograma)
+                    initial_period = df['period_id'].min()
+                    max_value_initial = df[df['period_id'] == initial_period]['value'].max()
+                    fig.update_layout(xaxis_range=[0, max_value_initial * 1.35])
+
+                    # Estilizado general del gráfico
+                    fig.update_layout(
+                        title=dict(text=title, font=dict(size=20), x=0.5),
+                        yaxis=dict(autorange="reversed", showticklabels=False, title=None),
+                        xaxis=dict(title=xaxis_title, showticklabels=True),
+                        legend_title_text=None,
+                        legend=dict(orientation="h", yanchor="bottom", y=-0.25, traceorder="normal"),
+                        height=500 + top_n * 10,
+                        margin=dict(l=10, r=10, t=60, b=120),
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        font=dict(color="white"),
+                        updatemenus=[{
+                            "type": "buttons",
+                            "direction": "left",
+                            "x": 0.5, "xanchor": "center",
+                            "y": -0.35, "yanchor": "bottom",
+                            "buttons": [
+                                {"label": "▶ Play", "method": "animate", "args": [None, {"frame": {"duration": 800, "redraw": True}, "transition": {"duration": 300, "easing": "linear-out"}}]},
+                                {"label": "❚❚ Pause", "method": "animate", "args": [[None], {"frame": {"duration": 0, "redraw": False}, "mode": "immediate"}]}
+                            ]
+                        }]
+                    )
+                    # Texto negro, fuera de la barra, y con un tamaño legible
+                    fig.update_traces(
+                        textposition='outside',
+                        textfont=dict(size=12, color='black'),
+                        insidetextanchor='end',
+                        texttemplate='%{text}'
+                    )
+                    return fig
+
+                st.markdown("---")
+
+                # GRÁFICO 1: RANKING POR PERÍODO
+                st.subheader(f"🏆 {time_period} Ranking Race")
+                fig_periodic = profiler.call(
+                    "Ranking Race · periodic figure", create_dynamic_race_chart,
+                    df=race_data_periodic, value_col='value', item_col=selected_item_col,
+                    title=f"Top {top_n} {item_type} by {metric_type} ({time_period})",
+                    xaxis_title=f"{metric_type} en el Período"
                 )
-                # Texto negro, fuera de la barra, y con un tamaño legible
-                fig.update_traces(
-                    textposition='outside',
-                    textfont=dict(size=12, color='black'),
-                    insidetextanchor='end',
-                    texttemplate='%{text}'
+                st.plotly_chart(fig_periodic, use_container_width=True)
+
+                st.divider()
+
+                # GRÁFICO 2: RANKING ACUMULADO
+                st.subheader(f"📈 Cumulative Ranking Race")
+                fig_cumulative = profiler.call(
+                    "Ranking Race · cumulative figure", create_dynamic_race_chart,
+                    df=race_data_cumulative, value_col='value', item_col=selected_item_col,
+                    title=f"Top {top_n} {item_type} por {metric_type} Acumulado",
+                    xaxis_title=f"Total {metric_type} Acumulado"
                 )
-                return fig
+                st.plotly_chart(fig_cumulative, use_container_width=True)
 
-            st.markdown("---")
+    with tabs[11], profiler.section("Sessions"):
+        if tabs[11].open:
+            px = plotting.plotly_express()
+            st.subheader("⏱️ Listening Sessions")
+            gap_minutes = st.slider("Idle gap that ends a session (minutes)", 5, 180, sessions.DEFAULT_GAP_MINUTES, 5, key="session_gap")
+
+            @profiler.cache_data(show_spinner="Splitting history into sessions...")
+            def calculate_sessions(_df, filter_key, gap_minutes):
+                return sessions.session_table(_df, gap_minutes)
+
+            session_df = calculate_sessions(filtered_df, filter_key, gap_minutes)
+            if session_df.empty:
+                st.info("No listening sessions in the selected range.")
+            else:
+                summary = sessions.session_summary(session_df)
+                metric_cols = st.columns(4)
+                metric_cols[0].metric("Sessions", f"{summary['sessions']:,}")
+                metric_cols[1].metric("Median length", f"{summary['median_length']:.0f} min")
+                metric_cols[2].metric("Median tracks per session", f"{summary['median_plays']:.0f}")
+                metric_cols[3].metric("Longest session", f"{summary['longest_length'] / 60:.1f} h")
+
+                st.subheader("📊 Session Length Distribution")
+                fig = px.histogram(session_df, x='length_minutes', nbins=60, log_y=True, labels={'length_minutes': 'Session length (minutes)'})
+                st.plotly_chart(fig, use_container_width=True)
 
-            # GRÁFICO 1: RANKING POR PERÍODO
-            st.subheader(f"🏆 {time_period} Ranking Race")
-            fig_periodic = create_dynamic_race_chart(
-                df=race_data_periodic, value_col='value', item_col=selected_item_col,
-                title=f"Top {top_n} {item_type} by {metric_type} ({time_period})",
-                xaxis_title=f"{metric_type} en el Período"
-            )
-            st.plotly_chart(fig_periodic, use_container_width=True)
-
-            st.divider()
-
-            # GRÁFICO 2: RANKING ACUMULADO
-            st.subheader(f"📈 Cumulative Ranking Race")
-            fig_cumulative = create_dynamic_race_chart(
-                df=race_data_cumulative, value_col='value', item_col=selected_item_col,
-                title=f"Top {top_n} {item_type} por {metric_type} Acumulado",
-                xaxis_title=f"Total {metric_type} Acumulado"
-            )
-            st.plotly_chart(fig_cumulative, use_container_width=True)
\ No newline at end of file
+                st.subheader("📅 Sessions per Day")
+                st.line_chart(sessions.sessions_per_day(session_df))
+
+                st.subheader("🏃 Longest Sessions")
+                longest = session_df.nlargest(10, 'length_minutes')[['start', 'end', 'plays', 'listened_minutes', 'length_minutes']]
+                st.dataframe(longest.rename(columns={'start': 'Start', 'end': 'End', 'plays': 'Tracks', 'listened_minutes': 'Minutes listened', 'length_minutes': 'Length (minutes)'}).round(1), hide_index=True, use_container_width=True)
+
+                st.subheader("🔁 Repeats & Binges")
+
+                @profiler.cache_data(show_spinner="Finding repeats and binges...")
+                def calculate_runs(_df, filter_key, gap_minutes):
+                    return sessions.listening_runs(_df, gap_minutes)
+
+                runs = calculate_runs(filtered_df, filter_key, gap_minutes)
+                run_labels = {
+                    'repeats': f"Track on repeat ({sessions.MIN_REPEAT_PLAYS}+ in a row)",
+                    'binges': f"Artist binges ({sessions.MIN_BINGE_PLAYS}+ in a row)",
+                    'albums': f"Full albums ({sessions.MIN_ALBUM_TRACKS}+ tracks, unshuffled)",
+                }
+                run_cols = st.columns(3)
+                for col, (kind, label) in zip(run_cols, run_labels.items()):
+                    col.metric(label, f"{len(runs[kind]):,}")
+                run_kind = st.radio("Leaderboard", list(run_labels), format_func=run_labels.get, horizontal=True, key="run_kind")
+                st.caption("Runs are consecutive plays within one session. Artist, album and track filters apply to the stream first, so plays in between are skipped.")
+                run_table = runs[run_kind].rename(columns={sessions.TRACK: 'Track', sessions.ARTIST: 'Artist', sessions.ALBUM: 'Album', 'plays': 'Plays', 'tracks': 'Tracks',
+                                                           'minutes': 'Minutes', 'start': 'Start', 'end': 'End', 'date': 'Date'})
+                tables.paginated_table(run_table.drop(columns=['Start', 'End']).round({'Minutes': 1}), key=f"runs_{run_kind}",
+                                       search_columns=[c for c in ['Track', 'Artist', 'Album'] if c in run_table], hide_index=True, use_container_width=True)
+
+profiling.render_panel(profiler)
+metrics.record_rerun((st.session_state.get("active_tab") or "Top") if df is not None else "No data", profiler.total_seconds())
+metrics.render_admin_panel()
@@ -0,0 +1 @@
+"""Synthetic data generator and benchmarks for the Streamlit analytics (`python -m bench.<script>`)."""
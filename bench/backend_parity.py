@@ -0,0 +1,96 @@
+"""Check that every installed compute backend matches the pandas backend.
+
+Runs top lists, weekly ranks, both ranking races and streaks on synthetic
+histories and compares each result with the pandas one. Frames must match
+row for row, and floats to 1e-9 relative. Exits non-zero on any mismatch and
+prints per-backend timings:
+
+    python -m bench.backend_parity --events 200000 --seeds 0,1,2
+"""
+
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from analytics import backends, ingest, rollups
+from bench.generate_export import generate_events
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ALBUM = 'master_metadata_album_album_name'
+
+
+def cases(events, daily):
+    """(name, method, args) for every backend operation the dashboard uses."""
+    yield 'top_tracks', 'top_items', (events, [TRACK, ARTIST], 15)
+    yield 'top_artists', 'top_items', (events, [ARTIST], 15)
+    yield 'top_albums', 'top_items', (events, [ALBUM, ARTIST], 15)
+    yield 'weekly_ranking', 'weekly_ranking', (daily,)
+    yield 'weekly_ranking_events', 'weekly_ranking', (events,)
+    for item_col in (ARTIST, TRACK):
+        for time_period in ('Weekly', 'Monthly', 'Yearly'):
+            for metric_type in ('Minutes', 'Plays'):
+                label = f"{item_col.split('_')[-2]}_{time_period}_{metric_type}".lower()
+                yield f'periodic_race_{label}', 'periodic_race', (events, item_col, time_period, metric_type, 10)
+                yield f'cumulative_race_{label}', 'cumulative_race', (events, item_col, time_period, metric_type, 10)
+    yield 'daily_streak_stats', 'daily_streak_stats', (events,)
+
+
+def same(expected, actual):
+    if isinstance(expected, dict):
+        return expected.keys() == actual.keys() and all(
+            pd.isna(v) and pd.isna(actual[k]) or v == actual[k] or abs(v - actual[k]) <= 1e-9 * abs(v) for k, v in expected.items()
+        )
+    try:
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True)[list(expected.columns)],
+                                      check_dtype=False, check_exact=False, rtol=1e-9)
+    except (AssertionError, KeyError) as e:
+        print(e)
+        return False
+    return True
+
+
+def run(events_count, seeds, names):
+    instances = {name: backends.get_backend(name) for name in names}
+    failures = 0
+    timings = {name: 0.0 for name in names}
+    for seed in seeds:
+        events = ingest.prepare_events(generate_events(events_count, years=3, seed=seed))
+        daily = rollups.build_daily_rollup(events)
+        for case, method, args in cases(events, daily):
+            results = {}
+            for name, backend in instances.items():
+                start = time.perf_counter()
+                results[name] = getattr(backend, method)(*args)
+                timings[name] += time.perf_counter() - start
+            for name in names[1:]:
+                if not same(results['pandas'], results[name]):
+                    failures += 1
+                    print(f"MISMATCH seed={seed} {case}: pandas vs {name}")
+        print(f"seed {seed}: checked {len(names) - 1} backend(s)", flush=True)
+    for name, seconds in timings.items():
+        print(f"{name:<8} {seconds:>8.2f} s total")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=50_000)
+    parser.add_argument('--seeds', default='0,1')
+    parser.add_argument('--backends', default=None, help="comma separated; defaults to every installed backend")
+    args = parser.parse_args(argv)
+
+    names = args.backends.split(',') if args.backends else backends.available_backends()
+    names = ['pandas'] + [n for n in names if n != 'pandas']
+    if len(names) == 1:
+        print("Only the pandas backend is installed; nothing to compare.")
+        return 0
+    failures = run(args.events, [int(s) for s in args.seeds.split(',')], names)
+    print("OK" if not failures else f"{failures} mismatch(es)")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
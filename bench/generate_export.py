@@ -0,0 +1,132 @@
+"""Write a synthetic Spotify Extended Streaming History ZIP.
+
+Artists and tracks follow Zipf-like popularity, plays are grouped into
+listening sessions with back-to-back repeats and artist binges, and the
+events are split across several `MyData/endsong_<n>.json` members.
+
+    python -m bench.generate_export --events 1000000 --years 6 --out history.zip
+"""
+
+import argparse
+import json
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+PLATFORMS = ['android', 'ios', 'windows', 'osx', 'web_player', 'cast']
+COUNTRIES = ['ES', 'US', 'GB', 'DE', 'FR', 'MX']
+REASON_START = ['trackdone', 'clickrow', 'fwdbtn', 'playbtn', 'backbtn']
+REASON_END_SKIP = ['fwdbtn', 'backbtn', 'endplay']
+# Relative chance of a session starting at each hour of the day
+HOUR_WEIGHTS = np.array([3, 2, 1, 1, 1, 1, 2, 4, 6, 6, 5, 5, 6, 6, 5, 5, 6, 7, 8, 9, 9, 8, 6, 4], dtype=float)
+
+
+def _zipf_weights(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_events(events=100_000, years=5, start_year=2018, artists=None, seed=0,
+                    repeat_rate=0.05, binge_rate=0.25, podcast_rate=0.01):
+    """Return a DataFrame of raw export records (same columns as Spotify's JSON)."""
+    rng = np.random.default_rng(seed)
+    n = int(events)
+    n_artists = int(artists or max(50, min(20_000, n ** 0.6)))
+
+    # Catalog: every artist has a few albums of a few tracks, each with a fixed length
+    albums_per_artist = rng.integers(1, 8, n_artists)
+    tracks_per_album = rng.integers(6, 15, n_artists)
+    tracks_per_artist = albums_per_artist * tracks_per_album
+    track_offset = np.concatenate([[0], np.cumsum(tracks_per_artist)[:-1]])
+    track_length_ms = rng.integers(90_000, 420_000, tracks_per_artist.sum())
+
+    # Plays: Zipf-distributed artists, Zipf-distributed tracks within each artist
+    artist = rng.choice(n_artists, size=n, p=_zipf_weights(n_artists, 1.1))
+    local_track = (rng.zipf(1.4, n) - 1) % tracks_per_artist[artist]
+
+    # Back-to-back repeats copy the previous play; binges keep the previous artist
+    position = np.arange(n)
+    repeat = rng.random(n) < repeat_rate
+    repeat[0] = False
+    source = np.maximum.accumulate(np.where(repeat, 0, position))
+    binge = (rng.random(n) < binge_rate) & ~repeat
+    binge[0] = False
+    artist_source = np.maximum.accumulate(np.where(binge | repeat, 0, position))
+    artist = artist[artist_source]
+    local_track = np.where(repeat, local_track[source], local_track % tracks_per_artist[artist])
+    track = track_offset[artist] + local_track
+    album = local_track // tracks_per_album[artist]
+
+    # 70% full plays, the rest skipped part-way through
+    length = track_length_ms[track]
+    skipped = rng.random(n) < 0.3
+    ms_played = np.where(skipped, (length * rng.random(n) ** 2).astype(np.int64), length)
+
+    # Sessions: start times spread over the span, plays chained back to back
+    mean_session = 12
+    n_sessions = max(1, n // mean_session)
+    span_start = np.datetime64(f'{start_year}-01-01T00:00:00', 's').astype(np.int64)
+    span_seconds = int(years * 365.25 * 86_400)
+    session_day = span_start + rng.integers(0, span_seconds // 86_400, n_sessions) * 86_400
+    session_hour = rng.choice(24, n_sessions, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    session_start = np.sort(session_day + session_hour * 3600 + rng.integers(0, 3600, n_sessions))
+    session = np.sort(rng.integers(0, n_sessions, n))
+    played_s = ms_played // 1000 + rng.integers(0, 5, n)
+    elapsed = np.cumsum(played_s)
+    session_first = np.searchsorted(session, session, side='left')
+    within = elapsed - (elapsed[session_first] - played_s[session_first])
+    ts = session_start[session] + within  # Spotify stamps the *end* of the play
+
+    podcast = rng.random(n) < podcast_rate
+    frame = pd.DataFrame({
+        'ts': np.char.add(np.datetime_as_string(ts.astype('datetime64[s]'), unit='s'), 'Z'),
+        'platform': np.array(PLATFORMS)[rng.integers(0, len(PLATFORMS), n)],
+        'ms_played': ms_played,
+        'conn_country': np.array(COUNTRIES)[rng.choice(len(COUNTRIES), n, p=_zipf_weights(len(COUNTRIES), 2.0))],
+        'master_metadata_track_name': np.char.add(np.char.add('Track ', track.astype(str)), np.char.add(' - ', artist.astype(str))),
+        'master_metadata_album_artist_name': np.char.add('Artist ', artist.astype(str)),
+        'master_metadata_album_album_name': np.char.add(np.char.add('Album ', artist.astype(str)), np.char.add('.', album.astype(str))),
+        'spotify_track_uri': np.char.add('spotify:track:', np.char.zfill(track.astype(str), 22)),
+        'reason_start': np.array(REASON_START)[rng.integers(0, len(REASON_START), n)],
+        'reason_end': np.where(skipped, np.array(REASON_END_SKIP)[rng.integers(0, len(REASON_END_SKIP), n)], 'trackdone'),
+        'shuffle': rng.random(n) < 0.4,
+        'skipped': skipped,
+        'offline': rng.random(n) < 0.05,
+        'incognito_mode': False,
+    })
+    for col in ['master_metadata_track_name', 'master_metadata_album_artist_name', 'master_metadata_album_album_name', 'spotify_track_uri']:
+        frame[col] = frame[col].astype(object).where(~podcast, None)
+    frame['episode_name'] = np.where(podcast, 'Episode', None)
+    frame['episode_show_name'] = np.where(podcast, 'Some Podcast', None)
+    return frame
+
+
+def write_export_zip(frame, path, members=4):
+    """Write `frame` as `MyData/endsong_<n>.json` members of a ZIP archive."""
+    chunks = np.array_split(np.arange(len(frame)), max(1, members))
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for i, rows in enumerate(chunks):
+            records = frame.iloc[rows].to_json(orient='records')
+            archive.writestr(f'MyData/endsong_{i}.json', records)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100_000)
+    parser.add_argument('--years', type=float, default=5)
+    parser.add_argument('--start-year', type=int, default=2018)
+    parser.add_argument('--artists', type=int, default=None)
+    parser.add_argument('--members', type=int, default=4, help="number of JSON files inside the ZIP")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='synthetic_history.zip')
+    args = parser.parse_args(argv)
+
+    frame = generate_events(args.events, args.years, args.start_year, args.artists, args.seed)
+    write_export_zip(frame, args.out, args.members)
+    print(json.dumps({'out': args.out, 'events': len(frame), 'members': args.members}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Rerun payload size of the Streamlit app, per tab and element type.
+
+Drives the app headlessly with Streamlit's AppTest on a synthetic saved
+dataset. After each rerun it sums the serialized protobuf size of every
+element the script sent (Arrow bytes of tables, Plotly JSON, widgets, ...).
+`--app` measures another copy of the script, e.g. an older revision:
+
+    git show HEAD~1:app.py > /tmp/app_before.py
+    python -m bench.payload --events 200000 --app /tmp/app_before.py
+    python -m bench.payload --events 200000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TAB_STATE_KEY = "active_tab"
+# Selections made after the tab's first render, as (tab label, selectbox key, option index)
+SELECTIONS = [("🌟 Your Wrapped", "artist_drill", 1), ("🌟 Your Wrapped", "track_drill", 1)]
+
+
+def element_bytes(at):
+    """Serialized bytes per element type for the last rerun."""
+    sizes = {}
+
+    def walk(node):
+        proto = getattr(node, 'proto', None)
+        if proto is not None and hasattr(proto, 'ByteSize'):
+            sizes[node.type] = sizes.get(node.type, 0) + proto.ByteSize()
+        for child in getattr(node, 'children', {}).values():
+            walk(child)
+
+    walk(at._tree)
+    return sizes
+
+
+def measure(app_path, data_dir):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ['SPOTIFY_STATS_DATA_DIR'] = data_dir
+    at = AppTest.from_file(app_path, default_timeout=900)
+    at.run()
+    at.sidebar.selectbox[0].select("bench").run()
+    results = {}
+    for label in [t.label for t in at.tabs]:
+        at.session_state[TAB_STATE_KEY] = label
+        at.run()
+        results[label] = element_bytes(at)
+        for tab, key, index in SELECTIONS:
+            if tab == label:
+                at.selectbox(key=key).select_index(index).run()
+                results[f"{label} · {key}"] = element_bytes(at)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100_000)
+    parser.add_argument('--app', default=os.path.join(ROOT, 'app.py'))
+    parser.add_argument('--json', default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    from bench.startup import prepare_dataset
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        prepare_dataset(data_dir, args.events)
+        results = measure(os.path.abspath(args.app), data_dir)
+
+    for label, sizes in results.items():
+        top = sorted(sizes.items(), key=lambda item: -item[1])[:3]
+        print(f"{label:<36} {sum(sizes.values()) / 1024:>9.1f} KiB   " + ", ".join(f"{kind} {size / 1024:.1f}" for kind, size in top))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
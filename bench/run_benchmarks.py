@@ -0,0 +1,153 @@
+"""Time every dashboard computation on synthetic exports of increasing size.
+
+Each stage reports wall time and the tracemalloc peak (Python and NumPy
+allocations made while the stage runs). Save a run with `--json` and pass it
+back with `--compare` to see regressions:
+
+    python -m bench.run_benchmarks --sizes 10k,100k,1m --json before.json
+    python -m bench.run_benchmarks --sizes 10k,100k,1m --compare before.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from analytics import backends, filters, ingest, rollups, streaks, wrapped
+from bench.generate_export import generate_events, write_export_zip
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ALBUM = 'master_metadata_album_album_name'
+SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def measure(fn, *args, **kwargs):
+    """Run `fn` once and return (result, wall seconds, peak bytes)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def export_zip(size, cache_dir, seed=0):
+    """Synthetic export of `size` events, generated once per size and seed."""
+    path = os.path.join(cache_dir, f'synthetic_{size}_{seed}.zip')
+    if not os.path.exists(path):
+        years = 3 if size <= 100_000 else 8
+        write_export_zip(generate_events(size, years=years, seed=seed), path, members=max(1, size // 250_000 + 1))
+    return path
+
+
+def wrapped_report(events, first_listen_years, year):
+    year_df = events[events['year'] == year]
+    return (
+        wrapped.headlines(year_df),
+        wrapped.monthly_race(year_df),
+        wrapped.cumulative_monthly_race(year_df),
+        wrapped.listener_dna(first_listen_years['track'], year_df, year),
+        wrapped.time_of_day_distribution(year_df),
+        wrapped.masterpiece_stats(year_df, first_listen_years, year),
+    )
+
+
+def stages(zip_path, backend):
+    """Yield (stage name, callable) pairs in dashboard order; later stages reuse earlier results."""
+    state = {}
+
+    def ingest_stage():
+        state['events'] = ingest.load_export(zip_path)
+        return state['events']
+
+    def rollups_stage():
+        state['rollups'] = rollups.build_rollups(state['events'])
+        return state['rollups']
+
+    def filter_stage():
+        events = state['events']
+        dates = events['date'].sort_values()
+        top_artists = events[ARTIST].value_counts().index[:5].tolist()
+        state['filtered'] = filters.apply_filters(events, dates.iloc[len(dates) // 4], dates.iloc[-1], artists=top_artists)
+        return state['filtered']
+
+    yield 'ingest', ingest_stage
+    yield 'rollups', rollups_stage
+    yield 'filter', filter_stage
+    yield 'top_lists', lambda: [backend.top_items(state['events'], keys, 15) for keys in ([TRACK, ARTIST], [ARTIST], [ALBUM, ARTIST])]
+    yield 'weekly_ranking', lambda: backend.weekly_ranking(state['rollups']['daily'])
+    yield 'weekly_ranking_events', lambda: backend.weekly_ranking(state['events'])
+    yield 'streaks', lambda: (backend.daily_streak_stats(state['events']), streaks.longest_hourly_streak(state['events']))
+    yield 'wrapped', lambda: wrapped_report(
+        state['events'],
+        {kind: rollups.first_listen_years(state['rollups'], kind) for kind in rollups.ENTITY_COLUMNS},
+        int(state['events']['year'].max()),
+    )
+    yield 'race_periodic', lambda: backend.periodic_race(state['events'], ARTIST, 'Weekly', 'Minutes', 10)
+    yield 'race_cumulative', lambda: backend.cumulative_race(state['events'], ARTIST, 'Weekly', 'Minutes', 10)
+
+
+def run(sizes, cache_dir, only=None, backend=None):
+    results = []
+    for size in sizes:
+        zip_path = export_zip(size, cache_dir)
+        for name, fn in stages(zip_path, backend or backends.get_backend()):
+            if only and name not in only and name not in ('ingest', 'rollups'):
+                continue
+            _, seconds, peak = measure(fn)
+            results.append({'size': size, 'stage': name, 'seconds': round(seconds, 4), 'peak_mb': round(peak / 2**20, 2)})
+            print(f"{size:>10,}  {name:<22} {seconds:>9.3f} s  {peak / 2**20:>9.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline):
+    previous = {(r['size'], r['stage']): r for r in baseline}
+    print(f"\n{'size':>10}  {'stage':<22} {'time':>10} {'memory':>10}")
+    for r in results:
+        before = previous.get((r['size'], r['stage']))
+        if not before:
+            continue
+        time_delta = (r['seconds'] / before['seconds'] - 1) * 100 if before['seconds'] else 0
+        mem_delta = (r['peak_mb'] / before['peak_mb'] - 1) * 100 if before['peak_mb'] else 0
+        print(f"{r['size']:>10,}  {r['stage']:<22} {time_delta:>+9.1f}% {mem_delta:>+9.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10k,100k,1m', help="comma separated event counts, e.g. 10k,100k,1m,10m")
+    parser.add_argument('--stages', default=None, help="comma separated subset of stages to time")
+    parser.add_argument('--cache-dir', default=os.path.join(tempfile.gettempdir(), 'spotify_stats_bench'))
+    parser.add_argument('--backend', default=None, help="compute backend (pandas, polars); defaults to SPOTIFY_STATS_BACKEND")
+    parser.add_argument('--json', default=None, help="write results to this file")
+    parser.add_argument('--compare', default=None, help="results file of a previous run to diff against")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    only = set(args.stages.split(',')) if args.stages else None
+    results = run(sizes, args.cache_dir, only, backends.get_backend(args.backend))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Latency of the concurrent section graphs per tab, serial versus on the thread pool.
+
+Times the task graphs behind the Top lists, the weekly ranking index (week
+counts and streaks per threshold) and the Wrapped year overview. Each runs
+with one thread and with `--threads`, on a synthetic export. Reports the
+median of `--repeats` runs:
+
+    python -m bench.sections --events 1000000 --threads 4
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from analytics import backends, ingest, overview, ranking, rollups, sketches, taskgraph, wrapped
+from bench.generate_export import generate_events
+
+
+def sections(events, dataset_rollups, backend):
+    """(tab, callable) for every tab that computes through a task graph."""
+    year = int(events['year'].value_counts().idxmax())
+    year_df = events[events['year'] == year]
+    first_listen_years = {kind: rollups.first_listen_years(dataset_rollups, kind) for kind in ('track', 'album', 'artist')}
+    return [
+        ("Top", lambda: overview.top_lists(events, backend.top_items, 15)),
+        ("Weekly Ranking", lambda: ranking.index_weekly_ranking(dataset_rollups['weekly'])),
+        (f"Wrapped {year}", lambda: wrapped.year_overview(year_df, first_listen_years, year, lambda: sketches.exact_distinct_counts(year_df))),
+    ]
+
+
+def median_seconds(fn, threads, repeats):
+    os.environ[taskgraph.THREADS_ENV] = str(threads)
+    fn()  # warm up the pool and lazy imports
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    events = ingest.prepare_events(generate_events(args.events, years=args.years))
+    dataset_rollups = rollups.build_rollups(events)
+    backend = backends.get_backend()
+    print(f"{args.events:,} events, {os.cpu_count()} CPUs, backend {backend.name}")
+    print(f"{'tab':<16}{'serial':>10}{f'{args.threads} threads':>12}{'speedup':>10}")
+    for tab, fn in sections(events, dataset_rollups, backend):
+        serial = median_seconds(fn, 1, args.repeats)
+        parallel = median_seconds(fn, args.threads, args.repeats)
+        print(f"{tab:<16}{serial:>9.3f}s{parallel:>11.3f}s{serial / parallel:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
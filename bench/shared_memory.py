@@ -0,0 +1,93 @@
+"""Memory of N worker processes holding the same dataset, private vs shared.
+
+Each worker is a fresh Python process that loads one synthetic dataset and
+reports its proportional set size (PSS, pages shared between processes are
+split between them):
+
+- private: the dataset is unpickled, as each Streamlit process does today
+- shared: the dataset is attached from a memory-mapped Arrow file published
+  once (`analytics/shared.py`)
+
+The totals exclude each process's baseline (interpreter and imports). They
+should grow with N for private copies and stay nearly flat when shared. Linux only (reads /proc/self/smaps_rollup).
+
+    python -m bench.shared_memory --events 1000000 --workers 1,2,4,8
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = r'''
+import os, sys
+sys.path.insert(0, {root!r})
+import pandas as pd
+from analytics import shared
+mode, directory = sys.argv[1], sys.argv[2]
+if mode == "private":
+    events = pd.read_pickle(os.path.join(directory, "events.pkl"))
+elif mode == "shared":
+    events = shared.attach("bench")[0]
+else:
+    import pyarrow
+    events = pd.DataFrame()
+# Read every column once so mapped pages are actually resident
+for col in events.columns:
+    pd.util.hash_pandas_object(events[col], index=False).sum()
+print("ready", flush=True)
+sys.stdin.readline()
+with open("/proc/self/smaps_rollup") as f:
+    pss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("Pss:"))
+print(pss, flush=True)
+'''
+
+
+def run_workers(mode, count, directory):
+    script = WORKER.format(root=ROOT)
+    workers = [subprocess.Popen([sys.executable, '-c', script, mode, directory], env=os.environ.copy(),
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(count)]
+    # PSS is read only once every worker holds the dataset, so shared pages are split between all of them
+    for w in workers:
+        w.stdout.readline()
+    for w in workers:
+        w.stdin.write("\n")
+        w.stdin.flush()
+    total = sum(int(w.stdout.readline()) for w in workers)
+    for w in workers:
+        w.wait()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=500_000)
+    parser.add_argument('--workers', default='1,2,4')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    from analytics import ingest, rollups, shared
+    from bench.generate_export import generate_events
+
+    with tempfile.TemporaryDirectory(dir='/dev/shm' if os.path.isdir('/dev/shm') else None) as directory:
+        os.environ[shared.SHARED_DIR_ENV] = directory
+        events = ingest.prepare_events(generate_events(args.events, years=5))
+        events.to_pickle(os.path.join(directory, 'events.pkl'))
+        shared.publish('bench', events, rollups.build_rollups(events))
+        del events
+
+        # Interpreter and imports alone, subtracted to isolate the dataset
+        baseline = run_workers('baseline', 1, directory)
+        print(f"baseline per process (no dataset): {baseline / 2**20:.0f} MB")
+        print(f"{'workers':>8} {'private MB':>12} {'shared MB':>12}")
+        for count in [int(n) for n in args.workers.split(',')]:
+            private = run_workers('private', count, directory) - count * baseline
+            mapped = run_workers('shared', count, directory) - count * baseline
+            print(f"{count:>8} {private / 2**20:>12.0f} {mapped / 2**20:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Cold-start benchmark for the Streamlit app.
+
+Every measurement runs in a fresh Python process, driven headlessly with
+Streamlit's AppTest:
+
+- upload prompt: process start until the first script run (no data) finishes
+- first chart: process start until the default tab is rendered for a saved
+  dataset, which skips the upload widget but runs everything after it
+- per-tab: time for the first visit to each tab in that same process
+
+It also reports which plotting backends were imported at each point.
+
+    python -m bench.startup --events 100000 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['matplotlib.pyplot', 'seaborn', 'scipy', 'plotly.express']
+TAB_STATE_KEY = "active_tab"
+
+CHILD = r'''
+import json, sys, time, warnings
+warnings.filterwarnings("ignore")
+started = float(sys.argv[1])
+mode = sys.argv[2]
+from streamlit.testing.v1 import AppTest
+heavy = {heavy!r}
+loaded = lambda: [m for m in heavy if m in sys.modules]
+report = {{}}
+at = AppTest.from_file({app!r}, default_timeout=600)
+at.run()
+report["upload_prompt_s"] = time.time() - started
+report["loaded_at_prompt"] = loaded()
+if mode == "chart":
+    at.sidebar.selectbox[0].select("bench").run()
+    report["first_chart_s"] = time.time() - started
+    report["charts"] = len(at.get("plotly_chart"))
+    report["loaded_at_first_chart"] = loaded()
+    tab_labels = [t.label for t in at.tabs]
+    report["tabs"] = {{}}
+    for label in tab_labels[1:]:
+        t = time.time()
+        at.session_state[{key!r}] = label
+        at.run()
+        report["tabs"][label] = {{"seconds": time.time() - t, "loaded": loaded()}}
+print(json.dumps(report))
+'''
+
+
+def run_child(mode, data_dir):
+    script = CHILD.format(heavy=HEAVY_MODULES, app=os.path.join(ROOT, 'app.py'), key=TAB_STATE_KEY)
+    env = dict(os.environ, SPOTIFY_STATS_DATA_DIR=data_dir, PYTHONPATH=ROOT)
+    started = time.time()
+    out = subprocess.run([sys.executable, '-c', script, repr(started), mode], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def prepare_dataset(data_dir, events):
+    sys.path.insert(0, ROOT)
+    from analytics import ingest, rollups
+    from bench.generate_export import generate_events
+
+    os.environ[ingest.DATA_DIR_ENV] = data_dir
+    frame = ingest.prepare_events(generate_events(events, years=3))
+    ingest.save_dataset("bench", frame, rollups.build_rollups(frame))
+
+
+def import_cost(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {'import_s': {m: round(import_cost(m), 3) for m in ['streamlit', 'pandas'] + HEAVY_MODULES}}
+    with tempfile.TemporaryDirectory() as empty_dir, tempfile.TemporaryDirectory() as data_dir:
+        prepare_dataset(data_dir, args.events)
+        prompt = [run_child('prompt', empty_dir) for _ in range(args.repeat)]
+        chart = [run_child('chart', data_dir) for _ in range(args.repeat)]
+
+    results['upload_prompt_s'] = round(statistics.median(r['upload_prompt_s'] for r in prompt), 3)
+    results['loaded_at_prompt'] = prompt[-1]['loaded_at_prompt']
+    results['first_chart_s'] = round(statistics.median(r['first_chart_s'] for r in chart), 3)
+    results['loaded_at_first_chart'] = chart[-1]['loaded_at_first_chart']
+    results['first_tab_visit_s'] = {
+        label: round(statistics.median(r['tabs'][label]['seconds'] for r in chart), 3) for label in chart[-1]['tabs']
+    }
+
+    for module, seconds in results['import_s'].items():
+        print(f"import {module:<20} {seconds:>7.3f} s")
+    print(f"\nupload prompt          {results['upload_prompt_s']:>7.3f} s   loaded: {', '.join(results['loaded_at_prompt']) or '-'}")
+    print(f"first chart            {results['first_chart_s']:>7.3f} s   loaded: {', '.join(results['loaded_at_first_chart']) or '-'}")
+    for label, seconds in results['first_tab_visit_s'].items():
+        print(f"  first visit {label:<20} {seconds:>7.3f} s")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
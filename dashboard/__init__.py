@@ -0,0 +1,4 @@
+"""Streamlit-aware helpers for `app.py` (profiling, tables, charts).
+
+Computation belongs in `analytics`; modules here may import Streamlit.
+"""
@@ -0,0 +1,267 @@
+"""Process-wide operational metrics for long-running dashboard servers.
+
+One `Registry` lives for the whole server process and is shared by every
+session. It records:
+
+- rerun latency per view (tab) and the time of every `profiler.call`
+  (figure builds, filters), as histograms
+- cache calls per cached function, split into hits and misses
+- bytes held by each `st.cache_data` function (Streamlit's own cache stats),
+  datasets resident in the loader caches, current and peak RSS
+
+`SPOTIFY_STATS_METRICS_FILE=/path/metrics.prom` rewrites the numbers after
+each rerun (at most every `WRITE_INTERVAL_S`) as OpenMetrics text, or as JSON
+when the path ends in `.json`. `SPOTIFY_STATS_METRICS_PORT=9464` also serves
+them on 127.0.0.1 at `/metrics` and `/metrics.json`. `?admin=1` in the URL
+shows the same numbers in a panel at the bottom of the page.
+"""
+
+import bisect
+import http.server
+import json
+import logging
+import os
+import resource
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.caching import get_data_cache_stats_provider
+
+METRICS_FILE_ENV = "SPOTIFY_STATS_METRICS_FILE"
+METRICS_PORT_ENV = "SPOTIFY_STATS_METRICS_PORT"
+PREFIX = "spotify_stats"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+WRITE_INTERVAL_S = 10
+LOGGER = logging.getLogger(__name__)
+HELP = {
+    'rerun_seconds': "Script rerun latency per view",
+    'call_seconds': "Time of profiled calls such as figure builds",
+    'cache_calls': "Cached function calls by result",
+    'cache_bytes': "Bytes held by each st.cache_data function",
+    'datasets_resident': "Datasets held in the loader caches",
+    'rss_bytes': "Current resident set size",
+    'peak_rss_bytes': "Peak resident set size",
+    'uptime_seconds': "Seconds since the metrics registry was created",
+}
+
+
+def admin_requested():
+    return st.query_params.get("admin", "") in ("1", "true")
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self._last_write = 0.0
+        self._write_lock = threading.Lock()
+        self.datasets = {}
+
+    def observe(self, metric, value, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self.lock:
+            counts, total, count = self.histograms.get(key, ([0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0))
+            counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+            self.histograms[key] = (counts, total + value, count + 1)
+
+    def inc(self, metric, amount=1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def dataset_loaded(self, loader, key):
+        """Called by a dataset loader on a cache miss: `key` is now held in `loader`'s cache."""
+        with self.lock:
+            self.datasets.setdefault(loader, set()).add(key)
+
+    def gauges(self):
+        """Gauges read at collection time: cache bytes, resident datasets, memory."""
+        gauges = {}
+        for stat in get_data_cache_stats_provider().get_stats().get('cache_memory_bytes', []):
+            function = stat.cache_name.rsplit('.', 1)[-1]
+            key = ('cache_bytes', (('function', function),))
+            gauges[key] = gauges.get(key, 0) + stat.byte_length
+        with self.lock:
+            # The loaders set no ttl or max_entries, so their entries only go when the cache is cleared,
+            # and a cleared function has no bytes left in the stats
+            for loader in list(self.datasets):
+                if ('cache_bytes', (('function', loader),)) not in gauges:
+                    del self.datasets[loader]
+            gauges[('datasets_resident', ())] = sum(len(keys) for keys in self.datasets.values())
+        gauges[('rss_bytes', ())] = _current_rss()
+        gauges[('peak_rss_bytes', ())] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        gauges[('uptime_seconds', ())] = round(time.time() - self.started, 1)
+        return gauges
+
+    def snapshot(self):
+        with self.lock:
+            histograms = {key: (list(counts), total, count) for key, (counts, total, count) in self.histograms.items()}
+            counters = dict(self.counters)
+        return histograms, counters, self.gauges()
+
+    def to_json(self):
+        histograms, counters, gauges = self.snapshot()
+        bounds = [str(b) for b in LATENCY_BUCKETS] + ['+Inf']
+        return json.dumps({
+            'histograms': [{'name': name, 'labels': dict(labels), 'buckets': dict(zip(bounds, counts)), 'sum': round(total, 6), 'count': count}
+                           for (name, labels), (counts, total, count) in histograms.items()],
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in counters.items()],
+            'gauges': [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in gauges.items()],
+        }, indent=2)
+
+    def to_openmetrics(self):
+        histograms, counters, gauges = self.snapshot()
+        lines = []
+
+        def family(name, kind, samples):
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            if name in HELP:
+                lines.append(f"# HELP {PREFIX}_{name} {HELP[name]}")
+            lines.extend(samples)
+
+        for name in sorted({name for name, _ in histograms}):
+            samples = []
+            for (hist_name, labels), (counts, total, count) in sorted(histograms.items()):
+                if hist_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket in zip([*LATENCY_BUCKETS, '+Inf'], counts):
+                    cumulative += bucket
+                    samples.append(f"{PREFIX}_{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                samples.append(f"{PREFIX}_{name}_sum{_labels(labels)} {total:.6f}")
+                samples.append(f"{PREFIX}_{name}_count{_labels(labels)} {count}")
+            family(name, 'histogram', samples)
+        for name in sorted({name for name, _ in counters}):
+            family(name, 'counter', [f"{PREFIX}_{name}_total{_labels(labels)} {value}" for (n, labels), value in sorted(counters.items()) if n == name])
+        for name in sorted({name for name, _ in gauges}):
+            family(name, 'gauge', [f"{PREFIX}_{name}{_labels(labels)} {value}" for (n, labels), value in sorted(gauges.items()) if n == name])
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def export(self, force=False):
+        """Rewrite the metrics file (atomically) if one is configured and the last write is old enough."""
+        path = os.environ.get(METRICS_FILE_ENV)
+        if not path:
+            return
+        # Sessions rerun on their own threads, and several server processes may share the path
+        with self._write_lock:
+            if not force and time.time() - self._last_write < WRITE_INTERVAL_S:
+                return
+            self._last_write = time.time()
+            body = self.to_json() if path.endswith('.json') else self.to_openmetrics()
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'w') as f:
+                f.write(body)
+            os.replace(tmp, path)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+def _current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+REGISTRY = Registry()
+_server_lock = threading.Lock()
+_server = None
+_server_failed = False
+
+
+def serve(registry=REGISTRY):
+    """Start the local metrics endpoint once per process when a port is configured."""
+    global _server, _server_failed
+    port = os.environ.get(METRICS_PORT_ENV)
+    if not port:
+        return
+    with _server_lock:
+        if _server is not None or _server_failed:
+            return
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, kind = registry.to_openmetrics(), 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+                elif self.path == '/metrics.json':
+                    body, kind = registry.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            _server = http.server.ThreadingHTTPServer(('127.0.0.1', int(port)), Handler)
+        except OSError as error:
+            # Usually another server process already holds the port; it serves its own numbers
+            _server_failed = True
+            LOGGER.warning("Metrics endpoint not started on port %s: %s", port, error)
+            return
+        threading.Thread(target=_server.serve_forever, name="metrics-endpoint", daemon=True).start()
+
+
+def record_rerun(view, seconds, registry=REGISTRY):
+    """End-of-rerun hook: latency histogram, file export and endpoint start-up."""
+    registry.observe('rerun_seconds', seconds, view=view)
+    registry.export()
+    serve(registry)
+
+
+def render_admin_panel(registry=REGISTRY):
+    """Hidden panel (`?admin=1`) with the same numbers the exports carry."""
+    if not admin_requested():
+        return
+    histograms, counters, gauges = registry.snapshot()
+    with st.expander("🛠️ Server metrics", expanded=False):
+        process = {name: value for (name, labels), value in gauges.items() if not labels}
+        cols = st.columns(4)
+        cols[0].metric("RSS", f"{process['rss_bytes'] / 2**20:,.0f} MB")
+        cols[1].metric("Peak RSS", f"{process['peak_rss_bytes'] / 2**20:,.0f} MB")
+        cols[2].metric("Datasets resident", process['datasets_resident'])
+        cols[3].metric("Uptime", f"{process['uptime_seconds'] / 3600:,.1f} h")
+
+        rows = []
+        for (name, labels), (counts, total, count) in histograms.items():
+            # Upper bound of the bucket holding the 95th percentile
+            cumulative = pd.Series(counts).cumsum()
+            p95_bucket = int((cumulative >= 0.95 * count).idxmax())
+            rows.append({'metric': name, **dict(labels), 'count': count, 'mean_s': round(total / count, 3),
+                         'p95_s ≤': ([*LATENCY_BUCKETS, float('inf')])[p95_bucket]})
+        if rows:
+            st.markdown("**Latency**")
+            st.dataframe(pd.DataFrame(rows).sort_values(['metric', 'count'], ascending=[False, False]), hide_index=True, use_container_width=True)
+
+        calls = {}
+        for (name, labels), value in counters.items():
+            if name == 'cache_calls':
+                labels = dict(labels)
+                calls.setdefault(labels['function'], {'hit': 0, 'miss': 0})[labels['result']] += value
+        cache_bytes = {dict(labels)['function']: value for (name, labels), value in gauges.items() if name == 'cache_bytes'}
+        if calls or cache_bytes:
+            table = pd.DataFrame([{'function': f, 'hits': c['hit'], 'misses': c['miss'], 'hit_ratio': round(c['hit'] / max(c['hit'] + c['miss'], 1), 3),
+                                   'cache_mb': round(cache_bytes.get(f, 0) / 2**20, 2)} for f, c in calls.items()])
+            st.markdown("**Caches**")
+            st.dataframe(table.sort_values('cache_mb', ascending=False), hide_index=True, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        col1.download_button("OpenMetrics", registry.to_openmetrics(), file_name="metrics.prom", mime="text/plain")
+        col2.download_button("JSON", registry.to_json(), file_name="metrics.json", mime="application/json")
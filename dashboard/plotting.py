@@ -0,0 +1,26 @@
+"""Deferred plotting imports.
+
+matplotlib/seaborn (which pulls in scipy) and plotly.express are only
+imported the first time a tab that draws with them is opened, so the upload
+screen and Plotly-only tabs never pay for the others.
+"""
+
+import functools
+import importlib
+
+
+@functools.lru_cache(maxsize=None)
+def plotly_express():
+    return importlib.import_module("plotly.express")
+
+
+@functools.lru_cache(maxsize=None)
+def plotly_graph_objects():
+    return importlib.import_module("plotly.graph_objects")
+
+
+@functools.lru_cache(maxsize=None)
+def pyplot_and_seaborn():
+    matplotlib = importlib.import_module("matplotlib")
+    matplotlib.use("Agg")
+    return importlib.import_module("matplotlib.pyplot"), importlib.import_module("seaborn")
@@ -0,0 +1,153 @@
+"""Opt-in per-section profiling of a Streamlit rerun.
+
+Enable with `?profile=1` in the URL or `SPOTIFY_STATS_PROFILE=1` in the
+environment. Each named section and cached function call records wall time
+and (for cached functions) whether the cache was hit. When profiling is off,
+sections are pass-throughs; cache hits and misses and `call` timings still go
+to the process-wide metrics registry when one is given (see
+`dashboard.metrics`).
+
+Memory peaks come from tracemalloc, which traces every thread of the process
+and has one global peak. They are therefore only recorded with the
+environment flag, meant for single-user runs: `?profile=1` on a shared server
+must not slow down or garble other sessions.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pandas as pd
+import streamlit as st
+
+ENV_FLAG = "SPOTIFY_STATS_PROFILE"
+
+
+def memory_tracing_requested():
+    return os.environ.get(ENV_FLAG, "").lower() in ("1", "true", "yes")
+
+
+def profiling_requested():
+    if os.environ.get(ENV_FLAG, "").lower() in ("1", "true", "yes"):
+        return True
+    return st.query_params.get("profile", "") in ("1", "true")
+
+
+class Profiler:
+    def __init__(self, enabled, metrics=None, trace_memory=False):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.metrics = metrics
+        self.records = []
+        self._stack = []
+        self._misses = []
+        self._started = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def section(self, name, kind="section"):
+        if not self.enabled:
+            start = time.perf_counter()
+            try:
+                yield {}
+            finally:
+                self._observe(name, kind, time.perf_counter() - start)
+            return
+        current, peak = tracemalloc.get_traced_memory() if self.trace_memory else (0, 0)
+        # The parent keeps the highest peak seen before this section resets it
+        if self._stack:
+            self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        frame = {'peak': 0, 'start_mem': current}
+        self._stack.append(frame)
+        record = {'name': name, 'kind': kind, 'depth': len(self._stack) - 1, 'cache': None,
+                  'offset_s': round(time.perf_counter() - self._started, 4)}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self._observe(name, kind, record['seconds'])
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1] if self.trace_memory else 0)
+            record['peak_mb'] = round(max(peak - frame['start_mem'], 0) / 2**20, 3) if self.trace_memory else None
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            self.records.append(record)
+
+    def _observe(self, name, kind, seconds):
+        if self.metrics is not None and kind == "call":
+            self.metrics.observe('call_seconds', seconds, name=name)
+
+    def call(self, name, fn, *args, **kwargs):
+        """Time a single call, e.g. a figure build."""
+        with self.section(name, kind="call"):
+            return fn(*args, **kwargs)
+
+    def cache_data(self, **cache_kwargs):
+        """Drop-in for `st.cache_data(...)` that also records hits and misses."""
+        def decorator(func):
+            if not self.enabled and self.metrics is None:
+                return st.cache_data(**cache_kwargs)(func)
+
+            @functools.wraps(func)
+            def compute(*args, **kwargs):
+                self._misses[-1] = True
+                return func(*args, **kwargs)
+
+            cached = st.cache_data(**cache_kwargs)(compute)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.section(func.__name__, kind="cache") as record:
+                    self._misses.append(False)
+                    try:
+                        return cached(*args, **kwargs)
+                    finally:
+                        record['cache'] = "miss" if self._misses.pop() else "hit"
+                        if self.metrics is not None:
+                            self.metrics.inc('cache_calls', function=func.__name__, result=record['cache'])
+
+            wrapper.clear = cached.clear
+            return wrapper
+        return decorator
+
+    def total_seconds(self):
+        return time.perf_counter() - self._started
+
+    def to_json(self):
+        return json.dumps({
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'total_seconds': round(self.total_seconds(), 4),
+            'versions': {'python': platform.python_version(), 'pandas': pd.__version__, 'streamlit': st.__version__},
+            'records': [dict(r, seconds=round(r['seconds'], 4)) for r in self.records],
+        }, indent=2)
+
+
+def render_panel(profiler):
+    """Collapsible breakdown of the current rerun, slowest first, with JSON export."""
+    if not profiler.enabled:
+        return
+    total = profiler.total_seconds()
+    with st.expander(f"⏱️ Profile of this rerun ({total:.2f} s)", expanded=False):
+        if not profiler.records:
+            st.info("Nothing was profiled in this rerun.")
+        else:
+            table = pd.DataFrame(profiler.records)
+            table['name'] = ["  " * d + n for d, n in zip(table['depth'], table['name'])]
+            table['share'] = (100 * table['seconds'] / total).round(1)
+            table = table.sort_values('seconds', ascending=False)[['name', 'kind', 'cache', 'seconds', 'share', 'peak_mb', 'offset_s']]
+            table['seconds'] = table['seconds'].round(4)
+            st.dataframe(table.rename(columns={'name': 'Section', 'kind': 'Kind', 'cache': 'Cache', 'seconds': 'Seconds', 'share': '% of rerun', 'peak_mb': 'Peak MB', 'offset_s': 'Started at (s)'}), hide_index=True, use_container_width=True)
+            cache_calls = table[table['kind'] == 'cache']
+            if not cache_calls.empty:
+                hits = (cache_calls['cache'] == 'hit').sum()
+                st.caption(f"Cached calls: {len(cache_calls)} ({hits} hits, {len(cache_calls) - hits} misses)")
+        st.download_button("Download trace (JSON)", profiler.to_json(), file_name=f"profile_{datetime.now():%Y%m%d_%H%M%S}.json", mime="application/json")
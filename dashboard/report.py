@@ -0,0 +1,289 @@
+"""Static HTML report of one filter set, viewable without a server.
+
+One self-contained file holds:
+
+- the Top lists;
+- the weekly points leaderboard;
+- the activity heatmaps;
+- the streaks;
+- a Wrapped card for every year.
+
+The aggregations run once, in this process, with the same `analytics`
+functions as the tabs. Each figure is then built from its small aggregate as
+Plotly JSON, on a process pool when there are enough figures to repay the
+workers' imports. The page inlines plotly.js, the figure JSON and the
+tables. It can be served as a static file at no compute cost, or opened
+offline. Nothing here imports Streamlit:
+
+    python -m dashboard.report my_spotify_data.zip -o report.html
+    python -m dashboard.report --dataset default -o report.html --workers 4
+"""
+
+import argparse
+import concurrent.futures
+import html
+import multiprocessing
+import os
+from datetime import datetime
+
+from analytics import backends, ingest, overview, ranking, rollups, timegrid, wrapped
+
+TRACK = 'master_metadata_track_name'
+ARTIST = 'master_metadata_album_artist_name'
+ALBUM = 'master_metadata_album_album_name'
+TOP_N = 15
+LEADERBOARD_ROWS = 25
+MAX_WORKERS = 4
+# Below this many figures, spawning workers (each re-imports pandas and plotly) costs more than it saves
+POOL_MIN_FIGURES = 20
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+ACCENT = '#1DB954'
+
+
+# ─────────────────────────────────────────────
+#  AGGREGATES
+# ─────────────────────────────────────────────
+
+def report_data(events, weekly, first_listen, backend=None, top_n=TOP_N):
+    """Every aggregate the report shows, as small frames and dicts.
+
+    `weekly` is the weekly ranking of the same events (the saved rollup, or
+    `backend.weekly_ranking` of the filtered daily rollup). `first_listen` is
+    the rollup of first listens over the whole history, which the Wrapped
+    cards need for their share of new music and listener DNA.
+    """
+    backend = backend or backends.get_backend()
+    by_hour, calendar = overview.activity_pivots(events)
+    leaderboard = ranking.index_weekly_ranking(weekly)['summary'].head(LEADERBOARD_ROWS) if not weekly.empty else None
+    first_listen_years = {kind: first.dt.year for kind, first in first_listen.items()}
+    years = {}
+    for year, year_df in events.groupby('year'):
+        # The same helpers as the Wrapped tab, so the cards match
+        years[int(year)] = {
+            'headlines': wrapped.headlines(year_df),
+            'masterpiece': wrapped.masterpiece_stats(year_df, first_listen_years, year),
+            'dna': wrapped.listener_dna(first_listen_years['track'], year_df, year),
+            'race': wrapped.monthly_race(year_df),
+        }
+    return {
+        'events': len(events),
+        'first_day': events['date'].min(),
+        'last_day': events['date'].max(),
+        'top': overview.top_lists(events, backend.top_items, top_n),
+        'leaderboard': leaderboard,
+        'by_hour': by_hour,
+        'calendar': calendar,
+        'top_by_year': {col: timegrid.by_year(timegrid.top(timegrid.build_time_grid(events, col), 5)) for col in (ARTIST, ALBUM, TRACK)},
+        'streaks': backend.daily_streak_stats(events),
+        'years': years,
+    }
+
+
+# ─────────────────────────────────────────────
+#  FIGURES (built here or in worker processes)
+# ─────────────────────────────────────────────
+
+def _bar(frame, x, y, title):
+    import plotly.express as px
+
+    fig = px.bar(frame.sort_values(x), x=x, y=y, orientation='h', text_auto='.0f', title=title)
+    fig.update_traces(textposition='outside', marker_color=ACCENT)
+    fig.update_layout(yaxis_title=None, xaxis_title="Total Minutes", margin=dict(l=0, r=0, t=40, b=20), height=450)
+    return fig
+
+
+def _heatmap(pivot, title, x_label, y_label, annotate=False):
+    import plotly.express as px
+
+    fig = px.imshow(pivot, color_continuous_scale='viridis', aspect='auto', text_auto='.0f' if annotate else False,
+                    labels={'x': x_label, 'y': y_label, 'color': 'Minutes'}, title=title)
+    fig.update_layout(margin=dict(l=0, r=0, t=40, b=20))
+    return fig
+
+
+def _race(race, title):
+    import plotly.express as px
+
+    fig = px.bar(race, x='month_name', y='minutes', color=ARTIST, barmode='group', title=title,
+                 category_orders={'month_name': wrapped.MONTH_ORDER}, labels={'month_name': '', 'minutes': 'Minutes', ARTIST: 'Artist'})
+    fig.update_layout(margin=dict(l=0, r=0, t=40, b=20), height=420)
+    return fig
+
+
+FIGURES = {'bar': _bar, 'heatmap': _heatmap, 'race': _race}
+
+
+def build_figure(spec):
+    """Plotly JSON of one ``(kind, kwargs)`` figure spec."""
+    kind, kwargs = spec
+    return FIGURES[kind](**kwargs).to_json()
+
+
+def figure_specs(data):
+    """``{figure id: (kind, kwargs)}`` for every figure of the report, in page order."""
+    specs = {}
+    for name, keys in overview.TOP_LISTS.items():
+        if not data['top'][name].empty:
+            specs[f'top-{name}'] = ('bar', dict(frame=data['top'][name][[keys[0], 'total_minutes']], x='total_minutes', y=keys[0],
+                                                title=f"Top {len(data['top'][name])} {name.title()} by Listening Time"))
+    by_hour = data['by_hour'].rename(index=dict(enumerate(WEEKDAYS)))
+    specs['heatmap-hour'] = ('heatmap', dict(pivot=by_hour, title="Listening activity by hour and day of the week", x_label='Hour', y_label=''))
+    specs['heatmap-calendar'] = ('heatmap', dict(pivot=data['calendar'], title="Listening activity by day and month", x_label='Day', y_label='Month'))
+    for col, label in ((ARTIST, 'Artists'), (ALBUM, 'Albums'), (TRACK, 'Tracks')):
+        pivot = data['top_by_year'][col]
+        if not pivot.empty:
+            specs[f'heatmap-{label.lower()}'] = ('heatmap', dict(pivot=pivot.T, title=f"Top 5 {label} by Year", x_label='Year', y_label='', annotate=True))
+    for year, card in data['years'].items():
+        specs[f'race-{year}'] = ('race', dict(race=card['race'], title=f"Monthly Top 5 Artists, {year}"))
+    return specs
+
+
+def build_figures(specs, workers=None):
+    """Figure JSON by id. Up to `workers` processes build them (1 builds them here), from `POOL_MIN_FIGURES` figures on."""
+    workers = min(workers or MAX_WORKERS, os.cpu_count() or 1, len(specs))
+    if workers <= 1 or len(specs) < POOL_MIN_FIGURES:
+        return {key: build_figure(spec) for key, spec in specs.items()}
+    # Spawned, not forked: the dashboard server process is multi-threaded
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return dict(zip(specs, pool.map(build_figure, specs.values())))
+
+
+# ─────────────────────────────────────────────
+#  HTML
+# ─────────────────────────────────────────────
+
+STYLE = """
+body { font-family: -apple-system, "Segoe UI", Roboto, sans-serif; margin: 0 auto; max-width: 1280px; padding: 24px; color: #191414; }
+h1 { margin-bottom: 4px; } h2 { border-bottom: 2px solid #1DB954; padding-bottom: 4px; margin-top: 48px; }
+.meta { color: #666; }
+.row { display: flex; gap: 24px; flex-wrap: wrap; } .row > div { flex: 1 1 360px; min-width: 0; }
+table { border-collapse: collapse; width: 100%; font-size: 14px; margin: 8px 0 24px; }
+th, td { padding: 4px 8px; border-bottom: 1px solid #eee; text-align: left; } th { background: #f6f6f6; }
+.cards { display: flex; gap: 16px; flex-wrap: wrap; margin: 12px 0; }
+.card { flex: 1 1 200px; border-radius: 10px; padding: 16px 20px; color: #fff; background: linear-gradient(135deg, #003973, #5F9EA0); }
+.card p { margin: 0; } .card .value { font-size: 26px; font-weight: bold; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+"""
+
+RENDER_SCRIPT = """
+document.querySelectorAll('script[data-figure]').forEach(function (node) {
+  var fig = JSON.parse(node.textContent);
+  Plotly.newPlot(document.getElementById(node.dataset.figure), fig.data, fig.layout, {responsive: true});
+});
+"""
+
+
+def _table(frame):
+    return frame.to_html(index=False, border=0, float_format=lambda v: f"{v:,.0f}")
+
+
+def _script_safe(text):
+    # "</" would end the inline <script> early
+    return text.replace('</', '<\\/')
+
+
+def _figure(figures, key):
+    return f'<div id="{key}"></div>' if key in figures else ''
+
+
+def _cards(items):
+    return '<div class="cards">' + ''.join(
+        f'<div class="card"><p>{html.escape(label)}</p><p class="value" title="{html.escape(str(value))}">{html.escape(str(value))}</p></div>'
+        for label, value in items) + '</div>'
+
+
+def render_html(data, figures, title="Spotify Listening Report"):
+    """The report page with plotly.js, figure JSON and tables inlined."""
+    from plotly.offline import get_plotlyjs
+
+    body = [f"<h1>📦 {html.escape(title)}</h1>",
+            f'<p class="meta">{data["events"]:,} plays from {data["first_day"]} to {data["last_day"]}. Generated {datetime.now():%Y-%m-%d %H:%M}.</p>']
+
+    body.append("<h2>🏆 Top Lists</h2><div class=\"row\">")
+    for name, keys in overview.TOP_LISTS.items():
+        top = data['top'][name]
+        table = top[keys + ['play_count', 'total_minutes']].rename(columns={TRACK: 'Track', ARTIST: 'Artist', ALBUM: 'Album', 'play_count': 'Plays', 'total_minutes': 'Minutes'})
+        body.append(f"<div><h3>{name.title()}</h3>{_figure(figures, f'top-{name}')}{_table(table)}</div>")
+    body.append("</div>")
+
+    body.append("<h2>🏁 Weekly Points Leaderboard (F1 Style)</h2>")
+    if data['leaderboard'] is None:
+        body.append("<p>Not enough listening data to rank weeks.</p>")
+    else:
+        leaderboard = data['leaderboard'][['total_points', 'total_minutes', 'best_rank', 'debut_week']].rename_axis('Track').reset_index()
+        body.append(_table(leaderboard.rename(columns={'total_points': 'Points', 'total_minutes': 'Minutes', 'best_rank': 'Best rank', 'debut_week': 'Debut'})))
+
+    body.append("<h2>🗺️ Heatmaps</h2>")
+    body.append(_figure(figures, 'heatmap-hour') + _figure(figures, 'heatmap-calendar'))
+    body.append('<div class="row">' + ''.join(f"<div>{_figure(figures, f'heatmap-{label}')}</div>" for label in ('artists', 'albums', 'tracks')) + "</div>")
+
+    streaks = data['streaks']
+    body.append("<h2>📆 Listening Streaks</h2>")
+    body.append(_cards([
+        ("Days in range", f"{streaks['total_days']:,}"),
+        ("Days with listening", f"{streaks['days_with']:,}"),
+        ("Longest listening streak", f"{streaks['max_streak']} days"),
+        ("Longest break", f"{streaks['max_zero_streak']} days"),
+        ("Minutes per listening day", f"{streaks['avg_listening_days']:.1f}"),
+    ]))
+
+    for year, card in sorted(data['years'].items(), reverse=True):
+        stats, masterpiece, dna = card['headlines'], card['masterpiece'], card['dna']
+        body.append(f"<h2>🌟 Your {year} Wrapped</h2>")
+        body.append(_cards([
+            ("Total listening time", f"{int(stats['total_minutes']):,} min"),
+            ("Top artist", stats['top_artist']),
+            ("Top track", stats['top_track']),
+            ("Top album", stats['top_album']),
+            ("Busiest day", f"{stats['busiest_day']:%b %d} · {int(stats['busiest_day_minutes'])} min"),
+            ("Unique artists", f"{stats['unique_artists']:,}"),
+            ("Unique tracks", f"{stats['unique_tracks']:,}"),
+            ("Top listening hour", f"{stats['top_hour']}:00 - {stats['top_hour'] + 1}:00"),
+        ]))
+        body.append(_cards([
+            ("Total hours", f"{round(stats['total_minutes'] / 60, 1):,}"),
+            ("Total days", f"{masterpiece['total_days']:,}"),
+            ("Unique songs", f"{masterpiece['unique']['track']:,} · {masterpiece['percent_new']['track']:.1f}% new"),
+            ("Unique albums", f"{masterpiece['unique']['album']:,} · {masterpiece['percent_new']['album']:.1f}% new"),
+            ("Unique artists", f"{masterpiece['unique']['artist']:,} · {masterpiece['percent_new']['artist']:.1f}% new"),
+            ("Listener DNA", dna.loc[dna['Minutes'].idxmax(), 'Category'] if not dna.empty else "Unique"),
+            ("Skip rate", f"{masterpiece['percent_skips']:.1f}%"),
+            ("Devices used", masterpiece['num_devices']),
+        ]))
+        top_tracks = masterpiece['top_tracks'].rename(columns={TRACK: 'Track', ARTIST: 'Artist', 'minutes': 'Minutes'})
+        body.append(f"<h3>Top 5 Tracks</h3>{_table(top_tracks)}")
+        body.append(_figure(figures, f'race-{year}'))
+
+    payloads = ''.join(f'<script type="application/json" data-figure="{key}">{_script_safe(figure)}</script>' for key, figure in figures.items())
+    return (f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            f'<style>{STYLE}</style><script>{get_plotlyjs()}</script></head><body>'
+            f'{"".join(body)}{payloads}<script>{RENDER_SCRIPT}</script></body></html>')
+
+
+def build_report(events, weekly, first_listen, backend=None, title="Spotify Listening Report", workers=None):
+    data = report_data(events, weekly, first_listen, backend)
+    return render_html(data, build_figures(figure_specs(data), workers), title)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("export", nargs="?", help="Spotify Extended Streaming History ZIP")
+    source.add_argument("--dataset", help="name of a saved dataset instead of a ZIP")
+    parser.add_argument("-o", "--output", default="report.html")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="processes building the figures (1 = none)")
+    args = parser.parse_args(argv)
+
+    backend = backends.get_backend()
+    if args.dataset:
+        events, dataset_rollups = ingest.load_dataset(args.dataset)
+        weekly, first_listen = dataset_rollups['weekly'], dataset_rollups['first_listen']
+    else:
+        events = ingest.load_export(args.export)
+        weekly, first_listen = backend.weekly_ranking(rollups.build_daily_rollup(events)), rollups.build_first_listen(events)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(build_report(events, weekly, first_listen, backend, workers=args.workers))
+    print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
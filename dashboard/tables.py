@@ -0,0 +1,53 @@
+"""Paginated tables that send only the visible page to the browser.
+
+`st.dataframe` serializes its whole frame into every rerun. `paginated_table`
+keeps search, sort and page number in widget state and does the work on the
+server, on the (usually cached) frame. Only the rows of the current page are
+handed to `st.dataframe`, so a leaderboard of tens of thousands of rows costs
+one page of Arrow data per rerun.
+"""
+
+import numpy as np
+import streamlit as st
+
+PAGE_SIZE = 25
+
+
+def matching_rows(frame, search="", search_columns=None, sort_by=None, descending=False):
+    """Positions of the rows containing `search` (case-insensitive), in display order."""
+    positions = np.arange(len(frame))
+    if search:
+        columns = search_columns or [c for c in frame.columns if frame[c].dtype == object]
+        hits = np.zeros(len(frame), dtype=bool)
+        for column in columns:
+            hits |= frame[column].astype(str).str.contains(search, case=False, regex=False, na=False).to_numpy()
+        if frame.index.dtype == object:
+            hits |= frame.index.astype(str).str.contains(search, case=False, regex=False).to_numpy()
+        positions = positions[hits]
+    if sort_by is not None:
+        values = frame[sort_by].iloc[positions].reset_index(drop=True)
+        order = values.sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+        positions = positions[order]
+    return positions
+
+
+def paginated_table(frame, key, page_size=PAGE_SIZE, search_columns=None, sort_by=None, descending=False, **dataframe_kwargs):
+    """Search box, sort controls and page selector over `frame`; renders the current page only."""
+    search_col, sort_col, order_col, page_col = st.columns([3, 2, 1, 1])
+    search = search_col.text_input("Search", key=f"{key}_search", placeholder="Filter rows...")
+    columns = list(frame.columns)
+    sort_choice = sort_col.selectbox("Sort by", ["(default)"] + columns, index=columns.index(sort_by) + 1 if sort_by in columns else 0, key=f"{key}_sort")
+    descending = order_col.toggle("Desc.", value=descending, key=f"{key}_desc")
+
+    positions = matching_rows(frame, search, search_columns, None if sort_choice == "(default)" else sort_choice, descending)
+    pages = max(1, -(-len(positions) // page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page = page_col.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+    shown = positions[(page - 1) * page_size:page * page_size]
+    st.dataframe(frame.iloc[shown], **dataframe_kwargs)
+    first = (page - 1) * page_size + 1 if len(shown) else 0
+    st.caption(f"Rows {first}–{first + len(shown) - 1 if len(shown) else 0} of {len(positions):,}"
+               + (f" (filtered from {len(frame):,})" if len(positions) != len(frame) else ""))
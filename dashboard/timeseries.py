@@ -0,0 +1,74 @@
+"""Long time-series charts that stay responsive in the browser.
+
+`st.line_chart` and `px.line` send every point as SVG, so years of weekly or
+hourly data make panning and hovering lag. `time_series_chart` sends at most
+`width_px` points per series, picked with LTTB (`analytics/downsample.py`).
+It draws them as WebGL traces once a chart has more than `WEBGL_POINTS`.
+
+Streamlit does not report the chart's pixel width, so `width_px` is that of a
+full-width chart on a common screen. It does not report zoom events either.
+Dragging a box over the chart is the zoom: the chart, a fragment, reruns on
+its own with the full-resolution points of that window, downsampled again.
+"Reset zoom" returns to the whole range.
+"""
+
+import pandas as pd
+import streamlit as st
+
+from analytics import downsample
+from dashboard import plotting
+
+DEFAULT_WIDTH_PX = 1200
+WEBGL_POINTS = 1000
+
+
+def _window_key(key):
+    return f"{key}_window"
+
+
+def _box_range(event, tz):
+    """(start, end) of the first box selected on a chart, in the data's time zone, or None."""
+    boxes = event.get('selection', {}).get('box', []) if event else []
+    if not boxes or len(boxes[0].get('x', [])) < 2:
+        return None
+    # Plotly reports the box in the axis' wall-clock time, without a zone
+    start, end = sorted(pd.Timestamp(value).tz_localize(None) for value in boxes[0]['x'][:2])
+    return (start.tz_localize(tz), end.tz_localize(tz)) if tz is not None else (start, end)
+
+
+@st.fragment
+def time_series_chart(data, key, title=None, y_title=None, reverse_y=False, markers=False, width_px=DEFAULT_WIDTH_PX):
+    """Line chart of `data` (a Series, or a DataFrame with one line per column) over a sorted DatetimeIndex."""
+    go = plotting.plotly_graph_objects()
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    window = st.session_state.get(_window_key(key))
+    visible = frame.loc[window[0]:window[1]] if window else frame
+
+    series = {column: downsample.downsample(visible[column], width_px) for column in visible.columns}
+    shown = sum(len(points) for points in series.values())
+    trace = go.Scattergl if shown > WEBGL_POINTS else go.Scatter
+    fig = go.Figure([trace(x=points.index, y=points.to_numpy(), name=str(column), mode='lines+markers' if markers else 'lines')
+                     for column, points in series.items()])
+    fig.update_layout(title=title, yaxis_title=y_title, showlegend=len(series) > 1, dragmode='select', margin=dict(l=0, r=0, t=40 if title else 10, b=20))
+    if reverse_y:
+        fig.update_yaxes(autorange="reversed")
+
+    # A new chart element per window, so the box that zoomed in is not applied again
+    chart_key = f"{key}_chart_{window}"
+    tz = frame.index.tz
+
+    def zoom_to_box():
+        selected = _box_range(st.session_state.get(chart_key), tz)
+        if selected is not None:
+            st.session_state[_window_key(key)] = selected
+
+    st.plotly_chart(fig, use_container_width=True, on_select=zoom_to_box, selection_mode="box", key=chart_key)
+
+    total = len(visible) * len(visible.columns)
+    detail = f"{shown:,} of {total:,} points shown" if shown < total else f"All {total:,} points shown"
+    if window:
+        caption_col, reset_col = st.columns([5, 1])
+        caption_col.caption(f"{detail}, {window[0]:%Y-%m-%d %H:%M} to {window[1]:%Y-%m-%d %H:%M}. Drag a box to zoom further.")
+        reset_col.button("Reset zoom", key=f"{key}_reset", on_click=st.session_state.pop, args=(_window_key(key), None))
+    else:
+        st.caption(f"{detail}. Drag a box over the chart to zoom in at full detail.")
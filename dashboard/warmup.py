@@ -0,0 +1,140 @@
+"""Background warming of the heavy per-tab results.
+
+As soon as the data is loaded, each rerun hands the `Warmer` the jobs the
+current filters call for, ordered so the tab being viewed comes first. Jobs
+run on a small thread pool shared by all sessions. Pending jobs that no longer
+match the filters are cancelled. A job that is already running cannot be
+interrupted; it finishes and its result is dropped.
+
+Tabs read results through `Warmer.take(key, compute)` inside their cached
+functions: a finished job returns at once, a running one is awaited, and
+anything else is computed inline as before. Jobs must be pure functions (no
+Streamlit calls); they run without a script context.
+
+Keys that were taken stay known for the life of the session. The cached
+functions hold their results, so returning to earlier filters or controls
+does not warm those keys again.
+
+A cache hit skips `take`, so tabs call `release(key)` after reading a result
+through their cached function; the finished job is then dropped instead of
+holding its result for the rest of the session.
+
+A tab that draws a preview instead of waiting (`pending` is true) calls
+`watch(key)` on every rerun that shows it. The sidebar progress reruns the
+app only when such a job finishes, so the exact result replaces the preview
+without any click. Any other finished work only updates the progress bar.
+Once nothing is pending, the polling fragment is dropped by rerunning its
+parent fragment, not the app.
+"""
+
+import concurrent.futures
+
+import streamlit as st
+
+MAX_WORKERS = 2
+SESSION_KEY = "warmer"
+PROGRESS_FRAGMENT = "warmup_progress"
+
+
+@st.cache_resource
+def _executor():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="warmup")
+
+
+class Warmer:
+    def __init__(self, executor):
+        self.executor = executor
+        self.jobs = {}
+        self.taken = set()
+        self.watched = set()
+        self.plan = set()
+
+    def schedule(self, jobs, defer=()):
+        """Queue `jobs`, a list of (key, label, fn) in priority order, replacing the previous plan.
+
+        Keys in `defer` keep the job they already have, queued or running,
+        but get no new one yet. While anything is deferred, queued jobs keep
+        their place instead of being requeued.
+        """
+        self.plan = {key for key, _, _ in jobs}
+        # Previews watch their key again on every rerun that draws them
+        self.watched = set()
+        for key, (label, future) in list(self.jobs.items()):
+            # Stale jobs are dropped; pending ones are requeued below in the new priority order
+            if key not in self.plan or (not defer and future.cancel()):
+                future.cancel()
+                del self.jobs[key]
+        for key, label, fn in jobs:
+            if key not in self.jobs and key not in self.taken and key not in defer:
+                self.jobs[key] = (label, self.executor.submit(fn))
+
+    def take(self, key, compute):
+        """The warmed result for `key`, else `compute()` run inline."""
+        label, future = self.jobs.pop(key, (None, None))
+        self.taken.add(key)
+        if future is None or future.cancel():
+            return compute()
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            return compute()
+
+    def release(self, key):
+        """The tab's cached function now holds the result for `key`; forget its job."""
+        label, future = self.jobs.pop(key, (None, None))
+        if future is not None:
+            future.cancel()
+        self.taken.add(key)
+
+    def ready(self, key):
+        """Whether the result for `key` is available without waiting: taken before, or warmed and done."""
+        return key in self.taken or (key in self.jobs and self.jobs[key][1].done())
+
+    def pending(self, key):
+        """Whether `key` is queued or running, i.e. `take` would have to wait for it."""
+        return key in self.jobs and not self.jobs[key][1].done()
+
+    def watch(self, key):
+        self.watched.add(key)
+
+    def swap_ready(self):
+        """True once, when some watched job has finished since the preview was drawn."""
+        finished = {key for key in self.watched if not self.pending(key)}
+        self.watched -= finished
+        return bool(finished)
+
+    def progress(self):
+        """(finished, total, labels still queued or running) for the current plan."""
+        pending = [label for label, future in self.jobs.values() if not future.done()]
+        total = len(self.jobs) + len(self.taken & self.plan)
+        return total - len(pending), total, pending
+
+
+def session_warmer():
+    if SESSION_KEY not in st.session_state:
+        st.session_state[SESSION_KEY] = Warmer(_executor())
+    return st.session_state[SESSION_KEY]
+
+
+@st.fragment(run_every="1s")
+def _poll_progress():
+    warmer = session_warmer()
+    finished, total, pending = warmer.progress()
+    if warmer.swap_ready():
+        # A preview on screen has its exact result now
+        st.rerun()
+    if not pending:
+        # Rerunning the parent drops this fragment, and with it the polling
+        st.rerun(scope=PROGRESS_FRAGMENT)
+    st.progress(finished / total, text=f"Precomputing tabs ({finished}/{total}): {', '.join(dict.fromkeys(pending))}")
+
+
+@st.fragment(key=PROGRESS_FRAGMENT)
+def _progress_panel():
+    if session_warmer().progress()[2]:
+        _poll_progress()
+
+
+def render_progress():
+    """Sidebar progress of the warm-up; polls by itself only while jobs are pending."""
+    _progress_panel()